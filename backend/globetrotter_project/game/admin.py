@@ -1,7 +1,220 @@
+import csv
+import json
+
+from django import forms
 from django.contrib import admin
-from .models import Destination
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
+
+from . import catalog, changes, geo, rounds
+from .importer import DestinationImporter, iter_records, seeded_deduplicator
+from .models import CatalogChange, Destination
+
+# Columns written by the CSV and JSON Lines exports; the JSON Lines file can be imported again.
+EXPORT_FIELDS = (
+    'id', 'city', 'country', 'region', 'continent', 'difficulty', 'popularity', 'is_active',
+    'clues', 'fun_fact', 'trivia', 'image_url',
+)
+# JSON and long text columns the changelist never shows.
+LIST_DEFERRED = ('clues', 'fun_fact', 'trivia', 'image_variants')
+# Rows per round trip when exporting or bulk editing.
+CHUNK_SIZE = 2000
+# Below this many rows an exact COUNT(*) is cheap enough.
+EXACT_COUNT_BELOW = 10000
+
+
+def estimated_count(queryset):
+    """The planner's row estimate for the table behind `queryset` (PostgreSQL only), or None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 until the table has been vacuumed or analyzed.
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts a large unfiltered table from planner statistics instead of a
+    COUNT(*) that scans it. Filtered lists and small tables are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= EXACT_COUNT_BELOW:
+                return estimate
+        return super().count
+
+
+class DestinationChangeList(ChangeList):
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer(*LIST_DEFERRED)
+
+
+class RegionFilter(admin.SimpleListFilter):
+    # Choices come from game.geo, so the sidebar doesn't SELECT DISTINCT over the table.
+    title = 'region'
+    parameter_name = 'region'
+
+    def lookups(self, request, model_admin):
+        return [(region, region) for region in geo.REGIONS]
+
+    def queryset(self, request, queryset):
+        return queryset.filter(region=self.value()) if self.value() else queryset
+
+
+class DifficultyFilter(admin.SimpleListFilter):
+    title = 'difficulty'
+    parameter_name = 'difficulty'
+    RANGES = {**{name: bounds for name, bounds in rounds.DIFFICULTY_RANGES.items() if bounds}, 'medium': (41, 59)}
+
+    def lookups(self, request, model_admin):
+        return [(name, f"{name} ({low}-{high})") for name, (low, high) in self.RANGES.items()]
+
+    def queryset(self, request, queryset):
+        bounds = self.RANGES.get(self.value())
+        return queryset.filter(difficulty__range=bounds) if bounds else queryset
+
+
+class Echo:
+    """A file-like object for csv.writer that hands back each line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    return queryset.order_by('pk').values_list(*EXPORT_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+
+
+def streaming_download(lines, content_type, filename):
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ImportForm(forms.Form):
+    file = forms.FileField(help_text='A JSON array or JSON Lines file, as read by manage.py import_data.')
+    update = forms.BooleanField(required=False, help_text='Update existing cities whose content changed.')
+    dedup = forms.ChoiceField(
+        required=False,
+        choices=[
+            ('', 'Import every city'),
+            ('exact', 'Skip other spellings of known cities (accents, case, aliases)'),
+            ('fuzzy', 'Also skip likely typos of known cities'),
+        ],
+    )
+
+
+@admin.register(Destination)
+class DestinationAdmin(admin.ModelAdmin):
+    list_display = ('city', 'country', 'region', 'difficulty', 'popularity', 'is_active')
+    list_filter = ('is_active', RegionFilter, DifficultyFilter)
+    # A prefix of the unique city index; ids are matched exactly (see get_search_results).
+    search_fields = ('city__istartswith',)
+    search_help_text = 'Start of the city name, or an id.'
+    ordering = ('city',)
+    list_per_page = 100
+    list_max_show_all = 1000
+    # The unfiltered total would be a second full COUNT(*) on every page.
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    readonly_fields = ('region', 'continent', 'content_hash')
+    actions = ('export_csv', 'export_jsonl', 'activate', 'deactivate')
+
+    def get_changelist(self, request, **kwargs):
+        return DestinationChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term.strip().isdigit():
+            return queryset.filter(pk=int(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.action(description='Export selected destinations as CSV')
+    def export_csv(self, request, queryset):
+        writer = csv.writer(Echo())
+
+        def lines():
+            yield writer.writerow(EXPORT_FIELDS)
+            for row in export_rows(queryset):
+                yield writer.writerow(
+                    [json.dumps(value, ensure_ascii=False) if isinstance(value, list) else value for value in row]
+                )
+
+        return streaming_download(lines(), 'text/csv; charset=utf-8', 'destinations.csv')
+
+    @admin.action(description='Export selected destinations as JSON Lines')
+    def export_jsonl(self, request, queryset):
+        lines = (
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n' for row in export_rows(queryset)
+        )
+        return streaming_download(lines, 'application/jsonl; charset=utf-8', 'destinations.jsonl')
+
+    @admin.action(description='Mark selected destinations as active', permissions=['change'])
+    def activate(self, request, queryset):
+        self.set_active(request, queryset, True)
 
-admin.site.register(Destination)
+    @admin.action(description='Mark selected destinations as inactive', permissions=['change'])
+    def deactivate(self, request, queryset):
+        self.set_active(request, queryset, False)
 
+    def set_active(self, request, queryset, active):
+        ids = list(queryset.exclude(is_active=active).values_list('pk', flat=True))
+        # One short transaction per chunk, logged for catalog sync since update() sends no signals.
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            with transaction.atomic():
+                Destination.objects.filter(pk__in=chunk).update(is_active=active)
+                changes.record(CatalogChange.UPDATE, chunk)
+        if ids:
+            catalog.bump_version()
+        self.message_user(request, f"Marked {len(ids)} destinations as {'active' if active else 'inactive'}.")
 
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='game_destination_import'),
+            *super().get_urls(),
+        ]
 
+    def import_view(self, request):
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        form = ImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            dedup = form.cleaned_data['dedup']
+            importer = DestinationImporter(
+                update=form.cleaned_data['update'],
+                dedup=seeded_deduplicator(dedup == 'fuzzy') if dedup else None,
+            )
+            try:
+                stats = importer.run(iter_records(form.cleaned_data['file']))
+            except ValueError as exc:
+                form.add_error('file', f"Invalid JSON: {exc}")
+            else:
+                if stats.changed:
+                    catalog.bump_version()
+                self.message_user(
+                    request,
+                    f"Read {stats.read} rows: {stats.created} created, {stats.updated} updated, "
+                    f"{stats.unchanged} unchanged, {stats.invalid} invalid, {stats.duplicates} duplicates.",
+                )
+                return redirect('admin:game_destination_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': 'Import destinations',
+        }
+        return TemplateResponse(request, 'admin/game/destination/import.html', context)
@@ -0,0 +1,77 @@
+"""
+Coroutine versions of the index, round and answer views, routed instead of
+the ones in views.py when the project runs under ASGI (see asgi_urls.py).
+Database and cache access goes through Django's async APIs, so a slow query
+parks the request instead of tying up a worker. Django 4.2's view decorators
+don't accept coroutines, so what they did (allowed methods, the CSRF cookie,
+Cache-Control and the catalog ETag) is done inline here.
+"""
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import catalog, pool, rounds, scoring
+from .pool import round_pool
+from .ratelimit import rate_limit
+from .views import answer_params, index_etag, round_params
+
+
+@rate_limit('page')
+async def index(request):
+    version = await catalog.aget_version()
+    etag = quote_etag(index_etag(version))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render(request, 'game/index.html', {'catalog_snapshot_version': version})
+        response.headers.setdefault('ETag', etag)
+    get_token(request)  # as ensure_csrf_cookie: the page posts answers with it
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@rate_limit('round')
+async def next_round(request):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    params = round_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+    difficulty, region, mode = params
+    if difficulty:
+        body = round_pool.pop(difficulty, region) if mode == rounds.CHOICE else None
+        if body is None:
+            round_data = await rounds.abuild_round(difficulty=difficulty, region=region, mode=mode)
+            if round_data is None:
+                return JsonResponse({'error': 'No destinations available.'}, status=404)
+            body = pool.serialize(round_data)
+        return HttpResponse(body, content_type='application/json')
+
+    deck = rounds.read_deck(request)
+    round_data = await rounds.abuild_round(deck=deck, mode=mode)
+    if round_data is None:
+        return JsonResponse({'error': 'No destinations available.'}, status=404)
+    response = JsonResponse(round_data)
+    rounds.write_deck(response, deck)
+    return response
+
+
+@rate_limit('answer')
+async def answer_round(request, round_id):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    params = answer_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+    answer, username, mode = params
+    try:
+        result = await rounds.acheck_answer(round_id, answer, mode)
+    except rounds.RoundError as exc:
+        return JsonResponse({'error': str(exc)}, status=404)
+    if not await scoring.aclaim_round(round_id):
+        return JsonResponse({'error': 'This round has already been answered.'}, status=409)
+    result['session'] = await scoring.arecord_answer(
+        request, rounds.read_round_id(round_id), answer, result['correct'], username
+    )
+    return JsonResponse(result)
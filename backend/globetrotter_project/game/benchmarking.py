@@ -0,0 +1,381 @@
+import contextvars
+import http.client
+import json
+from http.cookies import SimpleCookie
+import random
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+try:
+    import uvicorn
+except ImportError:  # uvicorn is only needed for the asgi driver.
+    uvicorn = None
+
+from . import catalog, geo, rounds
+from .models import Destination, location_fields
+
+# Header added by the instrumented WSGI app so the client can see per-request query counts.
+QUERIES_HEADER = 'X-Bench-Queries'
+ENDPOINTS = ('index', 'next_round', 'pooled_round', 'answer', 'leaderboard', 'catalog')
+# Averages wobble when buffered answers flush mid-run; a real regression adds a whole query.
+QUERY_SLACK = 0.5
+
+
+def seed_destinations(count, batch_size=5000):
+    """Top the catalog up to `count` synthetic destinations with bulk inserts."""
+    existing = Destination.objects.count()
+    for start in range(existing, count, batch_size):
+        Destination.objects.bulk_create(
+            [
+                Destination(
+                    city=f"Bench City {i:07d}",
+                    country=geo.COUNTRIES[i % len(geo.COUNTRIES)],
+                    **location_fields(geo.COUNTRIES[i % len(geo.COUNTRIES)]),
+                    difficulty=i % 101,
+                    clues=[f"Clue {i} a", f"Clue {i} b"],
+                    fun_fact=f"Fun fact {i}",
+                    trivia=[f"Trivia {i}"],
+                )
+                for i in range(start, min(count, start + batch_size))
+            ],
+            ignore_conflicts=True,
+        )
+    catalog.bump_version()
+
+
+def endpoint_requests(rng):
+    """Endpoint name -> callable returning (method, path, json body or None)."""
+    def answer():
+        destination_id = rng.choice(catalog.get_catalog().ids)
+        round_id = rounds.make_round_id(destination_id)
+        return 'POST', reverse('answer_round', args=[round_id]), {'answer': 'Bench City 0000000'}
+
+    return {
+        'index': lambda: ('GET', reverse('index'), None),
+        'next_round': lambda: ('GET', reverse('next_round'), None),
+        'pooled_round': lambda: ('GET', reverse('next_round') + '?difficulty=hard', None),
+        'answer': answer,
+        'leaderboard': lambda: ('GET', reverse('leaderboard') + '?limit=10', None),
+        'catalog': lambda: ('GET', reverse('catalog_snapshot', args=[catalog.get_version()]), None),
+    }
+
+
+@dataclass
+class Result:
+    endpoint: str
+    driver: str
+    size: int
+    concurrency: int
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries_per_request: float
+    bytes_per_request: float
+
+    @property
+    def key(self):
+        return f"{self.endpoint}/{self.driver}/{self.size}/c{self.concurrency}"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+class ClientDriver:
+    """Drive views in-process through django.test.Client (one client per thread)."""
+    name = 'client'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def request(self, method, path, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client()
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'GET':
+                response = client.get(path, HTTP_ACCEPT_ENCODING='gzip, br')
+            else:
+                response = client.post(path, json.dumps(body), content_type='application/json')
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, len(content), len(queries)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections at high concurrency, adding 1s SYN retries.
+    request_queue_size = 128
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def counting_app(application):
+    """Wrap a WSGI app so every response reports how many SQL queries it ran."""
+    def app(environ, start_response):
+        count = [0]
+        captured = []
+
+        def wrapper(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers]
+
+        try:
+            with connection.execute_wrapper(wrapper):
+                response = application(environ, capture)
+                body = b''.join(response)
+                if hasattr(response, 'close'):
+                    response.close()
+        finally:
+            close_old_connections()
+        status, headers = captured
+        start_response(status, headers + [(QUERIES_HEADER, str(count[0]))])
+        return [body]
+
+    return app
+
+
+class WSGIServerDriver:
+    """
+    Drive a real threaded WSGI server over HTTP on an ephemeral localhost port.
+    Each worker thread keeps its own cookies and sends the CSRF token like app.js.
+    """
+    name = 'wsgi'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def __enter__(self):
+        self.server = make_server(
+            '127.0.0.1', 0, counting_app(WSGIHandler()),
+            server_class=_ThreadingWSGIServer, handler_class=_QuietHandler,
+        )
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+    def _send(self, method, path, body):
+        cookies = self._local.__dict__.setdefault('cookies', SimpleCookie())
+        headers = {'Accept-Encoding': 'gzip, br'}
+        if cookies:
+            headers['Cookie'] = '; '.join(f"{k}={m.value}" for k, m in cookies.items())
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+            if 'csrftoken' in cookies:
+                headers['X-CSRFToken'] = cookies['csrftoken'].value
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            content = response.read()
+            for header in response.headers.get_all('Set-Cookie') or ():
+                cookies.load(header)
+            return response.status, len(content), int(response.getheader(QUERIES_HEADER, 0))
+        finally:
+            conn.close()
+
+    def request(self, method, path, body):
+        if method != 'GET' and 'csrftoken' not in self._local.__dict__.get('cookies', {}):
+            self._send('GET', reverse('index'), None)
+        return self._send(method, path, body)
+
+
+# Query counter of the ASGI request being handled. Async views query from worker
+# threads, each with its own connection, so counting happens on every connection.
+_asgi_queries = contextvars.ContextVar('bench_asgi_queries', default=None)
+
+
+def _count_asgi_query(execute, sql, params, many, context):
+    count = _asgi_queries.get()
+    if count is not None:
+        count[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _add_query_counter(sender, connection, **kwargs):
+    if _count_asgi_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_asgi_query)
+
+
+def counting_asgi_app(application):
+    """Wrap an ASGI app so every response reports how many SQL queries it ran."""
+    async def app(scope, receive, send):
+        count = [0]
+        _asgi_queries.set(count)
+
+        async def counted_send(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message['headers'], (QUERIES_HEADER.encode(), b'%d' % count[0])]}
+            await send(message)
+
+        await application(scope, receive, counted_send)
+
+    return app
+
+
+class ASGIServerDriver(WSGIServerDriver):
+    """
+    Drive uvicorn serving the ASGI app (async views, see asgi_urls.py) over
+    HTTP, to compare with the threaded WSGI server at the same concurrency.
+    """
+    name = 'asgi'
+
+    def __enter__(self):
+        if uvicorn is None:
+            raise ImproperlyConfigured('The asgi bench driver needs uvicorn installed.')
+        self.urls = override_settings(ROOT_URLCONF='globetrotter_project.asgi_urls')
+        self.urls.enable()
+        connection_created.connect(_add_query_counter)
+        for existing in connections.all():
+            _add_query_counter(None, existing)
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        self.port = sock.getsockname()[1]
+        config = uvicorn.Config(counting_asgi_app(ASGIHandler()), lifespan='off', log_level='warning')
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, kwargs={'sockets': [sock]}, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+        connection_created.disconnect(_add_query_counter)
+        self.urls.disable()
+        return False
+
+
+DRIVERS = {'client': ClientDriver, 'wsgi': WSGIServerDriver, 'asgi': ASGIServerDriver}
+
+
+def run(driver, endpoint, make_request, size, requests, concurrency):
+    """Send `requests` requests with `concurrency` threads and summarise them."""
+    latencies = []
+    sizes = []
+    queries = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        method, path, body = make_request()
+        started = time.perf_counter()
+        status, length, count = driver.request(method, path, body)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            sizes.append(length)
+            queries.append(count)
+            if status >= 400:
+                errors += 1
+
+    # One untimed request warms caches, snapshots and connections.
+    driver.request(*make_request())
+    started = time.perf_counter()
+    if concurrency == 1:
+        # Stay on the calling thread (and its database connection).
+        for i in range(requests):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    return Result(
+        endpoint=endpoint,
+        driver=driver.name,
+        size=size,
+        concurrency=concurrency,
+        requests=requests,
+        errors=errors,
+        rps=round(requests / wall, 1) if wall else 0.0,
+        p50_ms=round(percentile(latencies, 50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 99) * 1000, 3),
+        queries_per_request=round(statistics.mean(queries), 2),
+        bytes_per_request=round(statistics.mean(sizes), 1),
+    )
+
+
+def run_suite(sizes, endpoints, drivers, concurrencies, requests, seed=0, on_result=None):
+    rng = random.Random(seed)
+    makers = endpoint_requests(rng)
+    results = []
+    for size in sizes:
+        seed_destinations(size)
+        for driver_name in drivers:
+            with DRIVERS[driver_name]() as driver:
+                for endpoint in endpoints:
+                    for concurrency in concurrencies:
+                        result = run(driver, endpoint, makers[endpoint], size, requests, concurrency)
+                        results.append(result)
+                        if on_result:
+                            on_result(result)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return human-readable regressions against `baseline` ({key: result dict}):
+    more queries per request (beyond QUERY_SLACK), or p95 latency / response size worse than the
+    baseline by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for result in results:
+        base = baseline.get(result.key)
+        if base is None:
+            continue
+        if result.queries_per_request > base['queries_per_request'] + QUERY_SLACK:
+            regressions.append(
+                f"{result.key}: {result.queries_per_request} queries/request (baseline {base['queries_per_request']})"
+            )
+        for metric in ('p95_ms', 'bytes_per_request'):
+            value, reference = getattr(result, metric), base[metric]
+            if reference and value > reference * (1 + tolerance):
+                regressions.append(f"{result.key}: {metric} {value} (baseline {reference})")
+    return regressions
+
+
+def to_baseline(results):
+    return {result.key: asdict(result) for result in results}
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Destination
+
+# Cache key holding the current catalog version (shared by every worker).
+VERSION_KEY = 'game:catalog:version'
+# Cache key prefix for the serialized catalog of a given version (bump the schema
+# tag when CATALOG_FIELDS changes, so old cached copies are never read).
+CATALOG_KEY = 'game:catalog:2:{version}'
+# Only what rounds and answers need; trivia and the import hash stay in the database.
+CATALOG_FIELDS = (
+    'id', 'city', 'country', 'region', 'difficulty', 'clues', 'fun_fact', 'image_url', 'image_variants',
+)
+
+
+class Catalog:
+    """An immutable, in-memory copy of the destination table for one version."""
+
+    def __init__(self, version, destinations):
+        self.version = version
+        self.destinations = tuple(destinations)
+        self.by_id = {d['id']: d for d in self.destinations}
+        self.ids = [d['id'] for d in self.destinations]
+
+    def __len__(self):
+        return len(self.destinations)
+
+    def get(self, destination_id):
+        return self.by_id.get(destination_id)
+
+
+class LRUCache:
+    """A small thread-safe LRU used as the per-process layer in front of Django's cache."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = LRUCache(getattr(settings, 'GAME_CATALOG_LRU_SIZE', 2))
+
+
+def seed_version():
+    # Seed from the clock so a wiped cache never reuses an older version number; in
+    # microseconds, so even a burst of bumps just before the wipe stays behind it.
+    return time.time_ns() // 1000
+
+
+def get_version():
+    """Return the current catalog version, initialising it if the cache is cold."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, seed_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached copy of the catalog by moving to a new version."""
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        get_version()
+        return cache.incr(VERSION_KEY)
+
+
+async def aget_version():
+    """get_version() for async views."""
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, seed_version(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def load_destinations():
+    return list(Destination.objects.playable().order_by('pk').values(*CATALOG_FIELDS))
+
+
+async def aload_destinations():
+    return [row async for row in Destination.objects.playable().order_by('pk').values(*CATALOG_FIELDS)]
+
+
+def get_catalog():
+    """
+    Return the catalog for the current version, checking the per-process LRU
+    first, then Django's cache, and only hitting the database on a miss.
+    """
+    version = get_version()
+    catalog = _local.get(version)
+    if catalog is not None:
+        return catalog
+    key = CATALOG_KEY.format(version=version)
+    destinations = cache.get(key)
+    if destinations is None:
+        destinations = load_destinations()
+        cache.set(key, destinations, timeout=getattr(settings, 'GAME_CATALOG_TIMEOUT', None))
+    catalog = Catalog(version, destinations)
+    _local.set(version, catalog)
+    return catalog
+
+
+async def aget_catalog():
+    """get_catalog() for async views, through the async cache and ORM APIs."""
+    version = await aget_version()
+    catalog = _local.get(version)
+    if catalog is not None:
+        return catalog
+    key = CATALOG_KEY.format(version=version)
+    destinations = await cache.aget(key)
+    if destinations is None:
+        destinations = await aload_destinations()
+        await cache.aset(key, destinations, timeout=getattr(settings, 'GAME_CATALOG_TIMEOUT', None))
+    catalog = Catalog(version, destinations)
+    _local.set(version, catalog)
+    return catalog
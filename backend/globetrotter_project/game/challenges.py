@@ -0,0 +1,152 @@
+"""
+Challenge links: a signed token carries the challenger's name, their score
+(read from their server-side session when the link is made) and a seed that
+picks the destinations the friend plays. Opening a link only verifies the
+token and reads the in-memory catalog, so invites never touch the database.
+The round ids a visitor is dealt are kept in their session, so fetching the
+rounds again can't score the same cities twice.
+"""
+import hashlib
+import io
+import random
+import secrets
+from dataclasses import dataclass
+
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+
+from . import catalog, rounds, sampling
+
+# Salt used when signing challenge tokens so they can't be swapped with other signed values.
+CHALLENGE_SALT = 'game.challenge'
+CHALLENGE_MAX_AGE = 30 * 24 * 60 * 60
+CHALLENGE_ROUNDS = 5
+MAX_CHALLENGER_LENGTH = 50
+# Open Graph preview card, the size chat apps display best.
+PREVIEW_SIZE = (1200, 630)
+PREVIEW_KEY = 'game:challenge:preview:{digest}'
+PREVIEW_TIMEOUT = 7 * 24 * 60 * 60
+# Session key holding {token digest: [[destination id, round id], ...]} for the challenges
+# a visitor was dealt, and how many challenges it remembers (oldest are dropped).
+PLAYED_KEY = 'game_challenges'
+MAX_PLAYED = 50
+
+
+class ChallengeError(Exception):
+    """Raised when a challenge token is missing, tampered with or expired."""
+
+
+@dataclass(frozen=True)
+class Challenge:
+    challenger: str
+    score: int
+    seed: int
+
+
+def make_token(challenger, score, seed=None):
+    """A compact signed token for a challenge (random seed unless one is given)."""
+    seed = secrets.randbits(32) if seed is None else seed
+    return signing.dumps(
+        [challenger.strip()[:MAX_CHALLENGER_LENGTH], int(score), seed], salt=CHALLENGE_SALT, compress=True
+    )
+
+
+def read_token(token):
+    """The Challenge encoded in a signed token."""
+    try:
+        challenger, score, seed = signing.loads(token, salt=CHALLENGE_SALT, max_age=CHALLENGE_MAX_AGE)
+    except (signing.BadSignature, TypeError, ValueError) as exc:
+        raise ChallengeError('Invalid or expired challenge.') from exc
+    if not (isinstance(challenger, str) and type(score) is int and type(seed) is int):
+        raise ChallengeError('Invalid or expired challenge.')
+    return Challenge(challenger, score, seed)
+
+
+def destination_ids(challenge, current):
+    """The destinations the seed picks from `current`: the same for everyone opening the link."""
+    return random.Random(challenge.seed).sample(current.ids, min(CHALLENGE_ROUNDS, len(current)))
+
+
+def build_rounds(challenge, current=None):
+    """
+    The challenge's rounds, in order. Clues and options follow the seed too;
+    only the signed round ids differ per call (see session_rounds).
+    """
+    if current is None:
+        current = catalog.get_catalog()
+    index = sampling.get_index(current)
+    rng = random.Random(challenge.seed)
+    return [
+        rounds.make_round(index, (pk,), rng, None, rounds.NORMAL, rounds.CHOICE)
+        for pk in destination_ids(challenge, current)
+    ]
+
+
+def session_rounds(session, token, challenge, current=None):
+    """
+    The challenge's rounds for the visitor owning `session`. The first fetch
+    records the round ids it deals; later fetches hand the same ids back, so
+    once answered (or expired) a city can't be scored again by re-opening the
+    link. Only a round whose destination changed with the catalog gets a new id.
+    """
+    if current is None:
+        current = catalog.get_catalog()
+    built = build_rounds(challenge, current)
+    digest = hashlib.sha256(token.encode()).hexdigest()[:16]
+    played = session.get(PLAYED_KEY, {})
+    dealt = dict(played.get(digest, ()))
+    changed = False
+    for pk, round_data in zip(destination_ids(challenge, current), built):
+        if pk in dealt:
+            round_data['id'] = dealt[pk]
+            round_data['answer_url'] = reverse('answer_round', args=[dealt[pk]])
+        else:
+            dealt[pk] = round_data['id']
+            changed = True
+    if changed:
+        played.pop(digest, None)
+        played[digest] = [[pk, round_id] for pk, round_id in dealt.items()]
+        for stale in list(played)[:-MAX_PLAYED]:
+            del played[stale]
+        session[PLAYED_KEY] = played
+    return built
+
+
+def preview_png(challenge):
+    """The Open Graph preview card, rendered once per challenger and score and then cached."""
+    digest = hashlib.sha256(f'{challenge.challenger}\0{challenge.score}'.encode()).hexdigest()[:32]
+    key = PREVIEW_KEY.format(digest=digest)
+    png = cache.get(key)
+    if png is None:
+        png = render_preview(challenge)
+        cache.set(key, png, timeout=PREVIEW_TIMEOUT)
+    return png
+
+
+def render_preview(challenge):
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = PREVIEW_SIZE
+    image = Image.new('RGB', PREVIEW_SIZE, (24, 48, 96))
+    draw = ImageDraw.Draw(image)
+    name = challenge.challenger or 'A friend'
+    lines = [
+        (f'{name} challenges you!', 72, (255, 255, 255)),
+        (f'Score to beat: {challenge.score}', 56, (255, 214, 102)),
+        (f'Guess {CHALLENGE_ROUNDS} destinations from cryptic clues', 40, (210, 224, 255)),
+        ('GLOBETROTTER CHALLENGE', 36, (150, 180, 230)),
+    ]
+    y = 120
+    for text, size, color in lines:
+        font = ImageFont.load_default(size)
+        text_width = draw.textlength(text, font=font)
+        while text_width > width - 80 and size > 16:
+            size -= 4
+            font = ImageFont.load_default(size)
+            text_width = draw.textlength(text, font=font)
+        draw.text(((width - text_width) / 2, y), text, font=font, fill=color)
+        y += size + 60
+    out = io.BytesIO()
+    image.save(out, format='PNG', optimize=True)
+    return out.getvalue()
@@ -0,0 +1,121 @@
+"""
+The destination change log behind GET /api/catalog/changes?since=<version>.
+
+Every write that changes what players can see of a destination appends a
+CatalogChange row; its id is the version a client has synced up to. A client
+sends the last version it saw and gets back only the destinations changed
+since, collapsed to their latest state, instead of the whole catalog.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+from . import catalog
+from .models import CatalogChange, Destination
+
+# Fields public_entry reads.
+PUBLIC_FIELDS = ('id', 'city')
+# Salt of the HMAC that turns destination ids into public ids.
+PUBLIC_ID_SALT = 'game.catalog.public-id'
+# Cache key of the latest change version, per catalog version: every recorded change
+# also bumps the catalog version, so a cached value is never newer than the log.
+LATEST_KEY = 'game:catalog-changes:latest:{version}'
+# Cache key of the full catalog at a change version, sent to clients that have to start over.
+FULL_KEY = 'game:catalog-changes:full:{version}'
+
+
+def record(op, destination_ids, using=None):
+    """Append an `op` entry to the change log for each of `destination_ids`."""
+    CatalogChange.objects.db_manager(using).bulk_create(
+        [CatalogChange(destination_id=destination_id, op=op) for destination_id in destination_ids]
+    )
+
+
+def latest_version():
+    """The newest change version, or 0 when nothing has been recorded."""
+    return CatalogChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def cached_latest_version():
+    """latest_version() for the current catalog version, from the cache when possible."""
+    key = LATEST_KEY.format(version=catalog.get_version())
+    version = cache.get(key)
+    if version is None:
+        version = latest_version()
+        cache.set(key, version, timeout=getattr(settings, 'GAME_CATALOG_TIMEOUT', None))
+    return version
+
+
+def public_id(destination_id):
+    """
+    A stable id for a destination's public entry that can't be turned back
+    into its primary key, so nothing in a round can be matched to an entry.
+    """
+    return salted_hmac(PUBLIC_ID_SALT, str(destination_id)).hexdigest()[:16]
+
+
+def public_entry(destination):
+    """
+    The part of a destination that is safe to publish: the city name typed
+    answers are suggested from. No pk, images, clues or facts, which rounds
+    could be matched against to look up their answers.
+    """
+    return {'id': public_id(destination['id']), 'city': destination['city']}
+
+
+def public_rows(destination_ids=None):
+    """PUBLIC_FIELDS of the playable destinations, optionally only `destination_ids`."""
+    queryset = Destination.objects.playable()
+    if destination_ids is not None:
+        queryset = queryset.filter(id__in=destination_ids)
+    return list(queryset.order_by('id').values(*PUBLIC_FIELDS))
+
+
+def full(version):
+    # Rows are read after `version` was, so they hold at least every change up to it.
+    key = FULL_KEY.format(version=version)
+    payload = cache.get(key)
+    if payload is None:
+        upserts = [public_entry(row) for row in public_rows()]
+        payload = {'version': version, 'reset': True, 'upserts': upserts, 'deletes': []}
+        cache.set(key, payload, timeout=getattr(settings, 'GAME_CATALOG_TIMEOUT', None))
+    return payload
+
+
+def changes_since(since):
+    """
+    What a client at change version `since` needs to catch up: a dict with
+    the new `version`, the destinations to add or replace (`upserts`) and the
+    ids to drop (`deletes`). With `reset` set, the client must first clear
+    its copy: it was too far behind (or ahead, after a database reset) for
+    a delta to be worth it.
+    """
+    latest = cached_latest_version()
+    if since > latest:
+        # The client may have synced from the database just before the catalog version moved on.
+        latest = latest_version()
+    if 0 < since == latest:
+        # A stale cached version only means the client asks again on its next visit.
+        return {'version': since, 'reset': False, 'upserts': [], 'deletes': []}
+    if 0 < since < latest:
+        limit = getattr(settings, 'GAME_CATALOG_DELTA_LIMIT', 5000)
+        changed = {}
+        for version, destination_id in (
+            CatalogChange.objects.filter(id__gt=since).order_by('id').values_list('id', 'destination_id')
+        ):
+            changed[destination_id] = version
+            if len(changed) > limit:
+                break
+        else:
+            if changed:
+                # Read after the log, so rows are at least as new as the versions above. A
+                # destination that is gone or no longer playable is deleted on the client.
+                rows = public_rows(list(changed))
+                kept = {row['id'] for row in rows}
+                return {
+                    'version': max(changed.values()),
+                    'reset': False,
+                    'upserts': [public_entry(row) for row in rows],
+                    'deletes': sorted(public_id(pk) for pk in set(changed) - kept),
+                }
+    return full(latest_version())
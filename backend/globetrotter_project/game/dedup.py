@@ -0,0 +1,103 @@
+"""
+Near-duplicate detection for city names, used by imports and by the dataset
+builder (scripts/final_code.py) so the same city is never stored or paid to
+enrich twice. Plain Python, like game.names, so the builder runs without Django.
+"""
+from collections import Counter, defaultdict
+
+from .names import ALIASES, levenshtein, max_edits, normalize, similarity, trigrams
+
+# Fuzzy duplicates must be at least this similar (1 - edits / length): one typo
+# from 7 characters up, two from 14.
+SIMILARITY_THRESHOLD = 0.85
+
+
+def dedup_key(name):
+    """
+    Names with the same key are the same city: accents, case, punctuation,
+    spacing, abbreviations, known aliases and a trailing "City" don't count.
+    """
+    text = normalize(name)
+    text = ALIASES.get(text, text)
+    if text.endswith(' city') and len(text) > 5:
+        text = text[:-5]
+    return text.replace(' ', '')
+
+
+class Deduplicator:
+    """
+    Remembers city names and recognises new ones that are a known city under
+    another spelling: "Kyōto" for "Kyoto", "NYC" for "New York City" and,
+    with `fuzzy`, a likely typo like "Rio de Janero". Fuzzy lookups only
+    compare names of a plausible length that share enough trigrams, as
+    matcher.CityMatcher does, so a check stays cheap with 100k names known.
+    """
+
+    def __init__(self, fuzzy=True, threshold=SIMILARITY_THRESHOLD):
+        self.fuzzy = fuzzy
+        self.threshold = threshold
+        self.names = {}  # key -> first name seen with it
+        self.keys = []  # key per fuzzy entry
+        self.countries = []  # normalized country per fuzzy entry ('' if unknown)
+        # key length -> trigram -> fuzzy entries
+        self.postings = defaultdict(lambda: defaultdict(list))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return self.find(name) is not None
+
+    def find(self, name, country=''):
+        """The known name that `name` duplicates, or None."""
+        key = dedup_key(name)
+        if key in self.names:
+            return self.names[key]
+        # The typo budget, cut down to what the similarity threshold allows.
+        k = min(max_edits(len(key)), int(len(key) * (1 - self.threshold) + 1e-9))
+        if not self.fuzzy or k == 0:
+            return None
+        grams = trigrams(key)
+        required = max(len(grams) - 3 * k, 1)
+        counts = Counter()
+        for length in range(len(key) - k, len(key) + k + 1):
+            postings = self.postings.get(length)
+            if postings:
+                for gram in grams:
+                    counts.update(postings.get(gram, ()))
+        country = normalize(country)
+        best = None
+        for entry, shared in counts.items():
+            if shared < required:
+                continue
+            other = self.keys[entry]
+            distance = levenshtein(key, other, k)
+            if distance > k or similarity(key, other, distance) < self.threshold:
+                continue
+            # Same-looking names in different countries are different cities.
+            if country and self.countries[entry] and country != self.countries[entry]:
+                continue
+            if best is None or distance < best[0]:
+                best = (distance, other)
+        return None if best is None else self.names[best[1]]
+
+    def add(self, name, country=''):
+        """
+        Remember `name` (in `country`, if known) unless it duplicates a known
+        name, which is returned instead. Returns None for a new name.
+        """
+        known = self.find(name, country)
+        if known is not None:
+            return known
+        key = dedup_key(name)
+        if not key:
+            return None
+        self.names[key] = name
+        if self.fuzzy:
+            entry = len(self.keys)
+            self.keys.append(key)
+            self.countries.append(normalize(country))
+            postings = self.postings[len(key)]
+            for gram in trigrams(key):
+                postings[gram].append(entry)
+        return None
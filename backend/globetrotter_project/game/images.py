@@ -0,0 +1,116 @@
+import hashlib
+import io
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+# Variant name -> maximum width in pixels.
+VARIANTS = {'thumb': 160, 'card': 480, 'full': 1080}
+# Variant used as the plain `src` for browsers that ignore srcset.
+DEFAULT_VARIANT = 'card'
+FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+
+
+class ImageFetchError(Exception):
+    """Raised when a source image cannot be fetched."""
+
+
+class HttpFetcher:
+    """Fetch source images over HTTP(S)."""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+
+    def fetch(self, url):
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return response.read()
+        except (OSError, ValueError) as exc:
+            raise ImageFetchError(f"Could not fetch {url}: {exc}") from exc
+
+
+class DirectoryFetcher:
+    """Stand-in fetcher that reads the file named by the URL's last path segment from a local directory."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def fetch(self, url):
+        name = Path(urlparse(url).path).name
+        try:
+            return (self.root / name).read_bytes()
+        except OSError as exc:
+            raise ImageFetchError(f"Could not read {name} from {self.root}: {exc}") from exc
+
+
+def image_root():
+    return Path(settings.IMAGE_CACHE_ROOT)
+
+
+def render_variants(source, image_format='webp'):
+    """
+    Resize `source` (image bytes) to every variant width and store the results
+    under content-hashed names. Returns {variant: relative path} plus 'widths',
+    the width each variant really has: images are never upscaled, so a small
+    source leaves the larger variants at its own width. Files that already
+    exist are not re-encoded.
+    """
+    from PIL import Image
+
+    pil_format, extension = FORMATS[image_format]
+    digest = hashlib.sha256(source).hexdigest()[:20]
+    directory = image_root() / digest[:2]
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    widths = {}
+    image = None
+    for variant, width in VARIANTS.items():
+        relative = f"{digest[:2]}/{digest}-{variant}.{extension}"
+        target = image_root() / relative
+        if not target.exists():
+            if image is None:
+                image = Image.open(io.BytesIO(source))
+                image = image.convert('RGB')
+            resized = image.copy()
+            resized.thumbnail((width, width * 4))
+            tmp = target.with_suffix('.tmp')
+            resized.save(tmp, format=pil_format, quality=80)
+            tmp.replace(target)
+        with Image.open(target) as rendered:  # only reads the header
+            widths[variant] = rendered.width
+        paths[variant] = relative
+    return {**paths, 'widths': widths}
+
+
+def variant_url(relative):
+    return f"{settings.IMAGE_CACHE_URL}{relative}"
+
+
+def is_current(variants, url):
+    """True if `variants` were rendered from `url` (and not from an older image_url)."""
+    return (
+        bool(url) and variants.get('source') == url
+        and all(name in variants and name in variants.get('widths', {}) for name in VARIANTS)
+    )
+
+
+def image_payload(destination):
+    """
+    Image fields for a round: `image_url` plus `image_srcset` when current
+    cached variants exist, otherwise the original hot-linked URL.
+    """
+    url = destination.get('image_url', '')
+    variants = destination.get('image_variants') or {}
+    if not is_current(variants, url):
+        return {'image_url': url}
+    # Advertise each file at its real width, once: variants capped by a small source
+    # would otherwise claim widths they don't have and be picked for larger slots.
+    candidates = {}
+    for name in VARIANTS:
+        candidates.setdefault(variants['widths'][name], variants[name])
+    return {
+        'image_url': variant_url(variants[DEFAULT_VARIANT]),
+        'image_srcset': ', '.join(f"{variant_url(path)} {width}w" for width, path in candidates.items()),
+    }
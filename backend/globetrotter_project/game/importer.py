@@ -0,0 +1,213 @@
+import codecs
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from . import changes
+from .dedup import Deduplicator
+from .models import CONTENT_FIELDS, CatalogChange, Destination, content_hash, location_fields
+
+# Fields rewritten when an existing destination is upserted.
+UPDATE_FIELDS = [f for f in CONTENT_FIELDS if f != 'city'] + ['content_hash', 'region', 'continent']
+
+
+def iter_records(fileobj, chunk_size=64 * 1024):
+    """
+    Yield JSON objects from `fileobj` one at a time.
+
+    Accepts either a single top-level JSON array or JSON Lines (one value per
+    line). Only the current chunk and the record being decoded are held in
+    memory, so the file size doesn't matter.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    in_array = None
+    # Incremental, so a multi-byte character split across two chunks still decodes.
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = fileobj.read(chunk_size)
+        text = utf8.decode(chunk, final=not chunk) if isinstance(chunk, bytes) else chunk
+        buffer = buffer[pos:] + text
+        pos = 0
+        eof = not chunk
+
+    while True:
+        # Skip whitespace (and array separators) between values.
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ',')):
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            fill()
+        if pos >= len(buffer):
+            return
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+            continue
+        if in_array and buffer[pos] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # A number or literal may continue in the next chunk; decode again with more data.
+            fill()
+            continue
+        pos = end
+        yield value
+
+
+def normalize(entry):
+    """Map a raw dataset entry onto Destination field values, or None if unusable."""
+    if not isinstance(entry, dict):
+        return None
+    city = (entry.get('city') or entry.get('name') or '').strip()
+    if not city:
+        return None
+    data = {
+        'city': city,
+        'country': entry.get('country') or '',
+        'clues': entry.get('clues') or [],
+        'fun_fact': entry.get('fun_fact') or '',
+        'trivia': entry.get('trivia') or [],
+        'image_url': entry.get('image_url') or '',
+    }
+    data['content_hash'] = content_hash(data)
+    # bulk_create skips Destination.save(), so derive these here too.
+    data.update(location_fields(data['country']))
+    return data
+
+
+def seeded_deduplicator(fuzzy=False):
+    """A Deduplicator that already knows every destination in the database."""
+    dedup = Deduplicator(fuzzy=fuzzy)
+    for city, country in Destination.objects.values_list('city', 'country').iterator(chunk_size=2000):
+        dedup.add(city, country)
+    return dedup
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: float = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def changed(self):
+        return self.created + self.updated
+
+
+class DestinationImporter:
+    """
+    Load destinations in batches with one SELECT and at most one INSERT per batch.
+
+    By default existing cities are left alone. With `update=True` rows whose
+    content hash differs are upserted; unchanged rows are skipped entirely.
+    With `atomic=True` the whole import runs in a single transaction,
+    otherwise each batch commits on its own. With a `dedup` Deduplicator
+    (see seeded_deduplicator()), records that are another spelling of a known
+    city are skipped and passed to `on_duplicate(record, known name)`.
+    """
+
+    def __init__(self, batch_size=1000, update=False, atomic=False, on_batch=None, dedup=None, on_duplicate=None):
+        self.batch_size = batch_size
+        self.update = update
+        self.atomic = atomic
+        self.on_batch = on_batch
+        self.dedup = dedup
+        self.on_duplicate = on_duplicate
+
+    def run(self, records):
+        stats = ImportStats()
+        if self.atomic:
+            with transaction.atomic():
+                self._run(records, stats)
+        else:
+            self._run(records, stats)
+        stats.finished = time.perf_counter()
+        return stats
+
+    def _run(self, records, stats):
+        batch = {}
+        for entry in records:
+            stats.read += 1
+            data = normalize(entry)
+            if data is None:
+                stats.invalid += 1
+                continue
+            if self.dedup is not None:
+                known = self.dedup.add(data['city'], data['country'])
+                # The same name again is an update (or a later duplicate in the file), not a new city.
+                if known is not None and known != data['city']:
+                    stats.duplicates += 1
+                    if self.on_duplicate:
+                        self.on_duplicate(data, known)
+                    continue
+            # Later duplicates of a city in the same batch win, as they would row by row.
+            batch[data['city']] = data
+            if len(batch) >= self.batch_size:
+                self._flush(batch, stats)
+                batch = {}
+        if batch:
+            self._flush(batch, stats)
+
+    def _flush(self, batch, stats):
+        with transaction.atomic():
+            existing = dict(
+                Destination.objects.filter(city__in=list(batch)).values_list('city', 'content_hash')
+            )
+            new_rows = [Destination(**data) for city, data in batch.items() if city not in existing]
+            changed_rows = []
+            if self.update:
+                changed_rows = [
+                    Destination(**data)
+                    for city, data in batch.items()
+                    if city in existing and existing[city] != data['content_hash']
+                ]
+            if new_rows:
+                # ignore_conflicts covers cities inserted concurrently since the SELECT above.
+                Destination.objects.bulk_create(new_rows, ignore_conflicts=True)
+            if changed_rows:
+                Destination.objects.bulk_create(
+                    changed_rows, update_conflicts=True, unique_fields=['city'], update_fields=UPDATE_FIELDS
+                )
+            if new_rows or changed_rows:
+                # bulk_create sends no signals, so log the changes for catalog sync here.
+                ids = dict(
+                    Destination.objects.filter(city__in=[row.city for row in new_rows + changed_rows])
+                    .values_list('city', 'id')
+                )
+                changes.record(CatalogChange.INSERT, [ids[row.city] for row in new_rows if row.city in ids])
+                changes.record(CatalogChange.UPDATE, [ids[row.city] for row in changed_rows if row.city in ids])
+        stats.batches += 1
+        stats.created += len(new_rows)
+        stats.updated += len(changed_rows)
+        stats.unchanged += len(batch) - len(new_rows) - len(changed_rows)
+        if self.on_batch:
+            self.on_batch(stats)
@@ -0,0 +1,259 @@
+import bisect
+import datetime
+import threading
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import POINTS_PER_CORRECT, Answer, GameSession, LeaderboardEntry
+
+WINDOWS = (LeaderboardEntry.ALL_TIME, LeaderboardEntry.DAILY, LeaderboardEntry.WEEKLY)
+ALL_TIME_PERIOD = datetime.date(1970, 1, 1)
+# Cache key bumped whenever any worker writes leaderboard rows.
+VERSION_KEY = 'game:leaderboard:version'
+# Re-read rows changed this long before the last sync to cover clock skew between workers.
+SYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+
+def period_start(window, now=None):
+    today = timezone.localdate(now or timezone.now())
+    if window == LeaderboardEntry.DAILY:
+        return today
+    if window == LeaderboardEntry.WEEKLY:
+        return today - datetime.timedelta(days=today.weekday())
+    return ALL_TIME_PERIOD
+
+
+def period_started_at(period):
+    """The moment `period` (a date from period_start) began, in the current time zone."""
+    return timezone.make_aware(datetime.datetime.combine(period, datetime.time.min))
+
+
+def window_scores(session_ids, periods):
+    """
+    {session id: {window: points}} scored by `session_ids` since the start of
+    each window's period, counted from their answers in one query.
+    """
+    started = {window: period_started_at(period) for window, period in periods.items()}
+    counts = (
+        Answer.objects.filter(session_id__in=session_ids, correct=True, answered_at__gte=min(started.values()))
+        .values('session_id')
+        .annotate(**{window: Count('pk', filter=Q(answered_at__gte=start)) for window, start in started.items()})
+    )
+    return {row['session_id']: {window: row[window] * POINTS_PER_CORRECT for window in started} for row in counts}
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+
+
+class FenwickTree:
+    """Counts per score with O(log n) prefix sums; grows as higher scores appear."""
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def _grow(self, index):
+        size = self.size
+        while size <= index:
+            size *= 2
+        counts = [self.count_at(i) for i in range(self.size)]
+        self.size = size
+        self.tree = [0] * (size + 1)
+        for i, count in enumerate(counts):
+            if count:
+                self.add(i, count)
+
+    def add(self, index, delta):
+        if index >= self.size:
+            self._grow(index)
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index):
+        """Sum of counts for scores 0..index inclusive."""
+        i = min(index, self.size - 1) + 1
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def count_at(self, index):
+        return self.prefix(index) - (self.prefix(index - 1) if index > 0 else 0)
+
+
+class RankIndex:
+    """
+    In-memory ranking for one leaderboard window.
+
+    A Fenwick tree over scores answers "how many players scored more" in
+    O(log max_score); a sorted list of distinct scores plus per-score buckets
+    (ordered by who got there first) serve the top N without a full sort.
+    Ties share a rank.
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.counts = FenwickTree()
+        self.total = 0
+        self._distinct = []
+        self._buckets = defaultdict(list)
+
+    def __len__(self):
+        return self.total
+
+    def update(self, player, score, achieved_at):
+        """Record `score` for `player` if it beats their current best."""
+        current = self.scores.get(player)
+        if current is not None:
+            if score <= current[0]:
+                return False
+            self._remove(player, current)
+        entry = (score, achieved_at)
+        self.scores[player] = entry
+        self.counts.add(score, 1)
+        self.total += 1
+        bucket = self._buckets[score]
+        if not bucket:
+            bisect.insort(self._distinct, score)
+        bisect.insort(bucket, (achieved_at, player))
+        return True
+
+    def _remove(self, player, entry):
+        score, achieved_at = entry
+        self.counts.add(score, -1)
+        self.total -= 1
+        bucket = self._buckets[score]
+        bucket.pop(bisect.bisect_left(bucket, (achieved_at, player)))
+        if not bucket:
+            del self._buckets[score]
+            self._distinct.pop(bisect.bisect_left(self._distinct, score))
+
+    def rank(self, player):
+        """Return (rank, score) for `player`, or None if they have no score."""
+        entry = self.scores.get(player)
+        if entry is None:
+            return None
+        return self.total - self.counts.prefix(entry[0]) + 1, entry[0]
+
+    def top(self, n):
+        """Return [(rank, player, score)] for the best `n` players."""
+        result = []
+        ahead = 0
+        for score in reversed(self._distinct):
+            bucket = self._buckets[score]
+            for _achieved_at, player in bucket[:n - len(result)]:
+                result.append((ahead + 1, player, score))
+            if len(result) >= n:
+                break
+            ahead += len(bucket)
+        return result
+
+
+class Leaderboard:
+    """Per-process registry of RankIndex objects, kept in sync through LeaderboardEntry."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+
+    def _load(self, window, period):
+        index = RankIndex()
+        rows = LeaderboardEntry.objects.filter(window=window, period=period).values_list(
+            'player', 'best_score', 'achieved_at'
+        )
+        for player, score, achieved_at in rows.iterator(chunk_size=10000):
+            index.update(player, score, achieved_at)
+        return index
+
+    def get(self, window, now=None):
+        """Return the up-to-date RankIndex for the current period of `window`."""
+        period = period_start(window, now)
+        key = (window, period)
+        version = cache.get(VERSION_KEY, 0)
+        with self._lock:
+            state = self._indexes.get(key)
+            if state is None:
+                synced_at = timezone.now()
+                state = self._indexes[key] = [self._load(window, period), version, synced_at]
+                # Only the current period is needed; drop stale ones so memory stays bounded.
+                for stale in [k for k in self._indexes if k[0] == window and k[1] != period]:
+                    del self._indexes[stale]
+            elif state[1] != version:
+                self._sync(key, state, version)
+            return state[0]
+
+    def _sync(self, key, state, version):
+        index, _old_version, synced_at = state
+        now = timezone.now()
+        rows = LeaderboardEntry.objects.filter(
+            window=key[0], period=key[1], achieved_at__gte=synced_at - SYNC_OVERLAP
+        ).values_list('player', 'best_score', 'achieved_at')
+        for player, score, achieved_at in rows:
+            index.update(player, score, achieved_at)
+        state[1] = version
+        state[2] = now
+
+    def _apply(self, entries):
+        # Runs after the flush commits: update this worker's indexes directly and
+        # let the others pick the rows up on their next read.
+        with self._lock:
+            for entry in entries:
+                state = self._indexes.get((entry.window, entry.period))
+                if state is not None:
+                    state[0].update(entry.player, entry.best_score, entry.achieved_at)
+        bump_version()
+
+    def record(self, session_ids, now=None):
+        """
+        Push the scores of `session_ids` into every window, writing only rows
+        that improve a player's best: the session total for all-time, and the
+        points scored since the period began for the daily and weekly boards.
+        Called when answers are flushed, after they are written.
+        """
+        now = now or timezone.now()
+        sessions = list(
+            GameSession.objects.filter(pk__in=session_ids).exclude(username='').values_list('pk', 'username', 'score')
+        )
+        if not sessions:
+            return 0
+        periods = {window: period_start(window, now) for window in WINDOWS}
+        scored = window_scores([pk for pk, _player, _score in sessions], {
+            window: period for window, period in periods.items() if window != LeaderboardEntry.ALL_TIME
+        })
+        best = defaultdict(dict)
+        for pk, player, score in sessions:
+            scores = {**scored.get(pk, {}), LeaderboardEntry.ALL_TIME: score}
+            for window in WINDOWS:
+                best[window][player] = max(scores.get(window, 0), best[window].get(player, 0))
+        improved = []
+        for window, period in periods.items():
+            existing = dict(
+                LeaderboardEntry.objects.filter(window=window, period=period, player__in=list(best[window]))
+                .values_list('player', 'best_score')
+            )
+            improved.extend(
+                LeaderboardEntry(window=window, period=period, player=player, best_score=score, achieved_at=now)
+                for player, score in best[window].items()
+                if score > existing.get(player, -1)
+            )
+        if improved:
+            LeaderboardEntry.objects.bulk_create(
+                improved, update_conflicts=True,
+                unique_fields=['window', 'period', 'player'], update_fields=['best_score', 'achieved_at'],
+            )
+            transaction.on_commit(lambda: self._apply(improved))
+        return len(improved)
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,114 @@
+import json
+import tempfile
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from game import benchmarking, catalog
+from game.pool import round_pool
+from game.scoring import answer_buffer
+
+# Committed reference numbers; refresh with --save-baseline after an intended change.
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'bench' / 'baseline.json'
+
+
+def csv_list(value, cast=str):
+    return [cast(part) for part in value.split(',') if part.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the game endpoints against a throwaway test database seeded with '
+        'synthetic destinations, and compare latency and query counts with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated catalog sizes to seed.')
+        parser.add_argument(
+            '--endpoints', default=','.join(benchmarking.ENDPOINTS),
+            help='Comma-separated endpoints to drive.',
+        )
+        parser.add_argument(
+            '--drivers', default='client,wsgi',
+            help='client = in-process test client, wsgi = real threaded WSGI server over HTTP, '
+                 'asgi = uvicorn serving the async views over HTTP.',
+        )
+        parser.add_argument('--concurrency', default='1,8', help='Comma-separated worker thread counts.')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint and setting.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='Baseline JSON to compare with.')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Allowed fractional slowdown of p95 latency and response size before flagging a regression.',
+        )
+        parser.add_argument('--fail-on-regression', action='store_true', help='Exit with an error on regressions.')
+        parser.add_argument('--json', type=Path, help='Also write the raw results to this file.')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs.')
+
+    def handle(self, *args, **options):
+        endpoints = csv_list(options['endpoints'])
+        drivers = csv_list(options['drivers'])
+        unknown = set(endpoints) - set(benchmarking.ENDPOINTS) | set(drivers) - set(benchmarking.DRIVERS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints or drivers: {', '.join(sorted(unknown))}")
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+
+        self.stdout.write(
+            f"{'endpoint':<12} {'driver':<6} {'size':>7} {'conc':>4} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'bytes':>8} {'errors':>6}"
+        )
+
+        def report(r):
+            self.stdout.write(
+                f"{r.endpoint:<12} {r.driver:<6} {r.size:>7} {r.concurrency:>4} {r.rps:>8.1f} {r.p50_ms:>8.2f} "
+                f"{r.p95_ms:>8.2f} {r.p99_ms:>8.2f} {r.queries_per_request:>7.2f} {r.bytes_per_request:>8.0f} "
+                f"{r.errors:>6}"
+            )
+
+        # Keep pooled rounds topped up the way wsgi.py does.
+        round_pool.start()
+        tmp = tempfile.TemporaryDirectory()
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # A file rather than shared-cache memory, so server threads wait on locks instead of failing.
+            test_settings['NAME'] = str(Path(tmp.name) / 'bench.sqlite3')
+        # Never seed the real database or publish snapshots for synthetic data.
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            # Every simulated player comes from 127.0.0.1: measure the endpoints, not the limiter.
+            with override_settings(SNAPSHOT_ROOT=tmp.name, ALLOWED_HOSTS=['*'], GAME_RATE_LIMITS={}):
+                results = benchmarking.run_suite(
+                    csv_list(options['sizes'], int), endpoints, drivers,
+                    csv_list(options['concurrency'], int), options['requests'],
+                    seed=options['seed'], on_result=report,
+                )
+                answer_buffer.clear()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            # The seeded catalog may sit in a shared cache; move every worker off it.
+            catalog.bump_version()
+            tmp.cleanup()
+
+        if options['json']:
+            options['json'].write_text(json.dumps(benchmarking.to_baseline(results), indent=2) + '\n')
+        if options['save_baseline']:
+            options['baseline'].parent.mkdir(parents=True, exist_ok=True)
+            options['baseline'].write_text(json.dumps(benchmarking.to_baseline(results), indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+            return
+        if not options['baseline'].exists():
+            self.stdout.write(f"No baseline at {options['baseline']}; skipping comparison.")
+            return
+
+        regressions = benchmarking.compare(
+            results, json.loads(options['baseline'].read_text()), options['tolerance']
+        )
+        for line in regressions:
+            self.stdout.write(self.style.WARNING(f"Regression: {line}"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+        elif options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
@@ -0,0 +1,45 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from game.leaderboard import RankIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark leaderboard rank and top-N lookups as the number of players grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='Comma-separated player counts.')
+        parser.add_argument('--queries', type=int, default=20000, help='Lookups timed per size.')
+        parser.add_argument('--max-score', type=int, default=5000, help='Scores are drawn from 0..max-score.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queries = options['queries']
+        now = timezone.now()
+        self.stdout.write(f"{'players':>10} {'build s':>9} {'rank us':>9} {'top10 us':>9} {'update us':>10}")
+        for size in (int(s) for s in options['sizes'].split(',')):
+            index = RankIndex()
+            started = time.perf_counter()
+            for i in range(size):
+                index.update(f"player{i}", rng.randint(0, options['max_score']), now)
+            build = time.perf_counter() - started
+
+            players = [f"player{rng.randrange(size)}" for _ in range(queries)]
+            started = time.perf_counter()
+            for player in players:
+                index.rank(player)
+            rank_us = (time.perf_counter() - started) / queries * 1e6
+
+            started = time.perf_counter()
+            for _ in range(queries):
+                index.top(10)
+            top_us = (time.perf_counter() - started) / queries * 1e6
+
+            started = time.perf_counter()
+            for player in players:
+                index.update(player, index.scores[player][0] + 1, now)
+            update_us = (time.perf_counter() - started) / queries * 1e6
+
+            self.stdout.write(f"{size:>10} {build:>9.2f} {rank_us:>9.2f} {top_us:>9.2f} {update_us:>10.2f}")
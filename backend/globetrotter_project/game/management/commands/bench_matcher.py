@@ -0,0 +1,65 @@
+import random
+import string
+import time
+from django.core.management.base import BaseCommand
+from game.matcher import CityMatcher
+
+CONSONANTS = 'bcdfghjklmnprstvwz'
+VOWELS = 'aeiou'
+
+
+def fake_city(rng):
+    words = []
+    for _ in range(rng.randint(1, 2)):
+        syllables = (
+            rng.choice(CONSONANTS) + rng.choice(VOWELS) + (rng.choice('nrsl') if rng.random() < 0.3 else '')
+            for _ in range(rng.randint(2, 4))
+        )
+        words.append(''.join(syllables).capitalize())
+    return ' '.join(words)
+
+
+def typo(name, rng):
+    i = rng.randrange(len(name))
+    return name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark typed-answer matching as the number of city names grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated name counts.')
+        parser.add_argument('--queries', type=int, default=5000, help='Lookups timed per size.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queries = options['queries']
+        self.stdout.write(f"{'names':>10} {'build s':>9} {'exact us':>9} {'typo us':>9} {'typo p99':>9} {'found %':>8}")
+        for size in (int(s) for s in options['sizes'].split(',')):
+            destinations = [{'id': pk, 'city': fake_city(rng), 'country': ''} for pk in range(1, size + 1)]
+            started = time.perf_counter()
+            matcher = CityMatcher(destinations)
+            build = time.perf_counter() - started
+
+            sample = [rng.choice(destinations) for _ in range(queries)]
+            started = time.perf_counter()
+            for destination in sample:
+                matcher.match(destination['city'])
+            exact_us = (time.perf_counter() - started) / queries * 1e6
+
+            timings = []
+            found = 0
+            for destination in sample:
+                guess = typo(destination['city'], rng)
+                started = time.perf_counter()
+                found += matcher.check(guess, destination)[0]
+                matcher.match(guess)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            typo_us = sum(timings) / queries * 1e6
+            p99_us = timings[int(queries * 0.99)] * 1e6
+
+            self.stdout.write(
+                f"{size:>10} {build:>9.2f} {exact_us:>9.2f} {typo_us:>9.2f} {p99_us:>9.2f} {100 * found / queries:>8.1f}"
+            )
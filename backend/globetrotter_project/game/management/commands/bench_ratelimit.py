@@ -0,0 +1,125 @@
+import statistics
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from game import ratelimit
+
+# Generous enough that nothing is refused unless a scenario asks for it.
+OPEN_LIMITS = {'bench': {'ip': '1000000000/m', 'session': '1000000000/m'}}
+
+
+def per_call_us(function, calls, repeat):
+    """Median microseconds per call of `function(i)` over `repeat` runs of `calls` calls."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for i in range(calls):
+            function(i)
+        runs.append((time.perf_counter() - started) / calls * 1e6)
+    return statistics.median(runs)
+
+
+def view(request):
+    return HttpResponse('ok')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the rate limiter's overhead: a check, the decorator around a trivial view, "
+        'a counter sync and, for comparison, a limiter that asks the cache on every request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=100000, help='Calls timed per run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the median is reported.')
+        parser.add_argument('--clients', type=int, default=10000, help='Distinct client addresses to spread calls over.')
+        parser.add_argument('--threads', type=int, default=8, help='Threads for the contended check.')
+
+    def handle(self, *args, **options):
+        if min(options['calls'], options['repeat'], options['clients'], options['threads']) < 1:
+            raise CommandError('--calls, --repeat, --clients and --threads must be at least 1.')
+        calls, repeat, clients = options['calls'], options['repeat'], options['clients']
+        limiter = ratelimit.RateLimiter()
+        addresses = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(clients)]
+        rows = []
+
+        rows.append(('check, allowed', per_call_us(
+            lambda i: limiter.check('bench:ip', addresses[i % clients], 10 ** 9, 60), calls, repeat,
+        )))
+        limiter.clear()
+        rows.append(('check, refused', per_call_us(
+            lambda i: limiter.check('bench:ip', addresses[i % 10], 1, 60), calls, repeat,
+        )))
+        rows.append((f'check, {options["threads"]} threads', self.contended(options, addresses)))
+
+        factory = RequestFactory()
+        requests = [
+            factory.get('/', REMOTE_ADDR=address, HTTP_COOKIE=f'sessionid=s{i}') for i, address in enumerate(addresses)
+        ]
+        limited = ratelimit.rate_limit('bench')(view)
+        with override_settings(GAME_RATE_LIMITS=OPEN_LIMITS):
+            bare = per_call_us(lambda i: view(requests[i % clients]), calls, repeat)
+            # Keep the module limiter's syncs out of the per-request numbers; they are timed below.
+            interval = ratelimit.rate_limiter.sync_interval
+            ratelimit.rate_limiter.sync_interval = float('inf')
+            ratelimit.rate_limiter.sync()
+            try:
+                decorated = per_call_us(lambda i: limited(requests[i % clients]), calls, repeat)
+            finally:
+                ratelimit.rate_limiter.sync_interval = interval
+                ratelimit.rate_limiter.clear()
+        rows.append(('decorator (ip + session)', decorated - bare))
+
+        limiter.clear()
+        for address in addresses:
+            limiter.check('bench:ip', address, 10 ** 9, 60)
+        started = time.perf_counter()
+        limiter.sync()
+        sync_ms = (time.perf_counter() - started) * 1000
+        window = int(time.time() // 60)
+        cache.delete_many([ratelimit.cache_key(('bench:ip', address), window) for address in addresses])
+
+        def cache_per_request(i):
+            key = f'game:ratelimit:bench:{addresses[i % clients]}'
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 1, timeout=120)
+
+        naive = per_call_us(cache_per_request, min(calls, 20000), repeat)
+        cache.delete_many([f'game:ratelimit:bench:{address}' for address in addresses])
+        rows.append(('cache incr per request', naive))
+
+        self.stdout.write(f"{'measurement':<28} {'us/request':>10}")
+        for name, value in rows:
+            self.stdout.write(f'{name:<28} {value:>10.2f}')
+        self.stdout.write(
+            f'sync of {clients} clients: {sync_ms:.1f} ms, off the request path, '
+            f'every {ratelimit.rate_limiter.sync_interval:g} s per worker'
+        )
+
+    def contended(self, options, addresses):
+        """Microseconds per check with every thread checking at once, from one shared limiter."""
+        limiter = ratelimit.RateLimiter()
+        threads, calls, clients = options['threads'], options['calls'], len(addresses)
+        barrier = threading.Barrier(threads + 1)
+
+        def work(offset):
+            barrier.wait()
+            for i in range(offset, offset + calls // threads):
+                limiter.check('bench:ip', addresses[i % clients], 10 ** 9, 60)
+
+        workers = [threading.Thread(target=work, args=(n * calls,)) for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        barrier.wait()
+        for worker in workers:
+            worker.join()
+        return (time.perf_counter() - started) / (calls // threads * threads) * 1e6
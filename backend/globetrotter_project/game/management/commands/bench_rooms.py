@@ -0,0 +1,208 @@
+import asyncio
+import json
+import resource
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from game import benchmarking, catalog, rooms
+
+try:
+    import websockets
+except ImportError:  # only needed to load-test a running server with --url
+    websockets = None
+
+
+class Tracker:
+    """Counts frames by message type and times when each socket got the one being waited for."""
+
+    def __init__(self):
+        self.frames = 0
+        self.waiting = None
+        self.expected = 0
+        self.latencies = []
+        self.started = 0.0
+        self.done = asyncio.Event()
+
+    def expect(self, message_type, count):
+        # Every message starts with its type (see rooms.dumps).
+        self.waiting = f'{{"type":"{message_type}"'
+        self.expected = count
+        self.latencies = []
+        self.done.clear()
+        self.started = time.perf_counter()
+
+    def frame(self, text):
+        self.frames += 1
+        if self.waiting and text.startswith(self.waiting):
+            self.latencies.append(time.perf_counter() - self.started)
+            if len(self.latencies) == self.expected:
+                self.done.set()
+
+    async def wait(self, timeout):
+        await asyncio.wait_for(self.done.wait(), timeout)
+        return self.latencies
+
+
+class MemorySocket:
+    """The client end of a socket served in this process by rooms.serve, with no network in between."""
+
+    def __init__(self, tracker, path, name):
+        self.tracker = tracker
+        self.inbox = asyncio.Queue()
+        scope = {'type': 'websocket', 'path': path, 'query_string': f'name={name}'.encode()}
+        self.inbox.put_nowait({'type': 'websocket.connect'})
+        self.task = asyncio.ensure_future(rooms.serve(scope, self.inbox.get, self.receive))
+
+    async def receive(self, event):
+        if event['type'] == 'websocket.send':
+            self.tracker.frame(event['text'])
+
+    async def send(self, text):
+        self.inbox.put_nowait({'type': 'websocket.receive', 'text': text})
+
+    async def close(self):
+        self.inbox.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+        await self.task
+
+
+class NetworkSocket:
+    """A real WebSocket to a running server."""
+
+    def __init__(self, tracker, socket):
+        self.tracker = tracker
+        self.socket = socket
+        self.task = asyncio.ensure_future(self.read())
+
+    @classmethod
+    async def open(cls, tracker, url):
+        return cls(tracker, await websockets.connect(url, max_queue=None, open_timeout=60))
+
+    async def read(self):
+        async for text in self.socket:
+            self.tracker.frame(text)
+
+    async def send(self, text):
+        await self.socket.send(text)
+
+    async def close(self):
+        await self.socket.close()
+        await self.task
+
+
+def ms(seconds):
+    return seconds * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test multiplayer rooms: open many sockets, play rounds in every room and '
+        'time how long each broadcast takes to reach every player'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=5000, help='Concurrent sockets.')
+        parser.add_argument('--players', type=int, default=4, help='Players per room.')
+        parser.add_argument('--rounds', type=int, default=5, help='Rounds played in every room.')
+        parser.add_argument('--destinations', type=int, default=1000, help='Synthetic destinations to seed.')
+        parser.add_argument(
+            '--url',
+            help='Drive a running ASGI server (e.g. ws://localhost:8000) over real sockets instead of '
+                 'serving the rooms in this process; needs the websockets package.',
+        )
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for each phase.')
+
+    def handle(self, *args, **options):
+        if options['sockets'] < 1 or options['players'] < 1:
+            raise CommandError('--sockets and --players must be at least 1.')
+        if options['url']:
+            if websockets is None:
+                raise CommandError('--url needs the websockets package.')
+            results = asyncio.run(self.run(options))
+            self.report(options, results)
+            return
+
+        tmp = tempfile.TemporaryDirectory()
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            test_settings['NAME'] = str(Path(tmp.name) / 'bench.sqlite3')
+        # Never seed the real database.
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            benchmarking.seed_destinations(options['destinations'])
+            catalog.get_catalog()
+            with override_settings(GAME_ROOM_MAX_PLAYERS=options['players'], GAME_ROOM_ROUND_SECONDS=options['timeout']):
+                results = asyncio.run(self.run(options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            catalog.bump_version()
+            tmp.cleanup()
+        self.report(options, results)
+
+    async def run(self, options):
+        tracker = Tracker()
+        count, per_room = options['sockets'], options['players']
+        room_count = -(-count // per_room)
+        codes = [f'bench{i:06d}' for i in range(room_count)]
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        tracker.expect('joined', count)
+        if options['url']:
+            base = options['url'].rstrip('/')
+            sockets = await asyncio.gather(*(
+                NetworkSocket.open(tracker, f'{base}/ws/rooms/{codes[i // per_room]}?name=p{i}') for i in range(count)
+            ))
+        else:
+            sockets = [MemorySocket(tracker, f'/ws/rooms/{codes[i // per_room]}', f'p{i}') for i in range(count)]
+        connect = max(await tracker.wait(options['timeout']))
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        leaders = sockets[::per_room]
+
+        round_latencies, result_latencies = [], []
+        frames_before, started = tracker.frames, time.perf_counter()
+        start = json.dumps({'type': 'start'})
+        answer = json.dumps({'type': 'answer', 'guess': 'Bench City 0000000'})
+        for _ in range(options['rounds']):
+            tracker.expect('round', count)
+            await asyncio.gather(*(socket.send(start) for socket in leaders))
+            round_latencies += await tracker.wait(options['timeout'])
+            tracker.expect('result', count)
+            await asyncio.gather(*(socket.send(answer) for socket in sockets))
+            result_latencies += await tracker.wait(options['timeout'])
+        elapsed = time.perf_counter() - started
+        frames = tracker.frames - frames_before
+
+        await asyncio.gather(*(socket.close() for socket in sockets))
+        return {
+            'rooms': room_count,
+            'connect_s': connect,
+            # Only meaningful in-process: the server's memory is measured here.
+            'kb_per_socket': None if options['url'] else rss / count,
+            'round': round_latencies,
+            'result': result_latencies,
+            'frames_per_s': frames / elapsed,
+        }
+
+    def report(self, options, results):
+        def percentiles(latencies):
+            latencies = sorted(latencies)
+            return ms(statistics.median(latencies)), ms(latencies[int(len(latencies) * 0.99)])
+
+        round_p50, round_p99 = percentiles(results['round'])
+        result_p50, result_p99 = percentiles(results['result'])
+        self.stdout.write(
+            f"{'sockets':>8} {'rooms':>6} {'connect s':>9} {'KB/sock':>8} {'round p50':>9} {'round p99':>9} "
+            f"{'result p50':>10} {'result p99':>10} {'frames/s':>9}"
+        )
+        kb = results['kb_per_socket']
+        self.stdout.write(
+            f"{options['sockets']:>8} {results['rooms']:>6} {results['connect_s']:>9.2f} "
+            f"{'-' if kb is None else f'{kb:.1f}':>8} {round_p50:>9.1f} {round_p99:>9.1f} "
+            f"{result_p50:>10.1f} {result_p99:>10.1f} {results['frames_per_s']:>9.0f}"
+        )
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from game import catalog, changes, images
+from game.models import CatalogChange, Destination
+
+
+class Command(BaseCommand):
+    help = 'Download destination images and store resized, content-hashed variants for local serving'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source-dir',
+            help='Read images from this directory (by URL file name) instead of downloading them.',
+        )
+        parser.add_argument('--format', choices=sorted(images.FORMATS), default='webp', help='Output image format.')
+        parser.add_argument('--force', action='store_true', help='Re-process images that are already cached.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Rows per bulk UPDATE.')
+
+    def handle(self, *args, **options):
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            raise CommandError('Pillow is required to resize images: pip install Pillow')
+        if options['source_dir']:
+            fetcher = images.DirectoryFetcher(options['source_dir'])
+        else:
+            fetcher = images.HttpFetcher()
+
+        pending = []
+        cached = failed = 0
+        queryset = Destination.objects.exclude(image_url='').only('id', 'city', 'image_url', 'image_variants')
+        for destination in queryset.iterator(chunk_size=options['batch_size']):
+            if not options['force'] and images.is_current(destination.image_variants, destination.image_url):
+                continue
+            try:
+                source = fetcher.fetch(destination.image_url)
+                variants = images.render_variants(source, options['format'])
+            except (images.ImageFetchError, OSError) as exc:
+                failed += 1
+                self.stderr.write(f"Skipped {destination.city}: {exc}")
+                continue
+            destination.image_variants = {'source': destination.image_url, **variants}
+            pending.append(destination)
+            cached += 1
+            if len(pending) >= options['batch_size']:
+                self.save(pending)
+                pending = []
+        if pending:
+            self.save(pending)
+        if cached:
+            catalog.bump_version()
+        self.stdout.write(self.style.SUCCESS(f"Cached images for {cached} destinations ({failed} failed)."))
+
+    def save(self, destinations):
+        Destination.objects.bulk_update(destinations, ['image_variants'])
+        # Image URLs are part of the public catalog, so clients sync them too.
+        changes.record(CatalogChange.UPDATE, [destination.pk for destination in destinations])
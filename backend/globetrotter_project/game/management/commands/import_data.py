@@ -1,38 +1,68 @@
-import json
 from pathlib import Path
-from django.core.management.base import BaseCommand
-from game.models import Destination
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from game import catalog, snapshots
+from game.importer import DestinationImporter, iter_records, seeded_deduplicator
+
+# scripts/expanded_dataset.json at the repository root (BASE_DIR is backend/globetrotter_project).
+DEFAULT_PATH = Path(settings.BASE_DIR).parents[1] / 'scripts' / 'expanded_dataset.json'
+
 
 class Command(BaseCommand):
-    help = 'Import destinations from expanded_dataset.json'
-
-    def handle(self, *args, **kwargs):
-        # __file__ is at:
-        # C:\GLOBETROTTER\backend\globetrotter_project\game\management\commands\import_data.py
-        # We need to reach the root folder: C:\GLOBETROTTER
-        # Go up 5 levels:
-        root_dir = Path(__file__).resolve().parents[5]
-        json_path = root_dir / 'scripts' / 'expanded_dataset.json'
-        
-        self.stdout.write(f"Looking for JSON file at: {json_path}")
-        
+    help = 'Import destinations from a JSON array or JSON Lines file (default: scripts/expanded_dataset.json)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=Path, default=DEFAULT_PATH, help='Dataset file to import.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk INSERT.')
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Upsert existing cities whose content changed instead of skipping them.',
+        )
+        parser.add_argument(
+            '--atomic', action='store_true',
+            help='Run the whole import in one transaction instead of committing per batch.',
+        )
+        parser.add_argument(
+            '--dedup', choices=['exact', 'fuzzy'],
+            help='Skip cities that are another spelling of a known one: exact ignores accents, case and '
+                 'aliases ("Kyōto", "NYC"); fuzzy also catches likely typos.',
+        )
+
+    def handle(self, *args, **options):
+        json_path = options['path']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        self.stdout.write(f"Importing destinations from: {json_path}")
+
+        def report(stats):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"Batch {stats.batches}: {stats.read} rows read")
+
+        def report_duplicate(record, known):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"Skipped {record['city']}: same city as {known}")
+
+        importer = DestinationImporter(
+            batch_size=options['batch_size'],
+            update=options['update'],
+            atomic=options['atomic'],
+            on_batch=report,
+            dedup=seeded_deduplicator(options['dedup'] == 'fuzzy') if options['dedup'] else None,
+            on_duplicate=report_duplicate,
+        )
         try:
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-                for entry in data:
-                    destination, created = Destination.objects.get_or_create(
-                        city=entry.get('city'),
-                        defaults={
-                            'country': entry.get('country', ''),
-                            'clues': entry.get('clues', []),
-                            'fun_fact': entry.get('fun_fact', ''),
-                            'trivia': entry.get('trivia', []),
-                            'image_url': entry.get('image_url', ''),
-                        }
-                    )
-                    if created:
-                        self.stdout.write(f"Imported: {destination.city}")
-                    else:
-                        self.stdout.write(f"Skipped (exists): {destination.city}")
+            with open(json_path, 'rb') as f:
+                stats = importer.run(iter_records(f))
         except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f"File not found: {json_path}"))
+            raise CommandError(f"File not found: {json_path}")
+        except ValueError as exc:
+            raise CommandError(f"Invalid JSON in {json_path}: {exc}")
+
+        if stats.changed:
+            catalog.bump_version()
+            snapshots.build_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {stats.read} rows in {stats.elapsed:.2f}s ({stats.rows_per_second:.0f} rows/sec): "
+            f"{stats.created} created, {stats.updated} updated, {stats.unchanged} unchanged, "
+            f"{stats.invalid} invalid, {stats.duplicates} duplicates."
+        ))
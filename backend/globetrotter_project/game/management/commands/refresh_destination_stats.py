@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from game import catalog
+from game.stats import refresh_destination_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute destination popularity and difficulty from recorded answers (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk UPDATE.')
+
+    def handle(self, *args, **options):
+        changed = refresh_destination_stats(options['batch_size'])
+        if changed:
+            # Difficulty is part of the cached catalog used to pick rounds.
+            catalog.bump_version()
+        self.stdout.write(self.style.SUCCESS(f"Updated stats for {changed} destinations."))
@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter, so nothing this command already imported is counted.
+CHILD = """
+import json, time
+started = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+settings_loaded = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+app_loaded = time.perf_counter()
+from game import startup
+startup.warm_up()
+print(json.dumps({
+    'phases': [['settings', settings_loaded - started], ['application', app_loaded - settings_loaded]],
+    'steps': startup.timings,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """{top-level package: cumulative seconds} from `python -X importtime` output."""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _self, cumulative, name = line.split(':', 1)[1].split('|')
+        if name[1:].startswith(' ') or not cumulative.strip().isdigit():
+            continue  # nested import, or the header row
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(cumulative) / 1e6
+    return packages
+
+
+class Command(BaseCommand):
+    help = 'Report how long a fresh process takes to import its modules, load the app and warm up'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='Slowest top-level imports to list.')
+        parser.add_argument('--json', action='store_true', help='Print the raw timings as JSON.')
+
+    def handle(self, *args, **options):
+        # Warm up as a preloading gunicorn master would: no background threads.
+        env = {**os.environ, 'GAME_PRELOAD': 'True'}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Start-up failed:\n{result.stderr[-2000:]}")
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        timings['imports'] = sorted(parse_importtime(result.stderr).items(), key=lambda item: -item[1])
+        if options['json']:
+            self.stdout.write(json.dumps(timings, indent=2))
+            return
+
+        self.stdout.write(f"{'phase':<28} {'ms':>9}")
+        for name, seconds in timings['phases']:
+            self.stdout.write(f"{name:<28} {seconds * 1000:>9.1f}")
+        for name, seconds in timings['steps']:
+            self.stdout.write(f"{'warm-up: ' + name:<28} {seconds * 1000:>9.1f}")
+        total = sum(seconds for _name, seconds in timings['phases'] + timings['steps'])
+        self.stdout.write(f"{'total':<28} {total * 1000:>9.1f}")
+        self.stdout.write(f"\n{'import':<28} {'ms':>9}")
+        for name, seconds in timings['imports'][:options['top']]:
+            self.stdout.write(f"{name:<28} {seconds * 1000:>9.1f}")
@@ -0,0 +1,192 @@
+"""
+Typo-tolerant matching of typed city guesses against the catalog, used by
+rounds.check_answer in typed mode. One CityMatcher is built per catalog
+version and swapped in from a background thread when the catalog changes.
+"""
+import threading
+from array import array
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+
+from . import catalog
+from .names import ALIASES, levenshtein, max_edits, normalize, similarity, trigrams
+
+# Typed guesses below this confidence are wrong even if within the typo budget.
+CONFIDENCE_THRESHOLD = 0.75
+
+
+class Match(NamedTuple):
+    destination_id: int
+    name: str
+    confidence: float
+
+
+class CityMatcher:
+    """
+    Typo-tolerant lookup of city names for one catalog version.
+
+    Every name (city, alias and word-swapped forms) is normalized once. An
+    exact dictionary lookup answers most guesses; otherwise an inverted
+    trigram index, partitioned by name length, finds names of a plausible
+    length that share enough trigrams with the guess. Only
+    those are verified with a banded Levenshtein distance, which keeps
+    lookups under a millisecond at 100k names.
+    """
+
+    def __init__(self, destinations, source=None):
+        self.source = source  # the Catalog the names were read from
+        self.names = []  # normalized name per name id
+        self.owners = array('q')  # destination id per name id
+        self.exact = defaultdict(list)  # normalized name -> name ids
+        # Postings are split by name length so a lookup only scans names that
+        # could be within the typo budget: length -> trigram -> name ids.
+        self.postings = defaultdict(lambda: defaultdict(lambda: array('I')))
+        self.countries = set()
+        canonical = defaultdict(list)
+        for destination in destinations:
+            city = normalize(destination['city'])
+            canonical[city].append(destination['id'])
+            self._add(city, destination['id'])
+            if city.endswith(' city') and len(city) > 5:
+                self._add(city[:-5], destination['id'])
+            if destination.get('country'):
+                self.countries.add(normalize(destination['country']))
+        for alias, city in ALIASES.items():
+            for pk in canonical.get(city, ()):
+                self._add(alias, pk)
+        self.exact = dict(self.exact)
+        self.postings = {length: dict(grams) for length, grams in self.postings.items()}
+
+    def _add(self, name, pk):
+        if any(self.owners[name_id] == pk for name_id in self.exact.get(name, ())):
+            return
+        name_id = len(self.names)
+        self.exact[name].append(name_id)
+        self.names.append(name)
+        self.owners.append(pk)
+        postings = self.postings[len(name)]
+        for gram in trigrams(name):
+            postings[gram].append(name_id)
+
+    def split_guess(self, guess):
+        """(city part, country part or '') of a guess like "Kyoto, Japan" or "Kyoto Japan"."""
+        text = normalize(guess)
+        if ',' in guess:
+            city, _, country = guess.partition(',')
+            return normalize(city), normalize(country)
+        words = text.split()
+        for size in (3, 2, 1):
+            if len(words) > size and ' '.join(words[-size:]) in self.countries:
+                return ' '.join(words[:-size]), ' '.join(words[-size:])
+        return text, ''
+
+    def search(self, text, limit=5):
+        """[(distance, name id)] of the closest names to normalized `text`."""
+        k = max_edits(len(text))
+        exact = self.exact.get(text)
+        if exact is not None or k == 0:
+            return [(0, name_id) for name_id in exact or ()][:limit]
+        grams = trigrams(text)
+        # A name within k edits shares all but 3k of the guess's trigrams.
+        # Counter.update counts whole posting lists in C, which beats probing
+        # them one candidate at a time from Python.
+        required = max(len(grams) - 3 * k, 1)
+        counts = Counter()
+        for length in range(len(text) - k, len(text) + k + 1):
+            postings = self.postings.get(length)
+            if postings:
+                for gram in grams:
+                    counts.update(postings.get(gram, ()))
+        found = []
+        for name_id in [name_id for name_id, shared in counts.items() if shared >= required]:
+            distance = levenshtein(text, self.names[name_id], k)
+            if distance <= k:
+                found.append((distance, name_id))
+        found.sort()
+        return found[:limit]
+
+    def match(self, guess, limit=1):
+        """Best matching destinations for `guess`, as Match tuples, best first."""
+        city, _country = self.split_guess(guess)
+        results = []
+        seen = set()
+        for distance, name_id in self.search(city, limit * 4):
+            pk = self.owners[name_id]
+            if pk in seen:
+                continue
+            seen.add(pk)
+            results.append(Match(pk, self.names[name_id], round(similarity(city, self.names[name_id], distance), 3)))
+        return results[:limit]
+
+    def check(self, guess, destination):
+        """
+        (correct, confidence) for `guess` as the name of `destination` (a
+        catalog dict). The guess counts when it is within the typo budget of
+        the city or one of its aliases and no other city matches it better;
+        naming a different country halves the confidence.
+        """
+        city, country = self.split_guess(guess)
+        if not city:
+            return False, 0.0
+        target = normalize(destination['city'])
+        names = {target, *(alias for alias, canonical in ALIASES.items() if canonical == target)}
+        if target.endswith(' city'):
+            names.add(target[:-5])
+        k = max_edits(len(city))
+        best = min((levenshtein(city, name, k), name) for name in names)
+        if best[0] > k:
+            return False, 0.0
+        confidence = similarity(city, best[1], best[0])
+        if best[0] and city in self.exact:
+            # A typo for this city that is spelled exactly like another destination.
+            return False, 0.0
+        if country and destination.get('country'):
+            wanted = normalize(destination['country'])
+            if levenshtein(country, wanted, max_edits(len(wanted))) > max_edits(len(wanted)):
+                confidence /= 2
+        return confidence >= CONFIDENCE_THRESHOLD, round(confidence, 3)
+
+
+_matcher = None
+_building = None
+_lock = threading.Lock()
+
+
+def _build(current):
+    global _matcher, _building
+    matcher = CityMatcher(current.destinations, current)
+    with _lock:
+        if _building is current or _matcher is None:
+            _matcher = matcher
+            _building = None
+    return matcher
+
+
+def get_matcher(current=None):
+    """
+    The CityMatcher for `current` (by default the current catalog). After a
+    catalog change the old matcher keeps answering while the new one is built
+    in the background.
+    """
+    global _building
+    if current is None:
+        current = catalog.get_catalog()
+    matcher = _matcher
+    if matcher is not None and matcher.source is current:
+        return matcher
+    if matcher is None:
+        return _build(current)
+    with _lock:
+        if _building is not current:
+            _building = current
+            threading.Thread(target=_build, args=(current,), name='matcher-build', daemon=True).start()
+    return matcher
+
+
+async def aget_matcher(current):
+    """get_matcher() for async views: the very first build runs in a worker thread."""
+    if _matcher is None:
+        return await sync_to_async(_build, thread_sensitive=False)(current)
+    return get_matcher(current)
@@ -0,0 +1,325 @@
+import atexit
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'game_http_requests_total': ('counter', 'Requests handled, by view, method and status.', None),
+    'game_round_pool_total': ('counter', 'Round pool lookups, by pool and hit or miss.', None),
+    'game_round_pool_built_total': ('counter', 'Rounds pre-built by the round pool.', None),
+    'game_http_request_duration_seconds': (
+        'histogram', 'Wall time per sampled request.',
+        (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    ),
+    'game_db_duration_seconds': (
+        'histogram', 'Time spent in SQL per sampled request.',
+        (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+    ),
+    'game_db_queries': ('histogram', 'SQL queries per sampled request.', (0, 1, 2, 3, 5, 10, 20, 50, 100)),
+    'game_template_render_seconds': (
+        'histogram', 'Template render time per sampled request.',
+        (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+    ),
+    'game_http_response_bytes': (
+        'histogram', 'Response body size per sampled request.',
+        (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152),
+    ),
+}
+
+
+class Registry:
+    """
+    Per-process counters and histograms.
+
+    Every thread writes to its own shard, so recording never takes a lock;
+    shards are only registered once per thread and summed when collected.
+    Histograms are stored as per-bucket counts (the last one is +Inf) plus a sum.
+    """
+
+    def __init__(self):
+        self._shards = []
+        self._register_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._register_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels, amount=1):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        shard = self._shard()
+        key = (name, labels)
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0] * (len(buckets) + 2)
+        values[bisect.bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    def collect(self):
+        """Return {(name, labels): value or [bucket counts..., sum]} summed over threads."""
+        with self._register_lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            for key, value in list(shard.items()):
+                merge(totals, key, value)
+        return totals
+
+    def clear(self):
+        with self._register_lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+def merge(totals, key, value):
+    if isinstance(value, list):
+        current = totals.get(key)
+        totals[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+registry = Registry()
+
+
+EXITED_FILE = 'exited.json'
+
+
+def load_file(path):
+    """{(name, labels): value} from a file written by FileStore.write, or {} if unreadable."""
+    try:
+        rows = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+    return {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in rows if name in METRICS}
+
+
+def write_file(path, totals):
+    data = json.dumps([[name, list(labels), value] for (name, labels), value in totals.items()])
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(data)
+    os.replace(tmp, path)
+
+
+class FileStore:
+    """
+    Share metrics between worker processes through one JSON file per process
+    in `directory`. When a worker exits its totals are folded into one file
+    (retire_worker), so counters never go backwards and the directory holds a
+    file per live worker; reset_store empties it when the whole server starts.
+    """
+
+    def __init__(self, directory, interval=5.0):
+        self.directory = Path(directory)
+        self.interval = interval
+        self.pid = os.getpid()
+        # pid plus a random token: a recycled pid must not overwrite an old worker's totals.
+        self.path = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        self._written = 0.0
+
+    def write(self, totals):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_file(self.path, totals)
+        self._written = time.monotonic()
+
+    def maybe_write(self, collect):
+        if time.monotonic() - self._written >= self.interval:
+            self.write(collect())
+
+    def read_all(self, own):
+        """Merge every worker's file, using the live `own` totals for this process."""
+        totals = {}
+        for key, value in own.items():
+            merge(totals, key, value)
+        for path in self.directory.glob('*.json'):
+            if path != self.path:
+                for key, value in load_file(path).items():
+                    merge(totals, key, value)
+        return totals
+
+
+def metrics_dir():
+    directory = getattr(settings, 'GAME_METRICS_DIR', None)
+    return Path(directory) if directory else None
+
+
+def retire_worker(pid):
+    """
+    Fold the files of the exited worker `pid` into the exited workers' totals
+    and remove them. Call from the one process supervising the workers.
+    """
+    directory = metrics_dir()
+    if directory is None:
+        return
+    paths = list(directory.glob(f'{pid}-*.json'))
+    if not paths:
+        return
+    exited = directory / EXITED_FILE
+    totals = load_file(exited)
+    for path in paths:
+        for key, value in load_file(path).items():
+            merge(totals, key, value)
+    write_file(exited, totals)
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def reset_store():
+    """Remove every worker's metrics file, before a server starts its workers."""
+    directory = metrics_dir()
+    if directory is None:
+        return
+    for path in [*directory.glob('*.json'), *directory.glob('*.tmp')]:
+        path.unlink(missing_ok=True)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The FileStore for this process, or None when GAME_METRICS_DIR is unset."""
+    global _store
+    directory = metrics_dir()
+    if directory is None:
+        return None
+    store = _store
+    if store is not None and store.pid == os.getpid() and store.directory == directory:
+        return store
+    with _store_lock:
+        # Re-created after a fork so every worker writes its own file.
+        if _store is None or _store.pid != os.getpid() or _store.directory != directory:
+            _store = FileStore(directory)
+    return _store
+
+
+@atexit.register
+def _write_on_exit():
+    if _store is not None and _store.pid == os.getpid():
+        _store.write(registry.collect())
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for k, v in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render(totals):
+    """Prometheus text exposition format (version 0.0.4)."""
+    by_name = defaultdict(list)
+    for (name, labels), value in totals.items():
+        by_name[name].append((labels, value))
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name.get(name, ())):
+            if kind == 'counter':
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot():
+    """Totals across every worker sharing GAME_METRICS_DIR (or just this process)."""
+    own = registry.collect()
+    store = get_store()
+    if store is None:
+        return own
+    store.write(own)
+    return store.read_all(own)
+
+
+class RequestTimings:
+    """Accumulates DB and template time for the request being handled."""
+    __slots__ = ('db_time', 'queries', 'render_time')
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+# Timings of the current request, if it was sampled.
+current_timings = contextvars.ContextVar('game_request_timings', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Execute wrapper kept on every database connection (see signals.py).
+    Connections belong to one thread and the async ORM queries from worker
+    threads, but the context, and so current_timings, is copied there.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+class TimedTemplate:
+    """Wraps a backend template to add its render time to the current request."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = current_timings.get()
+        if timings is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings.render_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time reported to the metrics middleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
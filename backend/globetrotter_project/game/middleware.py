@@ -0,0 +1,165 @@
+import cProfile
+import io
+import pstats
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import RequestTimings, current_timings, get_store, registry
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unmatched>'
+
+
+def response_size(response):
+    length = response.get('Content-Length')
+    if length is not None:
+        return int(length)
+    return 0 if response.streaming else len(response.content)
+
+
+class MetricsMiddleware:
+    """
+    Count every request and, for a GAME_METRICS_SAMPLE_RATE fraction of them,
+    record wall time, SQL time and query count, template render time and
+    response size per view. Send `X-Profile: 1` (when GAME_PROFILE_REQUESTS is
+    on) to get a cProfile summary of that request instead of its response.
+    Works in both sync and async stacks, so it never forces a thread hop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if PROFILE_HEADER in request.META and getattr(settings, 'GAME_PROFILE_REQUESTS', False):
+            return self.profile(request)
+        if not self.sampled():
+            response = self.get_response(request)
+            self.count(request, response)
+            return response
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        self.observe(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if PROFILE_HEADER in request.META and getattr(settings, 'GAME_PROFILE_REQUESTS', False):
+            # The profiler sees every coroutine the event loop runs meanwhile.
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+            return self.profile_summary(profiler, response)
+        if not self.sampled():
+            response = await self.get_response(request)
+            self.count(request, response)
+            return response
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        self.observe(request, response, timings, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def sampled():
+        return random.random() < getattr(settings, 'GAME_METRICS_SAMPLE_RATE', 1.0)
+
+    def observe(self, request, response, timings, elapsed):
+        labels = (('view', view_label(request)),)
+        registry.observe('game_http_request_duration_seconds', labels, elapsed)
+        registry.observe('game_db_duration_seconds', labels, timings.db_time)
+        registry.observe('game_db_queries', labels, timings.queries)
+        registry.observe('game_template_render_seconds', labels, timings.render_time)
+        registry.observe('game_http_response_bytes', labels, response_size(response))
+        self.count(request, response)
+
+    def count(self, request, response):
+        registry.inc('game_http_requests_total', (
+            ('view', view_label(request)), ('method', request.method), ('status', str(response.status_code)),
+        ))
+        store = get_store()
+        if store is not None:
+            store.maybe_write(registry.collect)
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        return self.profile_summary(profiler, response)
+
+    @staticmethod
+    def profile_summary(profiler, response):
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(40)
+        summary = HttpResponse(out.getvalue(), content_type='text/plain; charset=utf-8')
+        summary['X-Profile-Status'] = str(response.status_code)
+        return summary
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, usable in async stacks too. Stock WhiteNoiseMiddleware is
+    sync-only, so under ASGI Django would run it, and everything after it, in
+    a worker thread for every request. Finding a file is a dict lookup (or a
+    stat with WHITENOISE_AUTOREFRESH), so it is safe on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            response = self.serve(static_file, request)
+            if response.streaming:
+                # Django buffers sync iterators under ASGI (with a warning); static
+                # files are small and usually in the page cache, so read them inline.
+                response.streaming_content = iterate_async(response.streaming_content)
+            return response
+        return await self.get_response(request)
+
+
+async def iterate_async(chunks):
+    for chunk in chunks:
+        yield chunk
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_alter_destination_image_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_destination_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
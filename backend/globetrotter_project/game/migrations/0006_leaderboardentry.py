@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-17 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_gamesession_answer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('all', 'All time'), ('day', 'Daily'), ('week', 'Weekly')], max_length=4)),
+                ('period', models.DateField()),
+                ('player', models.CharField(max_length=50)),
+                ('best_score', models.PositiveIntegerField()),
+                ('achieved_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['window', 'period', '-best_score', 'achieved_at'], name='leaderboard_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['window', 'period', 'achieved_at'], name='leaderboard_changes_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('window', 'period', 'player'), name='unique_leaderboard_player'),
+        ),
+    ]
@@ -0,0 +1,200 @@
+# Generated by Django 4.2 on 2026-10-17 18:10
+
+import unicodedata
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# A copy of the game.geo mapping as of this migration: migrations don't import app
+# code, which may change or move, so the backfill always gives the same result.
+
+# Region -> continent.
+CONTINENTS = {
+    'Northern Europe': 'Europe',
+    'Western Europe': 'Europe',
+    'Southern Europe': 'Europe',
+    'Eastern Europe': 'Europe',
+    'North Africa': 'Africa',
+    'Sub-Saharan Africa': 'Africa',
+    'Middle East': 'Asia',
+    'Central Asia': 'Asia',
+    'South Asia': 'Asia',
+    'East Asia': 'Asia',
+    'Southeast Asia': 'Asia',
+    'North America': 'North America',
+    'Central America & Caribbean': 'North America',
+    'South America': 'South America',
+    'Oceania': 'Oceania',
+}
+UNKNOWN_REGION = 'Other'
+
+_REGION_COUNTRIES = {
+    'Northern Europe': (
+        'Denmark', 'Estonia', 'Faroe Islands', 'Finland', 'Iceland', 'Ireland', 'Latvia', 'Lithuania',
+        'Norway', 'Sweden', 'United Kingdom', 'England', 'Scotland', 'Wales', 'Northern Ireland',
+    ),
+    'Western Europe': (
+        'Austria', 'Belgium', 'France', 'Germany', 'Liechtenstein', 'Luxembourg', 'Monaco', 'Netherlands',
+        'Switzerland',
+    ),
+    'Southern Europe': (
+        'Albania', 'Andorra', 'Bosnia and Herzegovina', 'Croatia', 'Cyprus', 'Greece', 'Italy', 'Kosovo',
+        'Malta', 'Montenegro', 'North Macedonia', 'Portugal', 'San Marino', 'Serbia', 'Slovenia', 'Spain',
+        'Vatican City',
+    ),
+    'Eastern Europe': (
+        'Belarus', 'Bulgaria', 'Czech Republic', 'Hungary', 'Moldova', 'Poland', 'Romania', 'Russia',
+        'Slovakia', 'Ukraine',
+    ),
+    'North Africa': ('Algeria', 'Egypt', 'Libya', 'Morocco', 'Sudan', 'Tunisia'),
+    'Sub-Saharan Africa': (
+        'Angola', 'Benin', 'Botswana', 'Burkina Faso', 'Burundi', 'Cameroon', 'Cape Verde',
+        'Central African Republic', 'Chad', 'Comoros', 'Democratic Republic of the Congo', 'Djibouti',
+        'Equatorial Guinea', 'Eritrea', 'Eswatini', 'Ethiopia', 'Gabon', 'Gambia', 'Ghana', 'Guinea',
+        'Guinea-Bissau', 'Ivory Coast', 'Kenya', 'Lesotho', 'Liberia', 'Madagascar', 'Malawi', 'Mali',
+        'Mauritania', 'Mauritius', 'Mozambique', 'Namibia', 'Niger', 'Nigeria', 'Republic of the Congo',
+        'Rwanda', 'Sao Tome and Principe', 'Senegal', 'Seychelles', 'Sierra Leone', 'Somalia',
+        'South Africa', 'South Sudan', 'Tanzania', 'Togo', 'Uganda', 'Zambia', 'Zimbabwe',
+    ),
+    'Middle East': (
+        'Armenia', 'Azerbaijan', 'Bahrain', 'Georgia', 'Iran', 'Iraq', 'Israel', 'Jordan', 'Kuwait',
+        'Lebanon', 'Oman', 'Palestine', 'Qatar', 'Saudi Arabia', 'Syria', 'Turkey', 'United Arab Emirates',
+        'Yemen',
+    ),
+    'Central Asia': ('Kazakhstan', 'Kyrgyzstan', 'Mongolia', 'Tajikistan', 'Turkmenistan', 'Uzbekistan'),
+    'South Asia': ('Afghanistan', 'Bangladesh', 'Bhutan', 'India', 'Maldives', 'Nepal', 'Pakistan', 'Sri Lanka'),
+    'East Asia': ('China', 'Hong Kong', 'Japan', 'Macau', 'North Korea', 'South Korea', 'Taiwan'),
+    'Southeast Asia': (
+        'Brunei', 'Cambodia', 'East Timor', 'Indonesia', 'Laos', 'Malaysia', 'Myanmar', 'Philippines',
+        'Singapore', 'Thailand', 'Vietnam',
+    ),
+    'North America': ('Canada', 'Greenland', 'Mexico', 'United States'),
+    'Central America & Caribbean': (
+        'Antigua and Barbuda', 'Bahamas', 'Barbados', 'Belize', 'Costa Rica', 'Cuba', 'Dominica',
+        'Dominican Republic', 'El Salvador', 'Grenada', 'Guatemala', 'Haiti', 'Honduras', 'Jamaica',
+        'Nicaragua', 'Panama', 'Puerto Rico', 'Saint Kitts and Nevis', 'Saint Lucia',
+        'Saint Vincent and the Grenadines', 'Trinidad and Tobago',
+    ),
+    'South America': (
+        'Argentina', 'Bolivia', 'Brazil', 'Chile', 'Colombia', 'Ecuador', 'Guyana', 'Paraguay', 'Peru',
+        'Suriname', 'Uruguay', 'Venezuela',
+    ),
+    'Oceania': (
+        'Australia', 'Fiji', 'French Polynesia', 'Kiribati', 'Marshall Islands', 'Micronesia', 'Nauru',
+        'New Zealand', 'Palau', 'Papua New Guinea', 'Samoa', 'Solomon Islands', 'Tonga', 'Tuvalu', 'Vanuatu',
+    ),
+}
+
+# Other spellings seen in generated data, mapped to the names above.
+COUNTRY_ALIASES = {
+    'usa': 'United States',
+    'us': 'United States',
+    'united states of america': 'United States',
+    'uk': 'United Kingdom',
+    'great britain': 'United Kingdom',
+    'uae': 'United Arab Emirates',
+    'holland': 'Netherlands',
+    'the netherlands': 'Netherlands',
+    'czechia': 'Czech Republic',
+    'turkiye': 'Turkey',
+    'korea': 'South Korea',
+    'republic of korea': 'South Korea',
+    'burma': 'Myanmar',
+    "cote d'ivoire": 'Ivory Coast',
+    'holy see': 'Vatican City',
+    'timor-leste': 'East Timor',
+    'swaziland': 'Eswatini',
+}
+
+
+def fold(text):
+    """Lower-case `text` and strip accents, for comparing names."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+_REGIONS = {fold(country): region for region, countries in _REGION_COUNTRIES.items() for country in countries}
+_REGIONS.update({alias: _REGIONS[fold(country)] for alias, country in COUNTRY_ALIASES.items()})
+
+
+def region_for(country):
+    """The region a country belongs to, or UNKNOWN_REGION."""
+    return _REGIONS.get(fold(country), UNKNOWN_REGION)
+
+
+def continent_for(country):
+    return CONTINENTS.get(region_for(country), UNKNOWN_REGION)
+
+
+def backfill(apps, schema_editor):
+    """Fill region/continent from country and difficulty/popularity from recorded answers."""
+    Destination = apps.get_model('game', 'Destination')
+    Answer = apps.get_model('game', 'Answer')
+    stats = {
+        row['destination_id']: (row['total'], row['wrong'])
+        for row in Answer.objects.filter(destination__isnull=False).values('destination_id').annotate(
+            total=Count('id'), wrong=Count('id', filter=Q(correct=False))
+        )
+    }
+    batch = []
+    for destination in Destination.objects.only('id', 'country').iterator(chunk_size=1000):
+        total, wrong = stats.get(destination.pk, (0, 0))
+        destination.region = region_for(destination.country)
+        destination.continent = continent_for(destination.country)
+        destination.popularity = total
+        destination.difficulty = round(100 * (wrong + 1) / (total + 2))
+        batch.append(destination)
+        if len(batch) >= 1000:
+            Destination.objects.bulk_update(batch, ['region', 'continent', 'popularity', 'difficulty'])
+            batch = []
+    if batch:
+        Destination.objects.bulk_update(batch, ['region', 'continent', 'popularity', 'difficulty'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='continent',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='difficulty',
+            field=models.PositiveSmallIntegerField(default=50),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='region',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        # Backfill before building the indexes so each is written once.
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['region', 'difficulty', 'id'], name='destination_round_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['difficulty', 'id'], name='destination_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-popularity'], name='destination_popularity_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+
+def log_existing(apps, schema_editor):
+    """Log the destinations that predate the change log, so the first sync has a version."""
+    Destination = apps.get_model('game', 'Destination')
+    CatalogChange = apps.get_model('game', 'CatalogChange')
+    db = schema_editor.connection.alias
+    ids = Destination.objects.using(db).order_by('id').values_list('id', flat=True).iterator(chunk_size=1000)
+    CatalogChange.objects.using(db).bulk_create(
+        (CatalogChange(destination_id=destination_id, op='insert') for destination_id in ids), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_destination_attributes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destination_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('insert', 'Insert'), ('update', 'Update'), ('delete', 'Delete')], max_length=6)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(log_existing, migrations.RunPython.noop),
+    ]
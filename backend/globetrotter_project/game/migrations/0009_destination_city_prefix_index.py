@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-17 21:05
+
+from django.db import migrations, models
+import django.db.models.functions.text
+import game.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_catalogchange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(
+                game.models.PostgresOpClass(django.db.models.functions.text.Upper('city'), name='text_pattern_ops'),
+                name='destination_city_prefix_idx',
+            ),
+        ),
+    ]
@@ -1,14 +1,191 @@
+import hashlib
+import json
+
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models.functions import Upper
+from django.db.models.indexes import IndexExpression
+
+from . import geo
+
+# Fields that make up a destination's content, used to detect changed rows on import.
+CONTENT_FIELDS = ('city', 'country', 'clues', 'fun_fact', 'trivia', 'image_url')
+
+
+def content_hash(data):
+    """Return a stable SHA-256 of the content fields in `data` (a dict)."""
+    payload = json.dumps(
+        [data.get(field) for field in CONTENT_FIELDS], sort_keys=True, separators=(',', ':'), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PostgresOpClass(OpClass):
+    """An OpClass that databases without operator classes (SQLite) index as the bare expression."""
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(self.get_source_expressions()[0])
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+# Wrappers sit outside the parenthesised index expression, as django.contrib.postgres
+# arranges for OpClass itself (that app isn't installed here).
+IndexExpression.register_wrappers(*IndexExpression.wrapper_classes, PostgresOpClass)
+
+
+def location_fields(country):
+    """region and continent values for a country (see game.geo)."""
+    return {'region': geo.region_for(country), 'continent': geo.continent_for(country)}
+
+
+class DestinationQuerySet(models.QuerySet):
+    def playable(self):
+        """Destinations that can be asked about (matches the partial indexes)."""
+        return self.filter(is_active=True)
+
+    def for_round(self, region=None, difficulty=None):
+        """
+        Ids of playable destinations, optionally in `region` and within the
+        (low, high) `difficulty` range; answered from destination_round_idx
+        without touching the table.
+        """
+        queryset = self.playable()
+        if region is not None:
+            queryset = queryset.filter(region=region)
+        if difficulty is not None:
+            queryset = queryset.filter(difficulty__range=difficulty)
+        return queryset.order_by('id').values_list('id', flat=True)
+
 
 class Destination(models.Model):
     city = models.CharField(max_length=100, unique=True)
     country = models.CharField(max_length=100, blank=True)
+    # Derived from country on save, so filtered game modes never parse free text.
+    region = models.CharField(max_length=40, blank=True, editable=False)
+    continent = models.CharField(max_length=20, blank=True, editable=False)
+    # 0 (everyone gets it) to 100 (nobody does), from answer history; see refresh_destination_stats.
+    difficulty = models.PositiveSmallIntegerField(default=50)
+    # Number of times the destination has been answered.
+    popularity = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
     clues = models.JSONField(default=list)
     fun_fact = models.TextField(blank=True)
     trivia = models.JSONField(default=list)
     image_url = models.URLField(blank=True, max_length=500)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Locally cached, resized copies of image_url: {'source': url, variant: path under IMAGE_CACHE_ROOT}.
+    image_variants = models.JSONField(default=dict, blank=True)
+
+    objects = DestinationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Partial indexes: inactive rows are never played, so they stay out of them.
+            # Trailing id makes round lookups index-only.
+            models.Index(
+                fields=['region', 'difficulty', 'id'], name='destination_round_idx',
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=['difficulty', 'id'], name='destination_difficulty_idx',
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=['-popularity'], name='destination_popularity_idx',
+                condition=models.Q(is_active=True),
+            ),
+            # The admin's istartswith search is UPPER(city) LIKE 'PREFIX%'; text_pattern_ops
+            # lets it use the index whatever the database collation.
+            models.Index(
+                PostgresOpClass(Upper('city'), name='text_pattern_ops'), name='destination_city_prefix_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.city
 
+    def save(self, *args, **kwargs):
+        self.content_hash = content_hash({field: getattr(self, field) for field in CONTENT_FIELDS})
+        for name, value in location_fields(self.country).items():
+            setattr(self, name, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = [f for f in ('content_hash', 'region', 'continent') if f not in update_fields]
+            kwargs['update_fields'] = [*update_fields, *derived]
+        super().save(*args, **kwargs)
+
 
+class CatalogChange(models.Model):
+    """
+    One insert, update or delete of a Destination. The id doubles as the
+    change-log version clients sync from (see game/changes.py).
+    """
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    OP_CHOICES = [(INSERT, 'Insert'), (UPDATE, 'Update'), (DELETE, 'Delete')]
+
+    # Not a foreign key: the entry has to outlive the destination it deletes.
+    destination_id = models.BigIntegerField()
+    op = models.CharField(max_length=6, choices=OP_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.op} {self.destination_id} (v{self.pk})"
+
+
+# Points a correct answer adds to GameSession.score and to the daily and weekly leaderboards.
+POINTS_PER_CORRECT = 1
+
+
+class GameSession(models.Model):
+    username = models.CharField(max_length=50, blank=True)
+    # Running totals, maintained with F() increments when buffered answers are flushed.
+    score = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    wrong_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.username or 'anonymous'} ({self.score})"
+
+
+class Answer(models.Model):
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name='answers')
+    destination = models.ForeignKey(Destination, on_delete=models.SET_NULL, null=True, related_name='+')
+    guess = models.CharField(max_length=100)
+    correct = models.BooleanField()
+    answered_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.guess} ({'correct' if self.correct else 'wrong'})"
+
+
+class LeaderboardEntry(models.Model):
+    """Best score per player and leaderboard window, maintained as answers are flushed."""
+    ALL_TIME = 'all'
+    DAILY = 'day'
+    WEEKLY = 'week'
+    WINDOW_CHOICES = [(ALL_TIME, 'All time'), (DAILY, 'Daily'), (WEEKLY, 'Weekly')]
+
+    window = models.CharField(max_length=4, choices=WINDOW_CHOICES)
+    # First day of the window (1970-01-01 for all-time).
+    period = models.DateField()
+    player = models.CharField(max_length=50)
+    best_score = models.PositiveIntegerField()
+    achieved_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'period', 'player'], name='unique_leaderboard_player'),
+        ]
+        indexes = [
+            models.Index(fields=['window', 'period', '-best_score', 'achieved_at'], name='leaderboard_rank_idx'),
+            models.Index(fields=['window', 'period', 'achieved_at'], name='leaderboard_changes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.player}: {self.best_score} ({self.window} {self.period})"
@@ -0,0 +1,97 @@
+"""
+City-name normalization and edit distance, shared by the typed-answer matcher
+and the dataset dedup. Plain Python on purpose: the dataset builder in
+scripts/ uses it without Django.
+"""
+import re
+
+from .geo import fold
+
+# Well-known alternative names, folded alias -> folded canonical city name.
+ALIASES = {
+    'nyc': 'new york city',
+    'new york': 'new york city',
+    'la': 'los angeles',
+    'sf': 'san francisco',
+    'rio': 'rio de janeiro',
+    'cdmx': 'mexico city',
+    'ciudad de mexico': 'mexico city',
+    'saigon': 'ho chi minh city',
+    'bombay': 'mumbai',
+    'madras': 'chennai',
+    'calcutta': 'kolkata',
+    'peking': 'beijing',
+    'canton': 'guangzhou',
+    'constantinople': 'istanbul',
+    'leningrad': 'saint petersburg',
+    'st petersburg': 'saint petersburg',
+    'roma': 'rome',
+    'firenze': 'florence',
+    'venezia': 'venice',
+    'napoli': 'naples',
+    'praha': 'prague',
+    'wien': 'vienna',
+    'munchen': 'munich',
+    'koln': 'cologne',
+    'lisboa': 'lisbon',
+    'kobenhavn': 'copenhagen',
+    'den haag': 'the hague',
+    'bruxelles': 'brussels',
+    'al qahirah': 'cairo',
+}
+# Word swaps applied to every name so "St. Moritz" and "Saint Moritz" meet.
+WORD_ALIASES = {'st': 'saint', 'mt': 'mount', 'ste': 'sainte', 'ft': 'fort'}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Fold accents and case, drop punctuation and expand abbreviations."""
+    words = _SPACES.split(_PUNCTUATION.sub(' ', fold(text)).replace('_', ' ').strip())
+    return ' '.join(WORD_ALIASES.get(word, word) for word in words if word)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(length):
+    """Typos tolerated for a name of `length` characters."""
+    if length <= 4:
+        return 0
+    if length <= 8:
+        return 1
+    if length <= 14:
+        return 2
+    return 3
+
+
+def levenshtein(a, b, limit):
+    """Edit distance between `a` and `b`, or limit + 1 once it is known to exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(a) + 1))
+    for i, cb in enumerate(b, 1):
+        current = [i]
+        best = i
+        for j, ca in enumerate(a, 1):
+            value = previous[j - 1] + (ca != cb)
+            if previous[j] < value:
+                value = previous[j] + 1
+            if current[j - 1] < value:
+                value = current[j - 1] + 1
+            current.append(value)
+            if value < best:
+                best = value
+        if best > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def similarity(a, b, distance):
+    return 1 - distance / max(len(a), len(b), 1)
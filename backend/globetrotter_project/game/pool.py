@@ -0,0 +1,130 @@
+import atexit
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import catalog, rounds
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Pooled rounds older than this are dropped so players keep most of ROUND_MAX_AGE to answer.
+MAX_AGE = 5 * 60
+
+
+class RoundPool:
+    """
+    Per-process pools of pre-built rounds, one bounded ring buffer per
+    (difficulty, region), holding the serialized JSON body ready to send.
+
+    Requests pop from the left in O(1); a background thread (see `start()`)
+    tops up any pool that has dropped below `low_watermark`. Each pool deals
+    destinations from its own no-repeat permutation. Pools are emptied when
+    the catalog version changes.
+    """
+
+    def __init__(self, capacity=256, low_watermark=64, interval=1.0):
+        self.capacity = capacity
+        self.low_watermark = low_watermark
+        self.interval = interval
+        self._pools = {}
+        self._decks = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _pool(self, key):
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.setdefault(key, deque(maxlen=self.capacity))
+        return pool
+
+    def pop(self, difficulty=rounds.NORMAL, region=None):
+        """Return a serialized round from the (difficulty, region) pool, or None on a miss."""
+        key = (difficulty, region)
+        pool = self._pool(key)
+        labels = (('pool', f"{difficulty}/{region or 'all'}"),)
+        version = catalog.get_version()
+        try:
+            entry = pool.popleft()
+        except IndexError:
+            entry = None
+        if entry is not None and (entry[0] != version or time.monotonic() - entry[1] > MAX_AGE):
+            # Everything behind a stale entry is at least as old.
+            pool.clear()
+            entry = None
+        if len(pool) < self.low_watermark:
+            self._wake.set()
+        registry.inc('game_round_pool_total', labels + (('result', 'miss' if entry is None else 'hit'),))
+        return None if entry is None else entry[2]
+
+    def refill(self, keys=None):
+        """Top up pools (default: every pool requested so far); returns rounds built."""
+        built = 0
+        for key in list(self._pools) if keys is None else keys:
+            pool = self._pool(key)
+            version = catalog.get_version()
+            if self._versions.get(key) != version:
+                pool.clear()
+                self._versions[key] = version
+            now = time.monotonic()
+            try:
+                while now - pool[0][1] > MAX_AGE:
+                    pool.popleft()
+            except IndexError:
+                pass
+            deck = self._decks.setdefault(key, [])
+            while len(pool) < self.capacity:
+                payload = rounds.build_round(self._rng, deck, difficulty=key[0], region=key[1])
+                if payload is None:
+                    break
+                pool.append((version, time.monotonic(), serialize(payload)))
+                built += 1
+        if built:
+            registry.inc('game_round_pool_built_total', (), built)
+        return built
+
+    def clear(self):
+        with self._lock:
+            self._pools.clear()
+            self._decks.clear()
+            self._versions.clear()
+
+    def start(self):
+        """Start the background refill thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='round-pool', daemon=True)
+        self._thread.start()
+        atexit.register(self._stop.set)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.refill()
+            except Exception:
+                logger.exception('Failed to refill the round pool.')
+            finally:
+                close_old_connections()
+
+
+def serialize(payload):
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+round_pool = RoundPool(
+    capacity=getattr(settings, 'GAME_ROUND_POOL_SIZE', 256),
+    low_watermark=getattr(settings, 'GAME_ROUND_POOL_LOW_WATERMARK', 64),
+)
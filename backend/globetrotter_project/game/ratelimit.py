@@ -0,0 +1,278 @@
+"""
+Rate limits for the game endpoints, checked without a cache round trip.
+
+Each process counts requests per (rule, client) in memory with a sliding
+window: the estimate is this window's count plus the previous window's,
+weighted by how much of it still falls within the last `period` seconds.
+Every `sync_interval` seconds a background thread (or, where it isn't
+running, the first request after the interval) pushes the hits counted since
+the last sync to the shared cache with incr and reads back the totals from
+all workers, so a check is a dict lookup and a little arithmetic. The price is
+that workers only see each other's traffic after a sync: a client spreading
+requests over N workers can overshoot by what N-1 of them let through in one
+interval.
+"""
+import functools
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY = 'game:ratelimit:{rule}:{client}:{window}'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """(limit, period in seconds) for a rate such as '120/m'."""
+    count, _, unit = rate.partition('/')
+    try:
+        limit, period = int(count), PERIODS[unit]
+    except (KeyError, ValueError):
+        limit = period = 0
+    if limit < 1:
+        raise ImproperlyConfigured(f'Invalid rate {rate!r}: use a positive count per s, m or h, e.g. "120/m".')
+    return limit, period
+
+
+def retry_after(previous, current, limit, period, offset):
+    """Whole seconds until the estimate drops below `limit`, if nothing more is let through."""
+    if current < limit:
+        # Only the previous window's share is over: wait for it to fade enough.
+        wait = period * (1 - (limit - current) / previous) - offset
+    else:
+        # Wait for the next window, then for this window's share to fade.
+        wait = period - offset + period * (1 - limit / current)
+    # Strictly past the point where the estimate equals the limit.
+    return max(1, math.floor(wait) + 1)
+
+
+class Counter:
+    """One client's hits under one rule: the current and previous windows, and hits not synced yet."""
+    __slots__ = ('period', 'window', 'count', 'previous', 'pending')
+
+    def __init__(self, period, window):
+        self.period = period
+        self.window = window
+        self.count = 0
+        self.previous = 0
+        self.pending = 0
+
+
+class RateLimiter:
+    """
+    Per-process sliding-window counters, synced to the cache every
+    `sync_interval` seconds. `start()` adds a thread that does the syncing;
+    without it, whichever request finds a sync due does it inline.
+    """
+
+    def __init__(self, sync_interval=1.0, clock=time.time):
+        self.sync_interval = sync_interval
+        # Wall time, so every worker agrees on where windows start.
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._counters = {}
+        self._touched = set()  # counters checked since the last sync
+        self._unsent = []  # (key, period, window, hits) left behind when a window rolled over
+        self._next_sync = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self, rule, client, limit, period):
+        """Count a request from `client`; 0 if it may go ahead, else seconds until it could."""
+        window, offset = divmod(self.clock(), period)
+        window = int(window)
+        key = (rule, client)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = Counter(period, window)
+            elif counter.window != window:
+                self._roll(key, counter, window)
+            self._touched.add(key)
+            previous, current = counter.previous, counter.count + counter.pending
+            if previous * (1 - offset / period) + current < limit:
+                counter.pending += 1
+                return 0
+        return retry_after(previous, current, limit, period, offset)
+
+    def _roll(self, key, counter, window):
+        if counter.pending:
+            self._unsent.append((key, counter.period, counter.window, counter.pending))
+        counter.previous = counter.count + counter.pending if window == counter.window + 1 else 0
+        counter.window, counter.count, counter.pending = window, 0, 0
+
+    def sync_due(self):
+        return self._thread is None and self.clock() >= self._next_sync
+
+    def sync(self):
+        """Push the hits counted here to the cache and pull back every worker's totals."""
+        if not self._sync_lock.acquire(blocking=False):
+            return  # another thread is already syncing
+        try:
+            now = self.clock()
+            self._next_sync = now + self.sync_interval
+            with self._lock:
+                sends, reads = self._take_pending()
+                self._prune(now)
+            try:
+                totals = self._exchange(sends, reads)
+            except Exception:
+                # Keep limiting on this worker's own counts until the cache is back.
+                logger.exception('Could not sync rate limit counters')
+                return
+            with self._lock:
+                for (key, window), total in totals.items():
+                    counter = self._counters.get(key)
+                    if counter is None:
+                        continue
+                    if counter.window == window:
+                        counter.count = max(counter.count, total)
+                    elif counter.window == window + 1:
+                        counter.previous = max(counter.previous, total)
+        finally:
+            self._sync_lock.release()
+
+    def _take_pending(self):
+        sends, self._unsent = self._unsent, []
+        reads = []
+        for key in self._touched:
+            counter = self._counters[key]
+            if counter.pending:
+                sends.append((key, counter.period, counter.window, counter.pending))
+                counter.count += counter.pending
+                counter.pending = 0
+            else:
+                reads.append((key, counter.window))
+        self._touched = set()
+        return sends, reads
+
+    def _prune(self, now):
+        # A counter two windows old estimates zero: forget it.
+        stale = [key for key, counter in self._counters.items() if now // counter.period > counter.window + 1]
+        for key in stale:
+            del self._counters[key]
+
+    def _exchange(self, sends, reads):
+        totals = {}
+        for key, period, window, hits in sends:
+            totals[key, window] = self._incr(cache_key(key, window), hits, 2 * period + self.sync_interval)
+        if reads:
+            keys = {cache_key(key, window): (key, window) for key, window in reads}
+            for found, total in cache.get_many(keys).items():
+                totals[keys[found]] = total
+        return totals
+
+    @staticmethod
+    def _incr(key, hits, timeout):
+        try:
+            return cache.incr(key, hits)
+        except ValueError:
+            if cache.add(key, hits, timeout=timeout):
+                return hits
+            return cache.incr(key, hits)
+
+    def start(self):
+        """Start the background syncer, so requests never wait on the cache."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='rate-limiter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.sync_interval):
+            self.sync()
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._touched.clear()
+            self._unsent.clear()
+            self._next_sync = 0.0
+
+
+def cache_key(key, window):
+    rule, client = key
+    return RATE_LIMIT_KEY.format(rule=rule, client=client, window=window)
+
+
+rate_limiter = RateLimiter(sync_interval=getattr(settings, 'GAME_RATE_LIMIT_SYNC_INTERVAL', 1.0))
+
+
+def client_ip(request):
+    """The client's address, read from X-Forwarded-For behind GAME_TRUSTED_PROXIES proxies."""
+    proxies = getattr(settings, 'GAME_TRUSTED_PROXIES', 0)
+    if proxies:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def session_key(request):
+    # The cookie as sent: reading it needs no session lookup. Players without
+    # one yet are still held to the per-IP limit. Hashed, so live session keys
+    # never end up in cache keys.
+    cookie = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    return hashlib.sha256(cookie.encode()).hexdigest()[:16] if cookie else ''
+
+
+CLIENT_KEYS = {'ip': client_ip, 'session': session_key}
+
+
+def check_request(request, scope):
+    """Seconds the request must wait under the GAME_RATE_LIMITS rules for `scope`, or 0."""
+    wait = 0
+    for kind, rate in getattr(settings, 'GAME_RATE_LIMITS', {}).get(scope, {}).items():
+        client = CLIENT_KEYS[kind](request)
+        if client:
+            limit, period = parse_rate(rate)
+            wait = max(wait, rate_limiter.check(f'{scope}:{kind}', client, limit, period))
+    return wait
+
+
+def too_many_requests(wait):
+    response = JsonResponse({'error': 'Too many requests. Slow down and try again shortly.'}, status=429)
+    response['Retry-After'] = str(wait)
+    return response
+
+
+def rate_limit(scope):
+    """
+    Hold a view, sync or async, to the GAME_RATE_LIMITS rules for `scope`:
+    over a limit the client gets a 429 with Retry-After instead of the view.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                if rate_limiter.sync_due():
+                    await sync_to_async(rate_limiter.sync)()
+                wait = check_request(request, scope)
+                if wait:
+                    return too_many_requests(wait)
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapped(request, *args, **kwargs):
+                if rate_limiter.sync_due():
+                    rate_limiter.sync()
+                wait = check_request(request, scope)
+                if wait:
+                    return too_many_requests(wait)
+                return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,355 @@
+"""
+Head-to-head rooms over WebSockets, served by asgi.py next to the Django app.
+
+Players connect to /ws/rooms/<code>?name=<player>. Any player can start a
+round; the server deals the same round to everyone in the room, stamps each
+answer with its own clock and broadcasts the scores as answers come in, then
+the result once everyone has answered or the round times out.
+
+Room state lives in the worker that serves the room, so with several
+workers each room code must be routed to one of them. Broadcasts go through
+a channel layer (GAME_CHANNEL_LAYER): the default InMemoryChannelLayer
+delivers to this process's sockets; a broker-backed subclass would publish
+in group_send() and call deliver() from its subscriber.
+
+A broadcast is serialized once per room and handed to every socket's bounded
+outbound queue, each drained by its own task, so one slow client never
+delays the others; a client that falls a whole queue behind is disconnected.
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import catalog, rounds
+
+logger = logging.getLogger(__name__)
+
+ROOM_PATH = re.compile(r'^/ws/rooms/(?P<code>[A-Za-z0-9]{4,16})/?$')
+MAX_NAME_LENGTH = 50
+# Largest client frame accepted (answers and commands are tiny).
+MAX_MESSAGE_SIZE = 4096
+# Points for a correct answer, plus up to SPEED_BONUS more the sooner it comes.
+CORRECT_POINTS = 10
+SPEED_BONUS = 10
+# WebSocket close codes.
+CLOSE_NOT_FOUND = 4404
+CLOSE_ROOM_FULL = 4409
+CLOSE_TOO_SLOW = 4408
+
+
+def dumps(message):
+    return json.dumps(message, separators=(',', ':'))
+
+
+class SlowConsumer(Exception):
+    """Raised when a socket's outbound queue is full."""
+
+
+class Connection:
+    """
+    One accepted socket. Messages are queued and written by a single task, so
+    ASGI send() is never awaited concurrently, nor by whoever broadcasts.
+    """
+
+    def __init__(self, send, queue_size):
+        self._send = send
+        self.queue_size = queue_size
+        self.queue = asyncio.Queue()
+        self.closed = False
+        self.writer = asyncio.ensure_future(self._write())
+
+    def push(self, event):
+        if self.closed:
+            return
+        if self.queue.qsize() >= self.queue_size:
+            raise SlowConsumer
+        self.queue.put_nowait(event)
+
+    def send_text(self, text):
+        self.push({'type': 'websocket.send', 'text': text})
+
+    def close(self, code=1000):
+        """Close the socket once what is already queued has been sent."""
+        if not self.closed:
+            self.closed = True
+            self.queue.put_nowait({'type': 'websocket.close', 'code': code})
+
+    def abort(self, code):
+        """Drop what is queued and close the socket next."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.close(code)
+
+    def stop(self):
+        """Stop writing: the client has gone."""
+        self.closed = True
+        self.writer.cancel()
+
+    async def _write(self):
+        while True:
+            event = await self.queue.get()
+            await self._send(event)
+            if event['type'] == 'websocket.close':
+                return
+
+    async def drain(self):
+        try:
+            await self.writer
+        except (asyncio.CancelledError, OSError):
+            pass
+
+
+class InMemoryChannelLayer:
+    """Group membership and fan-out for the sockets of this process."""
+
+    def __init__(self):
+        self.groups = {}
+
+    async def group_add(self, group, channel, connection):
+        self.groups.setdefault(group, {})[channel] = connection
+
+    async def group_discard(self, group, channel):
+        members = self.groups.get(group)
+        if members is not None:
+            members.pop(channel, None)
+            if not members:
+                del self.groups[group]
+
+    async def group_send(self, group, message):
+        self.deliver(group, dumps(message))
+
+    def deliver(self, group, text):
+        """Queue one already-serialized frame on every local member of `group`."""
+        event = {'type': 'websocket.send', 'text': text}
+        for channel, connection in list(self.groups.get(group, {}).items()):
+            try:
+                connection.push(event)
+            except SlowConsumer:
+                logger.info('Disconnecting %s from %s: too far behind', channel, group)
+                self.groups[group].pop(channel, None)
+                connection.abort(CLOSE_TOO_SLOW)
+
+
+_layer = None
+
+
+def get_channel_layer():
+    global _layer
+    if _layer is None:
+        _layer = import_string(getattr(settings, 'GAME_CHANNEL_LAYER', 'game.rooms.InMemoryChannelLayer'))()
+    return _layer
+
+
+class Room:
+    """Players, scores and the round in progress for one room code."""
+
+    def __init__(self, code, layer, rng=None):
+        self.code = code
+        self.group = f'room.{code}'
+        self.layer = layer
+        self.rng = rng or random.Random()
+        self.scores = {}
+        self.round_number = 0
+        self.round_id = None
+        self.catalog = None  # the catalog the round was dealt from; answers are checked against it
+        self.current = None  # the round message, for players who join mid-round
+        self.starting = False
+        self.started = None
+        self.answers = {}
+        self.timer = None
+        self.deck = []
+
+    @property
+    def in_round(self):
+        return self.round_id is not None
+
+    def player_name(self, requested):
+        """`requested` (or 'Player'), with a number added if someone in the room already uses it."""
+        base = (requested or '').strip()[:MAX_NAME_LENGTH] or 'Player'
+        name, n = base, 1
+        while name in self.scores:
+            n += 1
+            name = f'{base} {n}'
+        return name
+
+    async def broadcast(self, message):
+        await self.layer.group_send(self.group, message)
+
+    async def players_changed(self):
+        await self.broadcast({'type': 'players', 'scores': self.scores, 'in_round': self.in_round})
+
+    async def start_round(self):
+        if self.in_round or self.starting:
+            return
+        self.starting = True
+        try:
+            current = await catalog.aget_catalog()
+            round_data = await rounds.abuild_round(rng=self.rng, deck=self.deck, current=current)
+        finally:
+            self.starting = False
+        if round_data is None:
+            await self.broadcast({'type': 'error', 'error': 'No destinations available.'})
+            return
+        self.round_number += 1
+        self.round_id = round_data.pop('id')
+        self.catalog = current
+        round_data.pop('answer_url')
+        self.answers = {}
+        self.started = time.monotonic()
+        seconds = settings.GAME_ROOM_ROUND_SECONDS
+        number = self.round_number
+        self.timer = asyncio.ensure_future(self._expire(number, seconds))
+        self.current = {'type': 'round', 'number': number, 'seconds': seconds, **round_data}
+        await self.broadcast(self.current)
+
+    async def answer(self, player, guess):
+        """Check and score `player`'s first answer to the current round, timed by the server."""
+        if not self.in_round or player in self.answers or not isinstance(guess, str):
+            return
+        elapsed = time.monotonic() - self.started
+        # Checked in memory against the round's catalog: no await, so nothing can interleave.
+        result = self.check(guess)
+        points = 0
+        if result['correct']:
+            left = max(0.0, 1 - elapsed / settings.GAME_ROOM_ROUND_SECONDS)
+            points = CORRECT_POINTS + round(SPEED_BONUS * left)
+        self.scores[player] += points
+        self.answers[player] = {'correct': result['correct'], 'ms': round(elapsed * 1000), 'points': points}
+        await self.broadcast({'type': 'answered', 'player': player, 'ms': round(elapsed * 1000), 'scores': self.scores})
+        if all(name in self.answers for name in self.scores):
+            await self.finish_round(self.round_number)
+
+    def check(self, guess):
+        try:
+            return rounds.check_answer(self.round_id, guess[:MAX_NAME_LENGTH * 2], current=self.catalog)
+        except rounds.RoundError:
+            return {'answer': None, 'country': '', 'fun_fact': '', 'correct': False}
+
+    async def _expire(self, number, seconds):
+        await asyncio.sleep(seconds)
+        await self.finish_round(number)
+
+    async def finish_round(self, number):
+        if not self.in_round or number != self.round_number:
+            return
+        result = self.check('')
+        result.pop('correct')
+        self.round_id = None
+        self.close()
+        await self.broadcast({
+            'type': 'result', 'number': number, **result, 'answers': self.answers, 'scores': self.scores,
+        })
+
+    def close(self):
+        """Stop the round timer (unless it is what is finishing the round)."""
+        if self.timer is not None and self.timer is not asyncio.current_task():
+            self.timer.cancel()
+        self.timer = None
+
+
+class RoomRegistry:
+    """The rooms served by this process, created on first join and dropped when empty."""
+
+    def __init__(self):
+        self.rooms = {}
+        self._channels = 0
+
+    def next_channel(self):
+        self._channels += 1
+        return f'socket.{self._channels}'
+
+    async def join(self, code, requested_name, connection):
+        room = self.rooms.get(code)
+        if room is None:
+            room = self.rooms[code] = Room(code, get_channel_layer())
+        if len(room.scores) >= settings.GAME_ROOM_MAX_PLAYERS:
+            return None, None, None
+        name = room.player_name(requested_name)
+        channel = self.next_channel()
+        room.scores[name] = 0
+        await room.layer.group_add(room.group, channel, connection)
+        connection.send_text(dumps({'type': 'joined', 'room': code, 'player': name}))
+        if room.in_round:
+            connection.send_text(dumps(room.current))
+        await room.players_changed()
+        return room, name, channel
+
+    async def leave(self, room, name, channel):
+        await room.layer.group_discard(room.group, channel)
+        room.scores.pop(name, None)
+        room.answers.pop(name, None)
+        if not room.scores:
+            room.close()
+            self.rooms.pop(room.code, None)
+            return
+        await room.players_changed()
+        if room.in_round and all(player in room.answers for player in room.scores):
+            await room.finish_round(room.round_number)
+
+    def __len__(self):
+        return len(self.rooms)
+
+
+registry = RoomRegistry()
+
+
+async def handle(room, name, message):
+    if message.get('type') == 'start':
+        await room.start_round()
+    elif message.get('type') == 'answer':
+        await room.answer(name, message.get('guess'))
+
+
+async def serve(scope, receive, send):
+    """The ASGI app for one room socket."""
+    match = ROOM_PATH.match(scope['path'])
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    if match is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    await send({'type': 'websocket.accept'})
+    connection = Connection(send, settings.GAME_ROOM_SEND_QUEUE)
+    room, name, channel = await registry.join(match['code'], query.get('name', [''])[0], connection)
+    if room is None:
+        connection.close(CLOSE_ROOM_FULL)
+        await connection.drain()
+        return
+    try:
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                break
+            text = event.get('text') or (event.get('bytes') or b'').decode('utf-8', 'replace')
+            if len(text) > MAX_MESSAGE_SIZE:
+                continue
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(message, dict):
+                await handle(room, name, message)
+    finally:
+        connection.stop()
+        await connection.drain()
+        await registry.leave(room, name, channel)
+
+
+def websocket_router(http_application):
+    """Serve room sockets from this module and everything else from `http_application`."""
+    async def application(scope, receive, send):
+        if scope['type'] == 'websocket':
+            await serve(scope, receive, send)
+        else:
+            await http_application(scope, receive, send)
+
+    return application
@@ -0,0 +1,164 @@
+import json
+import random
+import secrets
+
+from django.core import signing
+from django.urls import reverse
+from django.utils.crypto import salted_hmac
+
+from . import catalog, images, matcher, sampling
+
+# Salt used when signing round ids so they can't be swapped with other signed values.
+ROUND_SALT = 'game.round'
+# Round ids also encrypt the destination id (see make_round_id) with a key derived under this salt.
+ROUND_CIPHER_SALT = 'game.round.cipher'
+ROUND_NONCE_BYTES = 12
+ROUND_ID_BYTES = 8
+# Rounds older than this (in seconds) can no longer be answered.
+ROUND_MAX_AGE = 60 * 60
+OPTIONS_PER_ROUND = 4
+CLUES_PER_ROUND = 2
+# Difficulty levels: the range of Destination.difficulty asked about. HARD also
+# draws wrong options from the answer's country and region.
+EASY = 'easy'
+NORMAL = 'normal'
+HARD = 'hard'
+DIFFICULTY_RANGES = {EASY: (0, 40), NORMAL: None, HARD: (60, 100)}
+DIFFICULTIES = tuple(DIFFICULTY_RANGES)
+# Answer modes: pick one of the options, or type the city name (typos allowed).
+CHOICE = 'choice'
+TYPED = 'type'
+MODES = (CHOICE, TYPED)
+# Signed cookie holding the player's position in their no-repeat deal order.
+DECK_COOKIE = 'game_deck'
+DECK_SALT = 'game.deck'
+DECK_MAX_AGE = 30 * 24 * 60 * 60
+
+
+class RoundError(Exception):
+    """Raised when a round id is missing, tampered with or expired."""
+
+
+def _keystream(nonce):
+    return salted_hmac(ROUND_CIPHER_SALT, nonce, algorithm='sha256').digest()[:ROUND_ID_BYTES]
+
+
+def _xor(data, key):
+    return bytes(a ^ b for a, b in zip(data, key))
+
+
+def make_round_id(destination_id):
+    """
+    An opaque round id: the destination id is encrypted with a keystream
+    derived from SECRET_KEY and a random nonce, then signed with a timestamp.
+    Signing alone would leave the id readable, handing the answer to the
+    client; the nonce also makes two rounds for one destination unrelated.
+    """
+    nonce = secrets.token_bytes(ROUND_NONCE_BYTES)
+    sealed = _xor(destination_id.to_bytes(ROUND_ID_BYTES, 'big'), _keystream(nonce))
+    return signing.TimestampSigner(salt=ROUND_SALT).sign(signing.b64_encode(nonce + sealed).decode())
+
+
+def read_round_id(round_id):
+    """Return the destination id behind a round id from make_round_id()."""
+    try:
+        payload = signing.b64_decode(
+            signing.TimestampSigner(salt=ROUND_SALT).unsign(round_id, max_age=ROUND_MAX_AGE).encode()
+        )
+    except (signing.BadSignature, TypeError, ValueError) as exc:
+        raise RoundError('Invalid or expired round.') from exc
+    if len(payload) != ROUND_NONCE_BYTES + ROUND_ID_BYTES:
+        raise RoundError('Invalid or expired round.')
+    nonce, sealed = payload[:ROUND_NONCE_BYTES], payload[ROUND_NONCE_BYTES:]
+    return int.from_bytes(_xor(sealed, _keystream(nonce)), 'big')
+
+
+def build_round(rng=random, deck=None, difficulty=NORMAL, region=None, mode=CHOICE):
+    """
+    Build the payload for a single round, or None if there is no destination
+    to ask about. Pass the player's `deck` (see SamplingIndex.deal) to avoid
+    repeats, and a `region` and/or `difficulty` (see DIFFICULTY_RANGES) to
+    narrow the destinations asked about. TYPED rounds carry no options.
+    """
+    index = sampling.get_index()
+    ids = index.candidates(region, DIFFICULTY_RANGES[difficulty])
+    return make_round(index, ids, rng, deck, difficulty, mode)
+
+
+async def abuild_round(rng=random, deck=None, difficulty=NORMAL, region=None, mode=CHOICE, current=None):
+    """build_round() for async views; pass the `current` catalog if it is already at hand."""
+    index = sampling.get_index(current or await catalog.aget_catalog())
+    ids = await index.acandidates(region, DIFFICULTY_RANGES[difficulty])
+    return make_round(index, ids, rng, deck, difficulty, mode)
+
+
+def make_round(index, ids, rng, deck, difficulty, mode):
+    if not ids:
+        return None
+    pk = index.deal(deck, rng, ids) if deck is not None else ids[rng.randrange(len(ids))]
+    current = index.catalog
+    destination = current.get(pk)
+    clues = destination['clues']
+    round_id = make_round_id(pk)
+    round_data = {
+        'id': round_id,
+        'answer_url': reverse('answer_round', args=[round_id]),
+        'clues': [clues[i] for i in index.clue_order(len(clues), CLUES_PER_ROUND, rng)],
+        **images.image_payload(destination),
+    }
+    if mode == CHOICE:
+        hard = difficulty == HARD
+        options = [destination['city']] + [
+            current.get(other)['city'] for other in index.distractors(pk, OPTIONS_PER_ROUND - 1, rng, hard)
+        ]
+        rng.shuffle(options)
+        round_data['options'] = options
+    return round_data
+
+
+def read_deck(request):
+    """The player's deal position from the signed cookie, or [] to start a new one."""
+    try:
+        deck = json.loads(request.get_signed_cookie(DECK_COOKIE, default='[]', salt=DECK_SALT))
+    except ValueError:
+        return []
+    if not isinstance(deck, list) or not all(type(value) is int for value in deck):
+        return []
+    return deck
+
+
+def write_deck(response, deck):
+    response.set_signed_cookie(
+        DECK_COOKIE, json.dumps(deck, separators=(',', ':')), salt=DECK_SALT,
+        max_age=DECK_MAX_AGE, httponly=True, samesite='Lax',
+    )
+
+
+def check_answer(round_id, answer, mode=CHOICE, current=None, city_matcher=None):
+    """
+    Check an answer against the destination behind `round_id`. TYPED answers
+    are matched fuzzily and also report the match confidence.
+    """
+    if current is None:
+        current = catalog.get_catalog()
+    destination = current.get(read_round_id(round_id))
+    if destination is None:
+        raise RoundError('Destination no longer exists.')
+    result = {
+        'answer': destination['city'],
+        'country': destination['country'],
+        'fun_fact': destination['fun_fact'],
+    }
+    if mode == TYPED:
+        city_matcher = city_matcher or matcher.get_matcher(current)
+        result['correct'], result['confidence'] = city_matcher.check(answer, destination)
+    else:
+        result['correct'] = answer.strip().lower() == destination['city'].lower()
+    return result
+
+
+async def acheck_answer(round_id, answer, mode=CHOICE):
+    """check_answer() for async views."""
+    current = await catalog.aget_catalog()
+    city_matcher = await matcher.aget_matcher(current) if mode == TYPED else None
+    return check_answer(round_id, answer, mode, current, city_matcher)
@@ -0,0 +1,146 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+# Models whose reads may come from a replica: the catalog and its change log, which
+# are read far more than written. Sessions, answers and the leaderboard stay on the primary.
+REPLICA_MODELS = {'game.destination', 'game.catalogchange'}
+# Set in the shared cache for DATABASE_REPLICA_PIN_SECONDS after a catalog write, so no
+# worker rebuilds the catalog from a replica that hasn't caught up yet.
+CHANGED_KEY = 'game:db:catalog-written'
+
+# True once the current request (or thread) has written a replica-routed model;
+# its later reads then go to the primary. Reset when a request starts (see signals).
+pinned = contextvars.ContextVar('game_db_pinned', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def pin_seconds():
+    return getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 30)
+
+
+def max_lag():
+    return getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 30)
+
+
+def check_settings():
+    """
+    Refuse a pin window shorter than the lag a replica may have: once the pin
+    expires, a replica still replaying the write would serve the old rows and
+    they'd be cached under the new catalog version.
+    """
+    if replicas() and pin_seconds() < max_lag():
+        raise ImproperlyConfigured(
+            f'DATABASE_REPLICA_PIN_SECONDS ({pin_seconds()}) must be at least '
+            f'DATABASE_REPLICA_MAX_LAG ({max_lag()}).'
+        )
+
+
+def ping(alias):
+    """True if replica `alias` answers a query and, on PostgreSQL, isn't lagging behind."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+                )
+                lag = cursor.fetchone()[0]
+                return lag is None or lag <= max_lag()
+            cursor.execute('SELECT 1')
+            return True
+    except DatabaseError:
+        # Drop the broken connection so the next check reconnects.
+        connection.close()
+        raise
+
+
+class ReplicaHealth:
+    """
+    Per-process health of each replica, re-checked at most every `interval`
+    seconds by whichever thread first notices the result is stale. Other
+    threads keep the last result meanwhile (unknown counts as down).
+    """
+
+    def __init__(self, interval=5.0, check=ping):
+        self.interval = interval
+        self.check = check
+        self._state = {}  # alias -> (healthy, checked at)
+        self._lock = threading.Lock()
+
+    def healthy(self, alias):
+        state = self._state.get(alias)
+        if state is not None and time.monotonic() - state[1] < self.interval:
+            return state[0]
+        if not self._lock.acquire(blocking=False):
+            return state is not None and state[0]
+        try:
+            try:
+                healthy = bool(self.check(alias))
+            except Exception:
+                logger.warning('Replica %s failed its health check; reading from the primary.', alias, exc_info=True)
+                healthy = False
+            self._state[alias] = (healthy, time.monotonic())
+            return healthy
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._state.clear()
+
+
+replica_health = ReplicaHealth(getattr(settings, 'DATABASE_REPLICA_HEALTH_INTERVAL', 5.0))
+
+
+class ReplicaRouter:
+    """
+    Read catalog models from a healthy replica (settings.DATABASE_REPLICAS),
+    everything else and all writes from the primary. Reads go to the primary
+    too when the current request has written the catalog itself, or anyone
+    has in the last DATABASE_REPLICA_PIN_SECONDS, so a write is always
+    visible to the reads that follow it. That holds because a replica lagging
+    more than the pin window is never used (see check_settings).
+    """
+
+    def __init__(self, health=None):
+        check_settings()
+        self.health = health or replica_health
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in REPLICA_MODELS or not replicas():
+            return None
+        if pinned.get() or cache.get(CHANGED_KEY):
+            return PRIMARY
+        healthy = [alias for alias in replicas() if self.health.healthy(alias)]
+        return random.choice(healthy) if healthy else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label_lower in REPLICA_MODELS and replicas():
+            pinned.set(True)
+            cache.set(CHANGED_KEY, True, timeout=pin_seconds())
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {PRIMARY, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication.
+        return False if db in replicas() else None
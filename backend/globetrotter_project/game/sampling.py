@@ -0,0 +1,238 @@
+import functools
+import itertools
+import math
+import random
+import threading
+from array import array
+from collections import defaultdict
+
+from . import catalog
+from .models import Destination
+
+# Rebuild from scratch instead of patching when more than this share of rows changed.
+FULL_REBUILD_RATIO = 0.25
+
+
+class SamplingIndex:
+    """
+    Immutable sampling structures for one catalog version.
+
+    - `ids`: compact array of destination ids for O(1) uniform picks, plus
+      `position` to find an id's slot.
+    - `by_country` / `by_region`: tuples of ids used to draw "hard" distractors
+      that are geographically close to the answer.
+    Clue orderings are precomputed per clue count (see `clue_orders`), so
+    shuffling a round's clues is a single choice().
+
+    A new version is derived from the previous index where possible: removed
+    ids are swap-removed, added ids appended, and only touched buckets rebuilt.
+    """
+
+    def __init__(self, current, ids, position, by_country, by_region):
+        self.catalog = current
+        self.version = current.version
+        self.ids = ids
+        self.position = position
+        self.by_country = by_country
+        self.by_region = by_region
+        self._candidates = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, current, previous=None):
+        if previous is not None:
+            derived = cls._derive(previous, current)
+            if derived is not None:
+                return derived
+        ids = array('q', current.ids)
+        by_country = defaultdict(list)
+        by_region = defaultdict(list)
+        for destination in current.destinations:
+            by_country[destination['country']].append(destination['id'])
+            by_region[destination['region']].append(destination['id'])
+        return cls(
+            current, ids, {pk: i for i, pk in enumerate(ids)},
+            {k: tuple(v) for k, v in by_country.items()}, {k: tuple(v) for k, v in by_region.items()},
+        )
+
+    @classmethod
+    def _derive(cls, previous, current):
+        old = previous.catalog
+        removed = old.by_id.keys() - current.by_id.keys()
+        moved = {}  # id -> ((country, region) before or None, after or None)
+        for pk in removed:
+            moved[pk] = (location(old.by_id[pk]), None)
+        for destination in current.destinations:
+            before = old.by_id.get(destination['id'])
+            if before is None:
+                moved[destination['id']] = (None, location(destination))
+            elif location(before) != location(destination):
+                moved[destination['id']] = (location(before), location(destination))
+        if len(moved) > FULL_REBUILD_RATIO * max(len(current), 1):
+            return None
+
+        ids = array('q', previous.ids)
+        position = dict(previous.position)
+        for pk in removed:
+            # Swap-remove keeps the array dense without shifting every later id.
+            slot = position.pop(pk)
+            last = ids.pop()
+            if last != pk:
+                ids[slot] = last
+                position[last] = slot
+        for pk, (before, after) in moved.items():
+            if before is None:
+                position[pk] = len(ids)
+                ids.append(pk)
+
+        by_country = cls._patch(previous.by_country, moved, lambda place: place[0])
+        by_region = cls._patch(previous.by_region, moved, lambda place: place[1])
+        return cls(current, ids, position, by_country, by_region)
+
+    @staticmethod
+    def _patch(buckets, moved, key):
+        leaving = defaultdict(set)
+        joining = defaultdict(list)
+        for pk, (before, after) in moved.items():
+            if before is not None:
+                leaving[key(before)].add(pk)
+            if after is not None:
+                joining[key(after)].append(pk)
+        patched = dict(buckets)
+        for name in leaving.keys() | joining.keys():
+            bucket = tuple(pk for pk in buckets.get(name, ()) if pk not in leaving[name]) + tuple(joining[name])
+            if bucket:
+                patched[name] = bucket
+            else:
+                patched.pop(name, None)
+        return patched
+
+    def candidates(self, region=None, difficulty=None):
+        """
+        Ids to ask about, optionally limited to `region` and a (low, high)
+        `difficulty` range. Region-only lookups use the in-memory buckets;
+        difficulty ranges are read once per version through the partial
+        destination_round_idx index. An empty difficulty range falls back to
+        the region, so new catalogs without answer history still play.
+        """
+        base = self.ids if region is None else self.by_region.get(region, ())
+        if difficulty is None or not base:
+            return base
+        ids = self._candidates.get((region, difficulty))
+        if ids is None:
+            ids = self._remember(region, difficulty, Destination.objects.for_round(region, difficulty))
+        return ids or base
+
+    async def acandidates(self, region=None, difficulty=None):
+        """candidates() for async views."""
+        base = self.ids if region is None else self.by_region.get(region, ())
+        if difficulty is None or not base:
+            return base
+        ids = self._candidates.get((region, difficulty))
+        if ids is None:
+            found = [pk async for pk in Destination.objects.for_round(region, difficulty)]
+            ids = self._remember(region, difficulty, found)
+        return ids or base
+
+    def _remember(self, region, difficulty, found):
+        # Rows added since this catalog version was loaded are skipped until the next one.
+        ids = self._candidates[(region, difficulty)] = tuple(pk for pk in found if pk in self.catalog.by_id)
+        return ids
+
+    def pick(self, rng=random):
+        """A uniformly random destination id."""
+        return self.ids[rng.randrange(len(self.ids))]
+
+    def deal(self, deck, rng=random, ids=None):
+        """
+        Next destination id for a player whose progress is `deck`, a list
+        [size, step, multiplier, offset] updated in place. Positions in `ids`
+        (default: every destination) follow the affine permutation
+        (multiplier * step + offset) mod size, so no destination repeats until
+        every one has been dealt.
+        """
+        ids = self.ids if ids is None else ids
+        n = len(ids)
+        if len(deck) != 4 or deck[0] != n or not 0 <= deck[1] < n:
+            deck[:] = [n, 0, *self._shuffle_params(n, rng)]
+        size, step, multiplier, offset = deck
+        pk = ids[(multiplier * step + offset) % size]
+        step += 1
+        if step == size:
+            step = 0
+            multiplier, offset = self._shuffle_params(n, rng)
+        deck[:] = [size, step, multiplier, offset]
+        return pk
+
+    @staticmethod
+    def _shuffle_params(n, rng):
+        if n <= 1:
+            return 1, 0
+        multiplier = rng.randrange(1, n)
+        while math.gcd(multiplier, n) != 1:
+            multiplier = rng.randrange(1, n)
+        return multiplier, rng.randrange(n)
+
+    def distractors(self, pk, count, rng=random, hard=False):
+        """
+        `count` other destination ids. With `hard`, draw from the same country
+        first, then the same region, and only then from the whole catalog.
+        """
+        chosen = []
+        seen = {pk}
+        if hard:
+            destination = self.catalog.by_id[pk]
+            buckets = (self.by_country.get(destination['country'], ()), self.by_region.get(destination['region'], ()))
+            for bucket in buckets:
+                needed = count - len(chosen)
+                if needed <= 0:
+                    break
+                sample = rng.sample(bucket, min(len(bucket), needed + len(seen)))
+                for other in sample:
+                    if other not in seen and len(chosen) < count:
+                        chosen.append(other)
+                        seen.add(other)
+        limit = min(count, len(self.ids) - 1)
+        while len(chosen) < limit:
+            other = self.pick(rng)
+            if other not in seen:
+                chosen.append(other)
+                seen.add(other)
+        return chosen
+
+    def clue_order(self, clue_count, shown, rng=random):
+        """A random ordered choice of `shown` clue indexes out of `clue_count`."""
+        return rng.choice(clue_orders(clue_count, shown))
+
+
+def location(destination):
+    return destination['country'], destination['region']
+
+
+@functools.lru_cache(maxsize=None)
+def clue_orders(clue_count, shown):
+    """Every ordered choice of `shown` clue indexes (all of them if there are fewer)."""
+    return tuple(itertools.permutations(range(clue_count), min(shown, clue_count)))
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index(current=None):
+    """
+    The SamplingIndex for `current` (by default the current catalog), derived
+    from the last one on a version change.
+    """
+    global _index
+    if current is None:
+        current = catalog.get_catalog()
+    index = _index
+    if index is not None and index.catalog is current:
+        return index
+    with _lock:
+        if _index is None or _index.catalog is not current:
+            _index = SamplingIndex.build(current, previous=_index)
+        return _index
@@ -0,0 +1,281 @@
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .leaderboard import leaderboard
+from .models import POINTS_PER_CORRECT, Answer, GameSession
+from .rounds import ROUND_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+# Django session key holding the player's GameSession id.
+SESSION_KEY = 'game_session_id'
+
+
+class AnswerBuffer:
+    """
+    Per-process write-behind buffer for answers.
+
+    Answers are written with one bulk_create when `max_size` are pending or
+    the oldest has waited `max_delay` seconds, and session totals are bumped
+    with a single F() update per session in the same transaction (which also
+    refreshes the leaderboard). `start()`
+    adds a background thread that flushes on the timer even when traffic
+    stops, and flushes whatever is left when the process exits.
+
+    `generation` moves whenever a flush takes or settles a batch; requests
+    use it (see add_unless_flushed) instead of holding flush_lock.
+    """
+
+    def __init__(self, max_size=200, max_delay=2.0):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        # Re-entrant so a request holding it (see record_locked) can still flush inline.
+        self.flush_lock = threading.RLock()
+        self._pending = []
+        self._oldest = None
+        self.generation = 0  # odd while a flush is writing
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, answer):
+        with self._lock:
+            self._append(answer)
+        if self.due():
+            self.flush()
+
+    def add_unless_flushed(self, generation, answer):
+        """
+        Queue `answer` and return the pending totals of its session from just
+        before it, or None without queueing if a flush has started since
+        `generation` was read. Reading the session row between the two keeps
+        the totals consistent without holding flush_lock across an await.
+        """
+        with self._lock:
+            if self.generation != generation or generation % 2:
+                return None
+            result = self._pending_totals(answer.session_id)
+            self._append(answer)
+        return result
+
+    def _append(self, answer):
+        if not self._pending:
+            self._oldest = time.monotonic()
+        self._pending.append(answer)
+
+    def due(self):
+        with self._lock:
+            return bool(self._pending) and (
+                len(self._pending) >= self.max_size or time.monotonic() - self._oldest >= self.max_delay
+            )
+
+    def pending_totals(self, session_id):
+        """
+        (score, correct, wrong) of answers for `session_id` that haven't been
+        written yet. Hold `flush_lock` to get a result consistent with the database.
+        """
+        with self._lock:
+            return self._pending_totals(session_id)
+
+    def _pending_totals(self, session_id):
+        answers = [a for a in self._pending if a.session_id == session_id]
+        correct = sum(1 for a in answers if a.correct)
+        return correct * POINTS_PER_CORRECT, correct, len(answers) - correct
+
+    def flush(self):
+        """Write all pending answers; returns how many were written."""
+        with self.flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    return 0
+                self.generation += 1
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception('Failed to flush %d buffered answers; will retry.', len(batch))
+                with self._lock:
+                    self._pending = batch + self._pending
+                    self._oldest = time.monotonic()
+                    self.generation += 1
+                return 0
+            with self._lock:
+                self.generation += 1
+            return len(batch)
+
+    def _write(self, batch):
+        deltas = defaultdict(lambda: [0, 0])
+        for answer in batch:
+            deltas[answer.session_id][0 if answer.correct else 1] += 1
+        now = timezone.now()
+        with transaction.atomic():
+            Answer.objects.bulk_create(batch)
+            for session_id, (correct, wrong) in deltas.items():
+                GameSession.objects.filter(pk=session_id).update(
+                    score=F('score') + correct * POINTS_PER_CORRECT,
+                    correct_count=F('correct_count') + correct,
+                    wrong_count=F('wrong_count') + wrong,
+                    updated_at=now,
+                )
+            leaderboard.record(list(deltas), now)
+
+    def clear(self):
+        """Drop pending answers without writing them (used by tests)."""
+        with self._lock:
+            self._pending = []
+
+    def start(self):
+        """Start the background flusher and flush on interpreter exit."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='answer-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.max_delay):
+            self.flush()
+            close_old_connections()
+
+
+answer_buffer = AnswerBuffer(
+    max_size=getattr(settings, 'GAME_ANSWER_BUFFER_SIZE', 200),
+    max_delay=getattr(settings, 'GAME_ANSWER_FLUSH_INTERVAL', 2.0),
+)
+
+
+def get_game_session(request, username=''):
+    """Return the player's GameSession, creating it on the first answer."""
+    game_session = None
+    session_id = request.session.get(SESSION_KEY)
+    if session_id is not None:
+        game_session = GameSession.objects.filter(pk=session_id).first()
+    if game_session is None:
+        game_session = GameSession.objects.create(username=username)
+        request.session[SESSION_KEY] = game_session.pk
+    elif username and game_session.username != username:
+        game_session.username = username
+        game_session.save(update_fields=['username', 'updated_at'])
+    return game_session
+
+
+async def aget_game_session(request, username=''):
+    """get_game_session() for async views."""
+    game_session = None
+    # Django 4.2 sessions have no async API; loading one may read the cache or database.
+    session_id = await sync_to_async(request.session.get)(SESSION_KEY)
+    if session_id is not None:
+        game_session = await GameSession.objects.filter(pk=session_id).afirst()
+    if game_session is None:
+        game_session = await GameSession.objects.acreate(username=username)
+        request.session[SESSION_KEY] = game_session.pk
+    elif username and game_session.username != username:
+        game_session.username = username
+        await game_session.asave(update_fields=['username', 'updated_at'])
+    return game_session
+
+
+def session_totals(request):
+    """The player's session totals, or zeros before their first answer. Never creates a session."""
+    session_id = request.session.get(SESSION_KEY)
+    game_session = GameSession.objects.filter(pk=session_id).first() if session_id is not None else None
+    if game_session is None:
+        return {'score': 0, 'correct': 0, 'wrong': 0}
+    return totals(game_session)
+
+
+def round_key(round_id):
+    return 'game:round-answered:' + hashlib.sha256(round_id.encode()).hexdigest()
+
+
+def claim_round(round_id):
+    """Return True the first time `round_id` is answered, False for replays."""
+    return cache.add(round_key(round_id), True, timeout=ROUND_MAX_AGE)
+
+
+async def aclaim_round(round_id):
+    return await cache.aadd(round_key(round_id), True, timeout=ROUND_MAX_AGE)
+
+
+def record_answer(request, destination_id, guess, correct, username=''):
+    """Queue an answer for the player's session and return the session totals including it."""
+    answer = Answer(destination_id=destination_id, guess=guess[:100], correct=correct, answered_at=timezone.now())
+    # The session row is read without flush_lock, so a slow read never holds up
+    # flushes; add_unless_flushed then only queues if no flush landed meanwhile.
+    for _ in range(3):
+        generation = answer_buffer.generation
+        game_session = get_game_session(request, username)
+        answer.session_id = game_session.pk
+        pending = answer_buffer.add_unless_flushed(generation, answer)
+        if pending is not None:
+            break
+    else:
+        return record_locked(request, answer, username)
+    if answer_buffer.due():
+        answer_buffer.flush()
+    return counted(totals(game_session, pending), correct)
+
+
+def record_locked(request, answer, username=''):
+    """
+    record_answer() for when flushes kept landing during the read: while
+    flush_lock is held none can, so the totals never count an answer twice or miss one.
+    """
+    with answer_buffer.flush_lock:
+        game_session = get_game_session(request, username)
+        answer.session_id = game_session.pk
+        result = totals(game_session)
+        answer_buffer.add(answer)
+    return counted(result, answer.correct)
+
+
+async def arecord_answer(request, destination_id, guess, correct, username=''):
+    """record_answer() for async views."""
+    answer = Answer(destination_id=destination_id, guess=guess[:100], correct=correct, answered_at=timezone.now())
+    for _ in range(3):
+        generation = answer_buffer.generation
+        game_session = await aget_game_session(request, username)
+        answer.session_id = game_session.pk
+        pending = answer_buffer.add_unless_flushed(generation, answer)
+        if pending is not None:
+            break
+    else:
+        # Flushes kept landing during the read; take the lock in a worker thread instead.
+        return await sync_to_async(record_locked)(request, answer, username)
+    if answer_buffer.due():
+        await sync_to_async(answer_buffer.flush)()
+    return counted(totals(game_session, pending), correct)
+
+
+def counted(result, correct):
+    """Session totals with one more answer added."""
+    result['score'] += POINTS_PER_CORRECT if correct else 0
+    result['correct' if correct else 'wrong'] += 1
+    return result
+
+
+def totals(game_session, pending=None):
+    """Session totals including answers still in the buffer (or the `pending` totals given)."""
+    if pending is None:
+        pending = answer_buffer.pending_totals(game_session.pk)
+    score, correct, wrong = pending
+    return {
+        'score': game_session.score + score,
+        'correct': game_session.correct_count + correct,
+        'wrong': game_session.wrong_count + wrong,
+    }
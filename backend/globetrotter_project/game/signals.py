@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog, changes, metrics, routers
+from .models import CatalogChange, Destination
+
+
+@receiver(post_save, sender=Destination)
+@receiver(post_delete, sender=Destination)
+def invalidate_catalog(sender, instance, **kwargs):
+    if kwargs.get('signal') is post_delete:
+        changes.record(CatalogChange.DELETE, [instance.pk], using=kwargs['using'])
+    else:
+        op = CatalogChange.INSERT if kwargs['created'] else CatalogChange.UPDATE
+        changes.record(op, [instance.pk], using=kwargs['using'])
+    # Bump once the write is visible to every worker: a bump inside the transaction
+    # would let a copy rebuilt from uncommitted (maybe rolled back) rows be kept.
+    # The snapshot for the new version is built by the first request for it.
+    transaction.on_commit(catalog.bump_version)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    if metrics.time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.time_query)
+
+
+@receiver(request_started)
+def unpin_database(sender, **kwargs):
+    # A worker thread's context outlives the request, so drop the previous request's pin.
+    routers.pinned.set(False)
@@ -0,0 +1,109 @@
+import gzip
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from . import catalog, changes
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip and identity are always written.
+    brotli = None
+
+# Encodings in order of preference, with the file suffix used for each.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'), ('identity', ''))
+# Older snapshot versions kept on disk for clients still holding an old page.
+KEEP_VERSIONS = 3
+
+_build_lock = threading.Lock()
+
+
+def snapshot_root():
+    return Path(settings.SNAPSHOT_ROOT)
+
+
+def snapshot_path(version, encoding='identity'):
+    suffix = dict(ENCODINGS)[encoding]
+    return snapshot_root() / f"catalog-{version}.json{suffix}"
+
+
+def serialize(version):
+    """
+    The public catalog at `version`, with the change version it is current
+    to: clients load it once, then catch up through /api/catalog/changes.
+    """
+    # Read before the rows, so they hold at least every change up to it.
+    changes_version = changes.latest_version()
+    entries = [changes.public_entry(row) for row in changes.public_rows()]
+    payload = {'version': version, 'changes_version': changes_version, 'destinations': entries}
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _write(path, data):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def build_snapshot(version=None):
+    """
+    Write the catalog JSON for `version` (the current one by default) once,
+    plus gzip and brotli variants, and prune old versions. Returns the
+    version written.
+    """
+    version = version or catalog.get_version()
+    with _build_lock:
+        if snapshot_path(version).exists():
+            return version
+        snapshot_root().mkdir(parents=True, exist_ok=True)
+        data = serialize(version)
+        # Compressed variants first so the identity file doubles as a "complete" marker.
+        _write(snapshot_path(version, 'gzip'), gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(snapshot_path(version, 'br'), brotli.compress(data, quality=11))
+        _write(snapshot_path(version), data)
+        prune(version)
+    return version
+
+
+def prune(current_version):
+    versions = sorted(
+        {int(p.name.split('-')[1].split('.')[0]) for p in snapshot_root().glob('catalog-*.json*')},
+        reverse=True,
+    )
+    for version in versions[KEEP_VERSIONS:]:
+        if version == current_version:
+            continue
+        for encoding, _suffix in ENCODINGS:
+            snapshot_path(version, encoding).unlink(missing_ok=True)
+
+
+def accepted_encodings(accept_encoding):
+    """The codings an Accept-Encoding header allows: listed without q=0 (or 0.0, 0.00...)."""
+    accepted = set()
+    for part in accept_encoding.split(','):
+        coding, *params = (piece.strip() for piece in part.split(';'))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def negotiate(version, accept_encoding):
+    """Return (path, encoding) of the best available file for an Accept-Encoding header."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding, _suffix in ENCODINGS:
+        path = snapshot_path(version, encoding)
+        if (encoding == 'identity' or encoding in accepted) and path.exists():
+            return path, encoding
+    return None, None
@@ -0,0 +1,117 @@
+"""
+Process start-up: build what the first request would otherwise pay for.
+
+wsgi.py and asgi.py call initialize() once the application is loaded. Under
+gunicorn with preload_app (see gunicorn.conf.py) that happens once in the
+master: the warmed URL resolver, templates, static manifest and catalog are
+frozen out of the garbage collector's reach and inherited by every worker,
+which then only opens its database connection and starts its background
+threads (post_fork()).
+"""
+import gc
+import logging
+import os
+import time
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+from . import catalog, matcher, sampling
+from .pool import round_pool
+from .ratelimit import rate_limiter
+from .scoring import answer_buffer
+
+logger = logging.getLogger(__name__)
+
+# (step, seconds) of the last warm_up(), for startup_profile.
+timings = []
+
+
+def preloading():
+    """True when the app is loaded in a process that will fork workers (set by gunicorn.conf.py)."""
+    return os.getenv('GAME_PRELOAD') == 'True'
+
+
+def warm_urls():
+    get_resolver().resolve('/')
+    reverse('next_round')
+
+
+def warm_templates():
+    get_template('game/index.html')
+
+
+def warm_static():
+    try:
+        staticfiles_storage.url('js/app.js')
+    except ValueError:
+        # No manifest entry yet (collectstatic hasn't run); the page would fail the same way.
+        logger.warning('Static files manifest has no entry for js/app.js; run collectstatic.')
+
+
+def warm_catalog():
+    current = catalog.get_catalog()
+    sampling.get_index(current)
+    matcher.get_matcher(current)
+
+
+STEPS = [
+    ('urls', warm_urls),
+    ('templates', warm_templates),
+    ('static', warm_static),
+    ('catalog', warm_catalog),
+]
+
+
+def warm_up():
+    """
+    Run every warm-up step, timing each. A failing step (say, the database
+    isn't up yet) is logged and skipped: the first request then pays for it
+    as it would have anyway.
+    """
+    timings.clear()
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.warning('Warm-up step %r failed; it will run on the first request instead.', name, exc_info=True)
+        timings.append((name, time.perf_counter() - started))
+    return timings
+
+
+def start_background():
+    """Flush buffered answers, keep the round pools topped up and sync rate limits from this process."""
+    answer_buffer.start()
+    round_pool.start()
+    rate_limiter.start()
+
+
+def initialize():
+    warm_up()
+    if preloading():
+        # Workers must not share the master's sockets, and threads don't survive a
+        # fork: each worker connects and starts its threads in post_fork().
+        connections.close_all()
+    else:
+        start_background()
+
+
+def freeze():
+    """
+    Move everything allocated so far into the permanent generation, so the
+    collector never touches (and copy-on-write never duplicates) the pages
+    the workers inherit. Call in the master just before forking.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork():
+    start_background()
+    try:
+        connections['default'].ensure_connection()
+    except Exception:
+        logger.warning('Could not open a database connection at start-up.', exc_info=True)
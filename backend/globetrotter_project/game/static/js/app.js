@@ -1,18 +1,128 @@
-// Parse the destinations data embedded in the page
-const destinations = JSON.parse(document.getElementById('destinations-data').textContent);
+// Rounds are served one at a time by the API; the answer never reaches the client
+const nextRoundUrl = document.getElementById('game').dataset.nextRoundUrl;
+const leaderboardUrl = document.getElementById('game').dataset.leaderboardUrl;
+const catalogUrl = document.getElementById('game').dataset.catalogUrl;
+const catalogChangesUrl = document.getElementById('game').dataset.catalogChangesUrl;
+// "?mode=type" asks players to type the city instead of picking from options
+const answerMode = new URLSearchParams(window.location.search).get('mode') === 'type' ? 'type' : 'choice';
+// "?room=CODE" plays head-to-head with everyone on the same link: the server deals
+// each round to the whole room over a WebSocket and keeps the scores
+const roomCode = new URLSearchParams(window.location.search).get('room');
+const roomSocketPath = document.getElementById('game').dataset.roomSocketPath;
+let roomSocket = null;
+let playerName = null;
+// Challenge links (/challenge/<token>) first play the challenger's seeded rounds
+const createChallengeUrl = document.getElementById('game').dataset.createChallengeUrl;
+const challengeRoundsUrl = document.getElementById('game').dataset.challengeRoundsUrl;
+let challenge = null;
+let challengeRounds = [];
+let challengeCorrect = 0;
 
 // Game state variables
-let currentQuestionIndex = 0;
+let currentRound = null;
 let score = 0;
 let correctCount = 0;
 let wrongCount = 0;
-let questions = [];
 
-// Initialize the game: shuffle questions and start with the first one
+// City names from the locally kept catalog, sorted, for typed-mode suggestions
+let cityNames = [];
+
+// Resolve an IndexedDB request or transaction as a promise
+function idbDone(target) {
+  return new Promise((resolve, reject) => {
+    if (target instanceof IDBTransaction) {
+      target.oncomplete = () => resolve();
+      target.onabort = target.onerror = () => reject(target.error);
+    } else {
+      target.onsuccess = () => resolve(target.result);
+      target.onerror = () => reject(target.error);
+    }
+  });
+}
+
+// City names for suggestions live in IndexedDB between visits, keyed by the
+// catalog's opaque public ids. Version 1 also kept pks and images: start over
+function openCatalogDb() {
+  const request = indexedDB.open('globetrotter-catalog', 2);
+  request.onupgradeneeded = () => {
+    const db = request.result;
+    for (const name of Array.from(db.objectStoreNames)) {
+      db.deleteObjectStore(name);
+    }
+    db.createObjectStore('destinations', { keyPath: 'id' });
+    db.createObjectStore('meta');
+  };
+  return idbDone(request);
+}
+
+async function fetchCatalog(url) {
+  const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+  if (!response.ok) {
+    throw new Error(`Catalog sync failed with status ${response.status}`);
+  }
+  return response.json();
+}
+
+// Apply a change-log delta ({version, reset, upserts, deletes}) to the local catalog
+async function applyCatalogDelta(db, delta) {
+  if (!(delta.reset || delta.upserts.length || delta.deletes.length)) {
+    return;
+  }
+  const tx = db.transaction(['destinations', 'meta'], 'readwrite');
+  const store = tx.objectStore('destinations');
+  if (delta.reset) {
+    store.clear();
+  }
+  delta.deletes.forEach(id => store.delete(id));
+  delta.upserts.forEach(destination => store.put({ id: destination.id, city: destination.city }));
+  tx.objectStore('meta').put(delta.version, 'version');
+  await idbDone(tx);
+}
+
+// Bring the local catalog up to date. A first visit loads the pre-compressed,
+// immutable snapshot; after that a player only downloads what changed since
+// the version they hold, and the server says when to start over
+async function syncCatalog() {
+  if (!window.indexedDB || !catalogChangesUrl) {
+    return;
+  }
+  try {
+    const db = await openCatalogDb();
+    let since = (await idbDone(db.transaction('meta').objectStore('meta').get('version'))) || 0;
+    if (!since && catalogUrl) {
+      const snapshot = await fetchCatalog(catalogUrl);
+      await applyCatalogDelta(db, {
+        version: snapshot.changes_version, reset: true, upserts: snapshot.destinations, deletes: [],
+      });
+      since = snapshot.changes_version;
+    }
+    await applyCatalogDelta(db, await fetchCatalog(`${catalogChangesUrl}?since=${since}`));
+    const destinations = await idbDone(db.transaction('destinations').objectStore('destinations').getAll());
+    cityNames = destinations.map(destination => destination.city).sort((a, b) => a.localeCompare(b));
+  } catch (error) {
+    // Suggestions are a convenience; the game works without them.
+  }
+}
+
+// Offer up to eight known cities starting with what has been typed so far
+function suggestCities(input, datalist) {
+  const prefix = input.value.trim().toLowerCase();
+  datalist.innerHTML = '';
+  if (prefix.length < 2) {
+    return;
+  }
+  cityNames
+    .filter(city => city.toLowerCase().startsWith(prefix))
+    .slice(0, 8)
+    .forEach(city => {
+      const option = document.createElement('option');
+      option.value = city;
+      datalist.appendChild(option);
+    });
+}
+
+// Initialize the game: reset the score and fetch the first round
 function initGame() {
-  questions = destinations.slice();
-  shuffleArray(questions);
-  currentQuestionIndex = 0;
   score = 0;
   correctCount = 0;
   wrongCount = 0;
@@ -20,16 +130,14 @@ function initGame() {
   loadQuestion();
 }
 
-// Fisher-Yates Shuffle to randomize an array
-function shuffleArray(array) {
-  for (let i = array.length - 1; i > 0; i--) {
-    const j = Math.floor(Math.random() * (i + 1));
-    [array[i], array[j]] = [array[j], array[i]];
-  }
+// Read a cookie value (used for the CSRF token on answer submissions)
+function getCookie(name) {
+  const match = document.cookie.match(new RegExp('(?:^|; )' + name + '=([^;]*)'));
+  return match ? decodeURIComponent(match[1]) : null;
 }
 
-// Load the current question
-function loadQuestion() {
+// Fetch the next round from the server and render it
+async function loadQuestion() {
   document.getElementById('feedback').innerText = '';
   document.getElementById('nextBtn').disabled = true;
   
@@ -45,38 +153,91 @@ function loadQuestion() {
   
   // Do not change body background image; always use initial background color
   document.body.style.backgroundImage = 'none';
+
+  if (challengeRounds.length) {
+    currentRound = challengeRounds.shift();
+    renderRound(currentRound);
+    return;
+  }
+  if (challenge) {
+    document.getElementById('tagline').innerText =
+      `Challenge over: you got ${challengeCorrect} right, ${challenge.challenger} scored ${challenge.score}. Keep playing!`;
+    challenge = null;
+  }
   
-  if (currentQuestionIndex >= questions.length) {
-    cluesDiv.innerHTML = `<p>Game over! Your final score is ${score} (Correct: ${correctCount} | Wrong: ${wrongCount}).</p>`;
+  let response;
+  try {
+    response = await fetch(`${nextRoundUrl}?mode=${answerMode}`, { headers: { 'Accept': 'application/json' } });
+  } catch (error) {
+    response = null;
+  }
+  if (!response || !response.ok) {
+    cluesDiv.innerHTML = `<p>Could not load a new destination. Your final score is ${score} (Correct: ${correctCount} | Wrong: ${wrongCount}).</p>`;
     document.getElementById('nextBtn').innerText = 'Play Again';
     document.getElementById('nextBtn').disabled = false;
+    currentRound = null;
     return;
   }
-  
-  const question = questions[currentQuestionIndex];
-  
-  // Display up to 2 clues
-  const cluesToShow = question.clues.slice(0, 2);
-  cluesToShow.forEach(clue => {
+  currentRound = await response.json();
+  renderRound(currentRound);
+}
+
+// Show a round's clues, image and options (or a text box in typed mode)
+function renderRound(round) {
+  const cluesDiv = document.getElementById('clues');
+  const imageContainer = document.getElementById('image-container');
+  const leftOptionsDiv = document.getElementById('left-options');
+  const rightOptionsDiv = document.getElementById('right-options');
+  cluesDiv.innerHTML = '';
+  imageContainer.innerHTML = '';
+  leftOptionsDiv.innerHTML = '';
+  rightOptionsDiv.innerHTML = '';
+  document.getElementById('feedback').innerText = '';
+
+  // Display the clues picked by the server
+  round.clues.forEach(clue => {
     const p = document.createElement('p');
     p.innerText = clue;
     cluesDiv.appendChild(p);
   });
   
   // Display the destination image if available in the image container
-  if (question.image_url) {
+  if (round.image_url) {
     const img = document.createElement('img');
-    img.src = question.image_url;
-    img.alt = `Image of ${question.city}`;
+    img.src = round.image_url;
+    if (round.image_srcset) {
+      // Let the browser pick the smallest cached variant that fits the card
+      img.srcset = round.image_srcset;
+      img.sizes = '(max-width: 600px) 90vw, 480px';
+    }
+    img.alt = 'Image of the mystery destination';
     imageContainer.appendChild(img);
   }
   
-  // Generate options: correct answer plus three random incorrect answers
-  let options = [question.city];
-  const otherCities = questions.filter(q => q.city !== question.city).map(q => q.city);
-  shuffleArray(otherCities);
-  options = options.concat(otherCities.slice(0, 3));
-  shuffleArray(options);
+  // Typed rounds have no options: the server matches the guess, typos and all
+  if (!round.options) {
+    const input = document.createElement('input');
+    input.type = 'text';
+    input.id = 'guess';
+    input.placeholder = 'Type the city';
+    const datalist = document.createElement('datalist');
+    datalist.id = 'city-suggestions';
+    input.setAttribute('list', datalist.id);
+    input.oninput = () => suggestCities(input, datalist);
+    const btn = document.createElement('button');
+    btn.className = 'option-btn';
+    btn.innerText = 'Guess';
+    btn.onclick = () => checkAnswer(btn, input.value);
+    input.onkeydown = event => { if (event.key === 'Enter') btn.click(); };
+    leftOptionsDiv.appendChild(input);
+    leftOptionsDiv.appendChild(datalist);
+    rightOptionsDiv.appendChild(btn);
+    input.focus();
+    return;
+  }
+
+  // Options arrive already shuffled (correct answer plus three others)
+  const options = round.options;
   
   // Split options into two columns: left (first two) and right (last two)
   const leftOptions = options.slice(0, 2);
@@ -86,7 +247,7 @@ function loadQuestion() {
     const btn = document.createElement('button');
     btn.className = 'option-btn';
     btn.innerText = option;
-    btn.onclick = () => checkAnswer(btn, option, question.city, question.fun_fact);
+    btn.onclick = () => checkAnswer(btn, option);
     leftOptionsDiv.appendChild(btn);
   });
   
@@ -94,34 +255,68 @@ function loadQuestion() {
     const btn = document.createElement('button');
     btn.className = 'option-btn';
     btn.innerText = option;
-    btn.onclick = () => checkAnswer(btn, option, question.city, question.fun_fact);
+    btn.onclick = () => checkAnswer(btn, option);
     rightOptionsDiv.appendChild(btn);
   });
 }
 
-// Check the user's answer, reveal fun fact, and trigger animations
-function checkAnswer(button, selected, correct, funFact) {
+// Submit the answer to the server, reveal the fun fact, and trigger animations
+async function checkAnswer(button, selected) {
+  if (!selected.trim()) {
+    return;
+  }
   const optionButtons = document.querySelectorAll('.option-btn');
   optionButtons.forEach(btn => btn.disabled = true);
+  if (roomSocket) {
+    // In a room the server times and checks the answer, then sends everyone the result
+    roomSocket.send(JSON.stringify({ type: 'answer', guess: selected }));
+    button.classList.add('chosen');
+    document.getElementById('feedback').innerText = 'Waiting for the other players...';
+    return;
+  }
   
   const feedbackDiv = document.getElementById('feedback');
-  if (selected === correct) {
+  let result;
+  try {
+    const response = await fetch(currentRound.answer_url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': getCookie('csrftoken') },
+      body: JSON.stringify({ answer: selected, mode: answerMode, username: document.getElementById('username').value.trim() }),
+    });
+    if (!response.ok) {
+      throw new Error(`Answer rejected with status ${response.status}`);
+    }
+    result = await response.json();
+  } catch (error) {
+    feedbackDiv.innerText = 'Could not check your answer. Please try the next destination.';
+    document.getElementById('nextBtn').disabled = false;
+    return;
+  }
+  
+  if (currentRound.challenge && result.correct) {
+    challengeCorrect += 1;
+  }
+  // Totals are kept by the server; the client only displays them
+  score = result.session.score;
+  correctCount = result.session.correct;
+  wrongCount = result.session.wrong;
+  updateScore();
+  updateRank();
+  
+  if (result.correct) {
     button.classList.add('correct');
-    feedbackDiv.innerHTML = `🎉 Correct! Fun Fact: ${funFact}`;
-    score++;
-    correctCount++;
-    updateScore();
+    feedbackDiv.innerHTML = `🎉 Correct! Fun Fact: ${result.fun_fact}`;
     // Trigger bursty confetti animation for correct answer
     confetti({ particleCount: 200, spread: 100, origin: { y: 0.6 } });
   } else {
     button.classList.add('wrong');
-    feedbackDiv.innerHTML = `😢 Incorrect! Fun Fact: ${funFact}`;
-    wrongCount++;
-    updateScore();
+    feedbackDiv.innerHTML = answerMode === 'type'
+      ? `😢 Incorrect! It was ${result.answer}. Fun Fact: ${result.fun_fact}`
+      : `😢 Incorrect! Fun Fact: ${result.fun_fact}`;
     // Trigger full-screen cross animation for wrong answer
     triggerCrossAnimation();
     optionButtons.forEach(btn => {
-      if (btn.innerText === correct) {
+      if (btn.innerText === result.answer) {
         btn.classList.add('correct');
       } else if (!btn.classList.contains('wrong')) {
         btn.classList.add('wrong');
@@ -142,14 +337,90 @@ function triggerCrossAnimation() {
   }, 2000);
 }
 
-// Load the next question or restart the game if finished
+// Join the room named in the URL; rounds, scores and results arrive as messages
+function joinRoom() {
+  const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+  const name = encodeURIComponent(document.getElementById('username').value.trim());
+  roomSocket = new WebSocket(`${scheme}://${window.location.host}${roomSocketPath}${encodeURIComponent(roomCode)}?name=${name}`);
+  roomSocket.onmessage = event => handleRoomMessage(JSON.parse(event.data));
+  roomSocket.onclose = () => {
+    document.getElementById('feedback').innerText = 'Disconnected from the room. Reload the page to rejoin.';
+    document.getElementById('nextBtn').disabled = true;
+  };
+  const nextBtn = document.getElementById('nextBtn');
+  nextBtn.innerText = 'Start Round';
+  nextBtn.disabled = false;
+}
+
+function handleRoomMessage(message) {
+  switch (message.type) {
+    case 'joined':
+      playerName = message.player;
+      document.getElementById('tagline').innerText = `Room ${message.room}: share the link, then start a round!`;
+      break;
+    case 'players':
+    case 'answered':
+      showRoomScores(message.scores);
+      break;
+    case 'round':
+      currentRound = message;
+      renderRound(message);
+      document.getElementById('nextBtn').disabled = true;
+      break;
+    case 'result':
+      showRoomResult(message);
+      break;
+    case 'error':
+      document.getElementById('feedback').innerText = message.error;
+      break;
+  }
+}
+
+// Everyone's live score, best first
+function showRoomScores(scores) {
+  score = scores[playerName] || 0;
+  document.getElementById('scoreValue').innerText = score;
+  document.getElementById('score-details').innerText = Object.entries(scores)
+    .sort((a, b) => b[1] - a[1])
+    .map(([player, points]) => `${player}: ${points}`)
+    .join(' | ');
+}
+
+function showRoomResult(result) {
+  showRoomScores(result.scores);
+  const mine = result.answers[playerName];
+  document.querySelectorAll('.option-btn').forEach(btn => {
+    btn.disabled = true;
+    if (btn.innerText === result.answer) {
+      btn.classList.add('correct');
+    } else if (btn.classList.contains('chosen')) {
+      btn.classList.add('wrong');
+    }
+  });
+  const feedbackDiv = document.getElementById('feedback');
+  if (mine && mine.correct) {
+    feedbackDiv.innerHTML = `🎉 Correct! +${mine.points} in ${(mine.ms / 1000).toFixed(1)}s. Fun Fact: ${result.fun_fact}`;
+    confetti({ particleCount: 200, spread: 100, origin: { y: 0.6 } });
+  } else {
+    feedbackDiv.innerHTML = `😢 It was ${result.answer}. Fun Fact: ${result.fun_fact}`;
+  }
+  const nextBtn = document.getElementById('nextBtn');
+  nextBtn.innerText = 'Next Round';
+  nextBtn.disabled = false;
+}
+
+// Load the next round or restart the game if the last round failed to load
 function nextQuestion() {
-  if (currentQuestionIndex >= questions.length - 1) {
+  if (roomSocket) {
+    roomSocket.send(JSON.stringify({ type: 'start' }));
+    document.getElementById('nextBtn').disabled = true;
+    return;
+  }
+  if (currentRound === null) {
     initGame();
     document.getElementById('nextBtn').innerText = 'Next';
     return;
   }
-  currentQuestionIndex++;
   loadQuestion();
 }
 
@@ -159,20 +430,89 @@ function updateScore() {
   document.getElementById('score-details').innerText = `Correct: ${correctCount} | Wrong: ${wrongCount}`;
 }
 
-// Challenge a Friend feature: open WhatsApp share popup with dynamic text only
-document.getElementById('challengeBtn').addEventListener('click', () => {
+// Show the player's all-time rank (the leaderboard catches up when answers are flushed)
+async function updateRank() {
+  const username = document.getElementById('username').value.trim();
+  if (!username) {
+    return;
+  }
+  try {
+    const response = await fetch(`${leaderboardUrl}?limit=0&player=${encodeURIComponent(username)}`);
+    const data = await response.json();
+    if (data.me) {
+      document.getElementById('rank-display').innerText = `Rank #${data.me.rank} of ${data.players}`;
+    }
+  } catch (error) {
+    // The rank is informational only; ignore failures.
+  }
+}
+
+// Challenge a Friend feature: ask the server for a signed link carrying the
+// session's score and share it over WhatsApp
+document.getElementById('challengeBtn').addEventListener('click', async () => {
   const username = document.getElementById('username').value.trim();
   if (!username) {
     alert('Please enter a unique username to challenge a friend.');
     return;
   }
+  // Opened before the request so popup blockers see it as part of the click
+  const popup = window.open('', '_blank');
+  try {
+    const response = await fetch(createChallengeUrl, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': getCookie('csrftoken') },
+      body: JSON.stringify({ username }),
+    });
+    if (!response.ok) {
+      throw new Error(`Challenge rejected with status ${response.status}`);
+    }
+    const created = await response.json();
+    const shareMessage = encodeURIComponent(
+      `Hey, I'm ${created.challenger} with a score of ${created.score} in Globetrotter Challenge! Can you beat me? Play now: ${created.url}`
+    );
+    popup.location = `https://api.whatsapp.com/send?text=${shareMessage}`;
+  } catch (error) {
+    popup.close();
+    alert('Could not create a challenge link. Please try again.');
+  }
+});
+
+// Play Live: share a link to a head-to-head room over WhatsApp, then join that
+// room (or share the room already being played)
+document.getElementById('roomBtn').addEventListener('click', () => {
+  const username = document.getElementById('username').value.trim();
+  if (!username) {
+    alert('Please enter a unique username to play a friend live.');
+    return;
+  }
+  const code = roomCode || Math.random().toString(36).slice(2, 10);
+  const roomUrl = `${window.location.origin}/?room=${code}`;
   const shareMessage = encodeURIComponent(
-    `Hey, I'm ${username} with a score of ${score} in Globetrotter Challenge! Can you beat me? Play now: ${window.location.href}`
+    `Hey, I'm ${username} and I challenge you to a head-to-head Globetrotter Challenge! Join my room: ${roomUrl}`
   );
   const whatsappUrl = `https://api.whatsapp.com/send?text=${shareMessage}`;
   window.open(whatsappUrl, '_blank');
+  if (!roomCode) {
+    window.location.href = `${roomUrl}&name=${encodeURIComponent(username)}`;
+  }
 });
 
+// Load the challenge behind a challenge link: who sent it, their score and the rounds to play
+async function loadChallenge() {
+  try {
+    const response = await fetch(challengeRoundsUrl, { headers: { 'Accept': 'application/json' } });
+    if (!response.ok) {
+      throw new Error(`Challenge failed with status ${response.status}`);
+    }
+    challenge = await response.json();
+  } catch (error) {
+    return;
+  }
+  challengeRounds = challenge.rounds.map(round => ({ ...round, challenge: true }));
+  document.getElementById('tagline').innerText =
+    `${challenge.challenger} challenges you! Score to beat: ${challenge.score}`;
+}
+
 // Mode switching logic
 const modeSwitch = document.getElementById('modeSwitch');
 modeSwitch.addEventListener('click', () => {
@@ -181,4 +521,22 @@ modeSwitch.addEventListener('click', () => {
 });
 
 // Start the game when the page loads
-window.onload = initGame;
+window.onload = () => {
+  if (roomCode) {
+    // Keep the name chosen before following the room link
+    const name = new URLSearchParams(window.location.search).get('name');
+    if (name) {
+      document.getElementById('username').value = name;
+    }
+    joinRoom();
+    return;
+  }
+  if (challengeRoundsUrl) {
+    loadChallenge().then(initGame);
+  } else {
+    initGame();
+  }
+  if (answerMode === 'type') {
+    syncCatalog();
+  }
+};
@@ -0,0 +1,40 @@
+from django.db.models import Count, Q
+
+from .models import Answer, Destination
+
+
+def difficulty_score(answers, wrong):
+    """0-100 share of wrong answers, smoothed so rarely-played destinations start near 50."""
+    return round(100 * (wrong + 1) / (answers + 2))
+
+
+def refresh_destination_stats(batch_size=1000):
+    """
+    Recompute popularity (answers given) and difficulty for every destination
+    from the Answer table; returns how many destinations changed.
+    """
+    stats = {
+        row['destination_id']: (row['total'], row['wrong'])
+        for row in Answer.objects.filter(destination__isnull=False).values('destination_id').annotate(
+            total=Count('id'), wrong=Count('id', filter=Q(correct=False))
+        )
+    }
+    changed = 0
+    batch = []
+    queryset = Destination.objects.only('id', 'popularity', 'difficulty')
+    for destination in queryset.iterator(chunk_size=batch_size):
+        total, wrong = stats.get(destination.pk, (0, 0))
+        difficulty = difficulty_score(total, wrong)
+        if (destination.popularity, destination.difficulty) == (total, difficulty):
+            continue
+        destination.popularity = total
+        destination.difficulty = difficulty
+        batch.append(destination)
+        if len(batch) >= batch_size:
+            Destination.objects.bulk_update(batch, ['popularity', 'difficulty'])
+            changed += len(batch)
+            batch = []
+    if batch:
+        Destination.objects.bulk_update(batch, ['popularity', 'difficulty'])
+        changed += len(batch)
+    return changed
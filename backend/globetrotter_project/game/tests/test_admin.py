@@ -0,0 +1,91 @@
+# game/tests/test_admin.py
+import csv
+import io
+import json
+import tempfile
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from game import catalog
+from game.models import CatalogChange, Destination
+
+class DestinationAdminTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        override = override_settings(SNAPSHOT_ROOT=Path(tmpdir.name))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        self.paris = Destination.objects.create(city="Paris", country="France", clues=["City of Lights"])
+        self.tokyo = Destination.objects.create(city="Tokyo", country="Japan", clues=["Shibuya"], difficulty=80)
+        self.url = reverse("admin:game_destination_changelist")
+
+    def action(self, name, *destinations):
+        return self.client.post(self.url, {
+            "action": name, "_selected_action": [d.pk for d in destinations],
+        })
+
+    def test_changelist_search_and_filters(self):
+        """Test that the list searches city prefixes and ids and filters by region and difficulty."""
+        response = self.client.get(self.url, {"q": "tok"})
+        self.assertEqual([d.city for d in response.context["cl"].result_list], ["Tokyo"])
+        response = self.client.get(self.url, {"q": str(self.paris.pk)})
+        self.assertEqual([d.city for d in response.context["cl"].result_list], ["Paris"])
+        response = self.client.get(self.url, {"region": "East Asia", "difficulty": "hard"})
+        self.assertEqual([d.city for d in response.context["cl"].result_list], ["Tokyo"])
+        self.assertContains(response, reverse("admin:game_destination_import"))
+
+    def test_changelist_defers_json_columns(self):
+        """Test that the list view doesn't load clues or trivia."""
+        response = self.client.get(self.url)
+        self.assertTrue({"clues", "trivia"} <= response.context["cl"].result_list[0].get_deferred_fields())
+
+    def test_export_csv(self):
+        """Test that the CSV export streams the selected rows with JSON-encoded lists."""
+        response = self.action("export_csv", self.paris)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["city"] for row in rows], ["Paris"])
+        self.assertEqual(json.loads(rows[0]["clues"]), ["City of Lights"])
+
+    def test_export_jsonl_can_be_imported(self):
+        """Test that the JSON Lines export reads back as importable records."""
+        response = self.action("export_jsonl", self.paris, self.tokyo)
+        records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([r["city"] for r in records], ["Paris", "Tokyo"])
+        self.assertEqual(records[1]["difficulty"], 80)
+
+    def test_deactivate_logs_changes(self):
+        """Test that bulk deactivation updates the rows, logs the change and bumps the catalog."""
+        version = catalog.get_version()
+        self.action("deactivate", self.paris, self.tokyo)
+        self.assertFalse(Destination.objects.filter(is_active=True).exists())
+        self.assertEqual(
+            set(CatalogChange.objects.filter(op=CatalogChange.UPDATE).values_list("destination_id", flat=True)),
+            {self.paris.pk, self.tokyo.pk},
+        )
+        self.assertNotEqual(catalog.get_version(), version)
+
+    def test_upload_import(self):
+        """Test that an uploaded JSON Lines file goes through the batched importer, with dedup."""
+        records = [
+            {"city": "Kyōto", "country": "Japan", "clues": ["Temples"]},
+            {"city": "PARIS", "country": "France", "clues": ["Louvre"]},
+        ]
+        upload = SimpleUploadedFile("dataset.jsonl", "\n".join(json.dumps(r) for r in records).encode())
+        response = self.client.post(reverse("admin:game_destination_import"), {"file": upload, "dedup": "exact"})
+        self.assertRedirects(response, self.url)
+        self.assertEqual(sorted(Destination.objects.values_list("city", flat=True)), ["Kyōto", "Paris", "Tokyo"])
+
+    def test_upload_rejects_invalid_json(self):
+        """Test that a malformed upload is reported on the form."""
+        upload = SimpleUploadedFile("dataset.json", b"[{\"city\": ")
+        response = self.client.post(reverse("admin:game_destination_import"), {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors["file"])
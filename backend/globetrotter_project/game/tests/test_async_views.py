@@ -0,0 +1,91 @@
+# game/tests/test_async_views.py
+import json
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from game import catalog, metrics, rounds
+from game.models import Answer, Destination, GameSession
+from game.pool import round_pool
+from game.scoring import answer_buffer
+
+@override_settings(ROOT_URLCONF="globetrotter_project.asgi_urls")
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        metrics.registry.clear()
+        self.addCleanup(answer_buffer.clear)
+        self.paris = Destination.objects.create(city="Paris", country="France", clues=["City of Lights"])
+        self.tokyo = Destination.objects.create(city="Tokyo", country="Japan", clues=["Shibuya"])
+
+    async def answer(self, destination, guess, **extra):
+        url = reverse("answer_round", args=[rounds.make_round_id(destination.pk)])
+        return await self.async_client.post(url, json.dumps({"answer": guess, **extra}),
+                                            content_type="application/json")
+
+    async def test_index_sets_csrf_cookie_and_etag(self):
+        """Test that the async index sends the CSRF cookie and honours the catalog ETag."""
+        response = await self.async_client.get(reverse("index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("csrftoken", response.cookies)
+        self.assertIn("no-cache", response["Cache-Control"])
+        cached = await self.async_client.get(reverse("index"), headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_rounds_and_answers(self):
+        """Test that async rounds and answers behave like the sync views, buffer included."""
+        round_data = (await self.async_client.get(reverse("next_round"))).json()
+        self.assertEqual(len(round_data["clues"]), 1)
+        self.assertEqual((await self.async_client.get(reverse("next_round"), {"region": "Atlantis"})).status_code, 400)
+        self.assertEqual((await self.async_client.get(reverse("answer_round", args=["x"]))).status_code, 405)
+
+        first = await self.answer(self.paris, "Paris", username="ana")
+        self.assertEqual(first.json()["session"], {"score": 1, "correct": 1, "wrong": 0})
+        second = await self.answer(self.tokyo, "Paris")
+        self.assertEqual(second.json()["session"], {"score": 1, "correct": 1, "wrong": 1})
+        self.assertEqual(await Answer.objects.acount(), 0)
+        await sync_to_async(answer_buffer.flush)()
+        third = await self.answer(self.tokyo, "tokio", mode="type")
+        self.assertEqual(third.json()["session"], {"score": 2, "correct": 2, "wrong": 1})
+        self.assertEqual(await Answer.objects.acount(), 2)
+
+    async def test_difficulty_rounds_use_async_candidates(self):
+        """Test that difficulty-filtered rounds read their candidates with the async ORM."""
+        await Destination.objects.filter(pk=self.tokyo.pk).aupdate(difficulty=10)
+        catalog.bump_version()
+        response = await self.async_client.get(reverse("next_round"), {"difficulty": "easy"})
+        self.assertEqual(response.json()["clues"], ["Shibuya"])
+
+    async def test_typed_mode_with_filters(self):
+        """Test that difficulty and region filters keep async typed rounds free of options."""
+        self.addCleanup(round_pool.clear)
+        await sync_to_async(round_pool.refill)([(rounds.NORMAL, "Western Europe")])
+        for params in [{"difficulty": "normal"}, {"region": "Western Europe"}]:
+            response = await self.async_client.get(reverse("next_round"), {"mode": "type", **params})
+            self.assertEqual(response.status_code, 200, params)
+            self.assertNotIn("options", response.json())
+
+    async def test_metrics_count_async_queries(self):
+        """Test that the metrics middleware times queries made through the async ORM."""
+        await self.answer(self.paris, "Paris")
+        totals = metrics.registry.collect()
+        queries = totals[("game_db_queries", (("view", "answer_round"),))]
+        self.assertGreater(queries[-1], 0)
+
+
+class AnswerBufferGenerationTest(TestCase):
+    def test_flush_invalidates_generation(self):
+        """Test that an answer is not queued against a generation older than the last flush."""
+        self.addCleanup(answer_buffer.clear)
+        session = GameSession.objects.create()
+        lima = Destination.objects.create(city="Lima")
+        def answer():
+            return Answer(session=session, destination=lima, guess="Lima", correct=True, answered_at=timezone.now())
+        generation = answer_buffer.generation
+        self.assertEqual(answer_buffer.add_unless_flushed(generation, answer()), (0, 0, 0))
+        self.assertEqual(answer_buffer.add_unless_flushed(generation, answer()), (1, 1, 0))
+        answer_buffer.flush()
+        self.assertIsNone(answer_buffer.add_unless_flushed(generation, answer()))
+        self.assertEqual(answer_buffer.add_unless_flushed(answer_buffer.generation, answer()), (0, 0, 0))
@@ -0,0 +1,54 @@
+# game/tests/test_benchmarking.py
+import random
+import tempfile
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from game import benchmarking, catalog
+from game.models import Destination
+from game.scoring import answer_buffer
+
+# Warm-cache SQL queries allowed per request; these must not grow with the catalog.
+QUERY_BUDGET = {'index': 0, 'next_round': 0, 'pooled_round': 0, 'answer': 2, 'leaderboard': 0, 'catalog': 0}
+
+class BenchmarkSuiteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        self.addCleanup(answer_buffer.clear)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        override = override_settings(SNAPSHOT_ROOT=tmpdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_seed_tops_up_catalog(self):
+        """Test that seeding only adds the missing synthetic destinations."""
+        benchmarking.seed_destinations(30, batch_size=7)
+        benchmarking.seed_destinations(50, batch_size=7)
+        self.assertEqual(Destination.objects.count(), 50)
+        self.assertEqual(len(catalog.get_catalog()), 50)
+
+    def test_query_counts_stay_flat_as_catalog_grows(self):
+        """Test that no endpoint's query count depends on the catalog size."""
+        results = benchmarking.run_suite(
+            [20, 200], benchmarking.ENDPOINTS, ['client'], [1], requests=5, seed=1,
+        )
+        for result in results:
+            self.assertEqual(result.errors, 0, result.key)
+            self.assertLessEqual(result.queries_per_request, QUERY_BUDGET[result.endpoint], result.key)
+
+    def test_compare_flags_regressions(self):
+        """Test that slower p95, extra queries and bigger responses are reported."""
+        base = benchmarking.Result('index', 'client', 10, 1, 5, 0, 100.0, 1.0, 2.0, 3.0, 0.0, 100.0)
+        baseline = benchmarking.to_baseline([base])
+        same = benchmarking.Result(**{**baseline[base.key], 'p95_ms': 2.5})
+        self.assertEqual(benchmarking.compare([same], baseline, tolerance=0.5), [])
+        worse = benchmarking.Result(**{**baseline[base.key], 'p95_ms': 4.0, 'queries_per_request': 1.0})
+        self.assertEqual(len(benchmarking.compare([worse], baseline, tolerance=0.5)), 2)
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        random.Random(0).shuffle(values)
+        self.assertEqual(benchmarking.percentile(values, 50), 50)
+        self.assertEqual(benchmarking.percentile(values, 99), 99)
@@ -0,0 +1,60 @@
+# game/tests/test_catalog.py
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import TestCase
+from game import catalog, rounds
+from game.models import Destination
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        for city in ["Paris", "Tokyo", "Cairo", "Lima"]:
+            Destination.objects.create(city=city, clues=[f"Clue about {city}"], fun_fact=f"{city} fact")
+
+    def test_save_and_delete_bump_version(self):
+        """Test that model changes move the catalog to a new version."""
+        version = catalog.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Destination.objects.create(city="Oslo")
+            # Not before the commit, or another worker could cache the old rows under the new version.
+            self.assertEqual(catalog.get_version(), version)
+        self.assertEqual(catalog.get_version(), version + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Destination.objects.filter(city="Oslo").get().delete()
+        self.assertEqual(catalog.get_version(), version + 2)
+        self.assertEqual(len(catalog.get_catalog()), 4)
+
+    def test_steady_state_rounds_do_no_queries(self):
+        """Test that rounds are served from the cache once it is warm."""
+        catalog.get_catalog()
+        with self.assertNumQueries(0):
+            self.client.get(reverse('next_round'))
+            self.assertIs(rounds.check_answer(rounds.make_round_id(catalog.get_catalog().ids[0]), 'Paris')['correct'], True)
+
+    def test_cache_survives_losing_the_local_lru(self):
+        """Test that a cold process reuses the shared cache instead of the database."""
+        catalog.get_catalog()
+        catalog._local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(catalog.get_catalog()), 4)
+
+    def test_index_etag(self):
+        """Test that the homepage answers conditional requests with 304."""
+        response = self.client.get(reverse('index'))
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Destination.objects.create(city="Oslo")
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_index_etag_changes_with_the_build(self):
+        """Test that a new deploy invalidates the homepage ETag even when the catalog is unchanged."""
+        etag = self.client.get(reverse('index'))['ETag']
+        with self.settings(GAME_BUILD_ID='next-release'):
+            response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('next-release', response['ETag'])
@@ -0,0 +1,110 @@
+# game/tests/test_challenges.py
+import json
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from game import catalog, challenges, rounds
+from game.models import Destination
+from game.scoring import answer_buffer
+
+class ChallengeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        self.addCleanup(answer_buffer.clear)
+        for city in ["Paris", "Tokyo", "Cairo", "Lima", "Oslo", "Rome", "Delhi"]:
+            Destination.objects.create(city=city, clues=[f"{city} clue 1", f"{city} clue 2", f"{city} clue 3"])
+        catalog.get_catalog()
+        self.token = challenges.make_token("ana", 7, seed=42)
+
+    def test_token_round_trip(self):
+        """Test that a compact token carries the challenge and rejects tampering."""
+        self.assertLess(len(self.token), 100)
+        self.assertEqual(challenges.read_token(self.token), challenges.Challenge("ana", 7, 42))
+        with self.assertRaises(challenges.ChallengeError):
+            challenges.read_token(self.token[:-1] + ("A" if self.token[-1] != "A" else "B"))
+        with self.assertRaises(challenges.ChallengeError):
+            challenges.read_token(rounds.make_round_id(1))
+
+    def test_rounds_follow_the_seed(self):
+        """Test that everyone gets the same rounds, each with their own signed round ids."""
+        challenge = challenges.read_token(self.token)
+        first, second = challenges.build_rounds(challenge), challenges.build_rounds(challenge)
+        self.assertEqual(len(first), challenges.CHALLENGE_ROUNDS)
+        strip = lambda rs: [(r["clues"], r["options"]) for r in rs]
+        self.assertEqual(strip(first), strip(second))
+        self.assertNotEqual([r["id"] for r in first], [r["id"] for r in second])
+        other = challenges.read_token(challenges.make_token("ana", 7, seed=43))
+        self.assertNotEqual(strip(challenges.build_rounds(other)), strip(first))
+
+    def test_landing_page_needs_no_queries(self):
+        """Test that the landing page renders from the token and cached catalog alone."""
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("challenge", args=[self.token]))
+        self.assertContains(response, 'property="og:image"')
+        self.assertContains(response, reverse("challenge_preview", args=[self.token]))
+        self.assertContains(response, "Score to beat: 7")
+        self.assertIn("public", response["Cache-Control"])
+        self.assertNotIn("csrftoken", response.cookies)
+        self.assertEqual(self.client.get(reverse("challenge", args=["nope"])).status_code, 404)
+
+    def test_challenge_rounds_can_be_answered(self):
+        """Test that the rounds endpoint only writes the session, and its rounds score normally."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("challenge_rounds", args=[self.token]))
+        self.assertEqual([q["sql"] for q in ctx.captured_queries if '"game_' in q["sql"]], [])
+        self.assertIn("csrftoken", response.cookies)
+        data = response.json()
+        self.assertEqual((data["challenger"], data["score"]), ("ana", 7))
+        first = data["rounds"][0]
+        answer = first["clues"][0].split(" clue")[0]
+        result = self.client.post(first["answer_url"], json.dumps({"answer": answer}), content_type="application/json")
+        self.assertTrue(result.json()["correct"])
+
+    def test_refetching_cannot_score_again(self):
+        """Test that fetching the rounds again returns the same ids, so known answers can't be replayed."""
+        url = reverse("challenge_rounds", args=[self.token])
+        first = self.client.get(url).json()["rounds"]
+        for round_data in first:
+            answer = round_data["clues"][0].split(" clue")[0]
+            self.client.post(round_data["answer_url"], json.dumps({"answer": answer}), content_type="application/json")
+        again = self.client.get(url).json()["rounds"]
+        self.assertEqual([r["id"] for r in again], [r["id"] for r in first])
+        for round_data in again:
+            answer = round_data["clues"][0].split(" clue")[0]
+            response = self.client.post(round_data["answer_url"], json.dumps({"answer": answer}),
+                                        content_type="application/json")
+            self.assertEqual(response.status_code, 409)
+        created = self.client.post(reverse("create_challenge"), json.dumps({"username": "bob"}),
+                                   content_type="application/json")
+        self.assertEqual(created.json()["score"], challenges.CHALLENGE_ROUNDS)
+        other = self.client_class().get(url).json()["rounds"]
+        self.assertNotEqual([r["id"] for r in other], [r["id"] for r in first])
+
+    def test_create_challenge_uses_session_score(self):
+        """Test that the link carries the score from the player's session, not from the client."""
+        round_id = rounds.make_round_id(Destination.objects.get(city="Paris").pk)
+        self.client.post(reverse("answer_round", args=[round_id]), json.dumps({"answer": "Paris"}),
+                         content_type="application/json")
+        response = self.client.post(reverse("create_challenge"), json.dumps({"username": "bob", "score": 99}),
+                                    content_type="application/json")
+        data = response.json()
+        self.assertEqual(data["score"], 1)
+        token = data["url"].rsplit("/", 1)[1]
+        self.assertEqual(challenges.read_token(token).challenger, "bob")
+        missing = self.client.post(reverse("create_challenge"), "{}", content_type="application/json")
+        self.assertEqual(missing.status_code, 400)
+
+    def test_preview_image_is_cached(self):
+        """Test that the preview is a PNG rendered once per challenger and score and cacheable forever."""
+        response = self.client.get(reverse("challenge_preview", args=[self.token]))
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+        self.assertIn("immutable", response["Cache-Control"])
+        same_card = challenges.make_token("ana", 7, seed=1)
+        with mock.patch.object(challenges, "render_preview", side_effect=AssertionError), self.assertNumQueries(0):
+            again = self.client.get(reverse("challenge_preview", args=[same_card]))
+        self.assertEqual(again.content, response.content)
@@ -0,0 +1,89 @@
+# game/tests/test_changes.py
+import json
+import tempfile
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from game import catalog, changes, rounds
+from game.importer import DestinationImporter
+from game.models import CatalogChange, Destination
+
+class CatalogChangesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        override = override_settings(SNAPSHOT_ROOT=tmpdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.paris = Destination.objects.create(city="Paris", country="France", clues=["City of Lights"])
+        self.tokyo = Destination.objects.create(city="Tokyo", country="Japan", clues=["Shibuya"])
+
+    def changes(self, since):
+        response = self.client.get(reverse("catalog_changes"), {"since": since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_first_sync_sends_public_catalog(self):
+        """Test that a client without a version gets every playable destination, without clues."""
+        data = self.changes(0)
+        self.assertTrue(data["reset"])
+        self.assertEqual(data["version"], CatalogChange.objects.latest("id").pk)
+        self.assertEqual([d["city"] for d in data["upserts"]], ["Paris", "Tokyo"])
+        self.assertNotIn("clues", data["upserts"][0])
+
+    def test_delta_holds_only_changes(self):
+        """Test that edits, deactivations and deletes since a version come back collapsed."""
+        since = self.changes(0)["version"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.changes(since), {"version": since, "reset": False, "upserts": [], "deletes": []})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paris.country = "FR"
+            self.paris.save()
+            self.paris.save()
+            self.tokyo.is_active = False
+            self.tokyo.save()
+            lima = Destination.objects.create(city="Lima", country="Peru").pk
+            Destination.objects.filter(pk=lima).delete()
+        data = self.changes(since)
+        self.assertFalse(data["reset"])
+        self.assertEqual(data["upserts"], [{"id": changes.public_id(self.paris.pk), "city": "Paris"}])
+        self.assertEqual(data["deletes"], sorted([changes.public_id(self.tokyo.pk), changes.public_id(lima)]))
+        self.assertEqual(data["version"], CatalogChange.objects.latest("id").pk)
+
+    def test_import_is_logged(self):
+        """Test that bulk imports record their inserts and updates."""
+        since = self.changes(0)["version"]
+        DestinationImporter(update=True).run([{"city": "Paris", "country": "France", "clues": ["Louvre"]},
+                                              {"city": "Cairo", "country": "Egypt"}])
+        catalog.bump_version()
+        data = self.changes(since)
+        self.assertEqual(sorted(d["city"] for d in data["upserts"]), ["Cairo", "Paris"])
+
+    def test_far_behind_or_ahead_resets(self):
+        """Test that clients past the delta limit or ahead of the log start over."""
+        since = self.changes(0)["version"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Destination.objects.create(city="Lima")
+            Destination.objects.create(city="Cairo")
+        with self.settings(GAME_CATALOG_DELTA_LIMIT=1):
+            self.assertTrue(self.changes(since)["reset"])
+        self.assertFalse(self.changes(since)["reset"])
+        self.assertTrue(self.changes(since + 1000)["reset"])
+        self.assertEqual(self.client.get(reverse("catalog_changes"), {"since": "x"}).status_code, 400)
+
+    def test_rounds_cannot_be_joined_to_the_catalog(self):
+        """Test that nothing a round carries matches a public catalog entry."""
+        self.paris.image_url = "https://example.com/paris.jpg"
+        self.paris.save()
+        entries = self.changes(0)["upserts"]
+        self.assertEqual({key for entry in entries for key in entry}, {"id", "city"})
+        public = json.dumps(entries)
+        for _ in range(5):
+            round_data = self.client.get(reverse("next_round")).json()
+            pk = rounds.read_round_id(round_data["id"])
+            self.assertNotIn(round_data["id"], public)
+            self.assertNotIn("paris.jpg", public)
+            self.assertNotIn(pk, [entry["id"] for entry in entries])
+            self.assertNotIn(str(pk), [entry["id"] for entry in entries])
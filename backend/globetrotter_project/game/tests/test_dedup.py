@@ -0,0 +1,56 @@
+# game/tests/test_dedup.py
+import random
+import string
+from django.test import SimpleTestCase
+from game.dedup import Deduplicator, dedup_key
+
+class DedupKeyTest(SimpleTestCase):
+    def test_folds_accents_case_and_punctuation(self):
+        """Test that accents, case, punctuation and spacing don't change the key."""
+        self.assertEqual(dedup_key("Kyōto"), dedup_key("KYOTO"))
+        self.assertEqual(dedup_key("St. Petersburg"), dedup_key("Saint Petersburg"))
+        self.assertEqual(dedup_key("Wash-ington"), dedup_key("Wash ington"))
+
+    def test_aliases_and_trailing_city(self):
+        """Test that known aliases and a trailing "City" map to the same key."""
+        self.assertEqual(dedup_key("NYC"), dedup_key("New York"))
+        self.assertEqual(dedup_key("New York City"), dedup_key("New York"))
+        self.assertEqual(dedup_key("Mexico City"), dedup_key("Mexico"))
+
+class DeduplicatorTest(SimpleTestCase):
+    def test_exact_duplicates(self):
+        """Test that other spellings return the first name seen."""
+        dedup = Deduplicator(fuzzy=False)
+        self.assertIsNone(dedup.add("New York City"))
+        self.assertIsNone(dedup.add("Kyoto"))
+        self.assertEqual(dedup.add("NYC"), "New York City")
+        self.assertEqual(dedup.add("Kyōto"), "Kyoto")
+        self.assertEqual(len(dedup), 2)
+
+    def test_fuzzy_typos(self):
+        """Test that a likely typo of a long enough name is a duplicate only when fuzzy."""
+        exact, fuzzy = Deduplicator(fuzzy=False), Deduplicator()
+        for dedup in (exact, fuzzy):
+            dedup.add("Rio de Janeiro")
+            dedup.add("Paris")
+        self.assertEqual(fuzzy.find("Rio de Janero"), "Rio de Janeiro")
+        self.assertIsNone(exact.find("Rio de Janero"))
+        # One edit in a short name is too much of its length to call it the same city.
+        self.assertIsNone(fuzzy.find("Pars"))
+
+    def test_country_guard(self):
+        """Test that similar names in different known countries are different cities."""
+        dedup = Deduplicator()
+        dedup.add("San Fernando", "Spain")
+        self.assertIsNone(dedup.add("San Fernanda", "Philippines"))
+        self.assertEqual(dedup.find("San Fernandi", "Spain"), "San Fernando")
+        self.assertEqual(dedup.find("San Fernandi"), "San Fernando")
+
+    def test_many_names(self):
+        """Test that distinct random names are all kept and their typos found."""
+        rng = random.Random(7)
+        names = {"".join(rng.choices(string.ascii_lowercase, k=12)) for _ in range(2000)}
+        dedup = Deduplicator()
+        self.assertTrue(all(dedup.add(name) is None for name in names))
+        name = sorted(names)[0]
+        self.assertEqual(dedup.find(name[:5] + name[6:]), name)
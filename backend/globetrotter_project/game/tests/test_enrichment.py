@@ -0,0 +1,355 @@
+# game/tests/test_enrichment.py
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+import httpx
+from django.test import SimpleTestCase
+
+# The dataset builder lives in scripts/, outside the Django project.
+sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "scripts"))
+import final_code  # noqa: E402
+from enrichment import (  # noqa: E402
+    Backoff, Checkpoint, HttpxTransport, Response, ResponseCache, Stats, TokenBucket, TransportError,
+    UpstreamClient, UpstreamStats, parse_retry_after,
+)
+
+def completion(content):
+    body = {"choices": [{"message": {"content": content}}]}
+    return Response(200, {"content-type": "application/json"}, json.dumps(body).encode())
+
+class StubTransport:
+    """Answers requests with `handler(method, url, json, params)` and records them."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    async def request(self, method, url, headers=None, json=None, params=None):
+        self.calls.append((method, url, json, params))
+        return self.handler(method, url, json, params)
+
+    async def aclose(self):
+        pass
+
+class RecordingBackoff(Backoff):
+    """Backoff with millisecond delays that records what it was asked for."""
+
+    def __init__(self):
+        super().__init__(base=0.001, maximum=0.001)
+        self.delays = []
+
+    def delay(self, attempt, retry_after=None):
+        delay = super().delay(attempt, retry_after)
+        self.delays.append((attempt, retry_after, delay))
+        return delay
+
+class SlowTransport:
+    """Takes 10ms per request and tracks the most requests it had in flight at once."""
+
+    def __init__(self):
+        self.active = self.peak = 0
+
+    async def request(self, method, url, headers=None, json=None, params=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return Response(200, {}, b"")
+
+def email_date(timestamp):
+    return time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(timestamp))
+
+def replies(*answers):
+    """A handler giving each answer in turn, then repeating the last; exceptions are raised, not returned."""
+    answers = list(answers)
+
+    def handler(*args):
+        answer = answers.pop(0) if len(answers) > 1 else answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    return handler
+
+def dataset_handler(method, url, body, params):
+    """A well-behaved OpenAI and Unsplash: details for the city in the prompt, one photo per search."""
+    if url == final_code.UNSPLASH_URL:
+        photo = {"urls": {"regular": f"https://images.example.com/{params['query']}.jpg"}}
+        return Response(200, {}, json.dumps({"results": [photo]}).encode())
+    city = re.search(r"destination (.+?) in the following", body["messages"][0]["content"]).group(1)
+    return completion(json.dumps({"city": city, "country": "Peru", "clues": [f"{city} clue"],
+                                  "fun_fact": "Fact.", "trivia": ["Trivia."]}))
+
+class ResponseCacheTest(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.cache = ResponseCache(tmpdir.name)
+
+    def test_round_trip_and_key(self):
+        """Test that a stored response reads back and the key follows the request body, not the order of its keys."""
+        key = ResponseCache.key("POST", "https://api.example.com", body={"a": 1, "b": 2})
+        self.assertEqual(key, ResponseCache.key("POST", "https://api.example.com", body={"b": 2, "a": 1}))
+        self.assertNotEqual(key, ResponseCache.key("POST", "https://api.example.com", body={"a": 2, "b": 2}))
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, Response(200, {"x-id": "1"}, "Zürich".encode()))
+        self.assertEqual(self.cache.get(key), Response(200, {"x-id": "1"}, "Zürich".encode()))
+        self.cache.delete(key)
+        self.assertIsNone(self.cache.get(key))
+
+    def test_corrupt_entry_is_a_miss(self):
+        """Test that an unreadable entry is treated as missing."""
+        key = ResponseCache.key("GET", "https://api.example.com")
+        self.cache.set(key, Response(200, {}, b"{}"))
+        self.cache._path(key).write_text("{not json")
+        self.assertIsNone(self.cache.get(key))
+
+class CheckpointTest(SimpleTestCase):
+    def test_append_load_and_reset(self):
+        """Test that finished records load back by city, a torn last line is skipped and reset starts over."""
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = Checkpoint(Path(tmp) / "done.jsonl")
+            self.assertEqual(checkpoint.load(), {})
+            checkpoint.append({"city": "Lima", "country": "Peru"})
+            checkpoint.append({"city": "Cusco", "country": "Peru"})
+            with open(checkpoint.path, "a") as f:
+                f.write('{"city": "Qui')
+            self.assertEqual(list(checkpoint.load()), ["Lima", "Cusco"])
+            checkpoint.reset()
+            self.assertEqual(checkpoint.load(), {})
+
+class ValidatedCacheTest(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.cache = ResponseCache(tmpdir.name)
+        self.answers = [completion("not json at all"), completion('{"city": "Lima", "country": "Peru"}')]
+        self.transport = StubTransport(lambda *args: self.answers.pop(0))
+        self.client = UpstreamClient(self.transport, limits={}, cache=self.cache)
+
+    def test_retry_reaches_the_network(self):
+        """Test that a completion that doesn't parse is not cached, so the retry asks the API again."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            details = asyncio.run(final_code.generate_details(self.client, "Lima"))
+        self.assertEqual(details["country"], "Peru")
+        self.assertEqual(len(self.transport.calls), 2)
+        key = ResponseCache.key("POST", final_code.OPENAI_URL, body=self.transport.calls[0][2])
+        self.assertEqual(final_code.parse_details(self.cache.get(key))["city"], "Lima")
+
+    def test_bad_cached_body_is_evicted(self):
+        """Test that an unusable body already in the cache is dropped and fetched again."""
+        key = ResponseCache.key("POST", "https://api.example.com", body={"q": 1})
+        self.cache.set(key, completion("not json at all"))
+        self.answers.pop(0)
+        response = asyncio.run(self.client.request(
+            "openai", "POST", "https://api.example.com", validate=final_code.parse_details, json={"q": 1},
+        ))
+        self.assertEqual(final_code.parse_details(response)["city"], "Lima")
+        self.assertEqual(self.cache.get(key), response)
+        self.assertEqual(self.client.stats.for_upstream("openai").cache_hits, 0)
+
+class DatasetBuildTest(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+        Path("data.json").write_text(json.dumps([{"city": "Lima", "country": "Peru"},
+                                                 {"city": "Cusco", "country": "Peru"}]))
+
+    def build(self, transport=None, **options):
+        args = argparse.Namespace(
+            target=2, max_attempts=0, concurrency=4, openai_rate=1000.0, unsplash_rate=1000.0,
+            cache_dir="cache", checkpoint="done.jsonl", resume=False, cache_only=False,
+        )
+        vars(args).update(options)
+        with mock.patch.object(final_code, "HttpxTransport", lambda **kwargs: transport), \
+                contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(final_code.main(args))
+        return json.loads(Path("expanded_dataset.json").read_text())
+
+    def test_resume_and_cache_only(self):
+        """Test that --resume skips finished cities and --cache-only rebuilds the dataset offline."""
+        built = self.build(StubTransport(dataset_handler))
+        self.assertEqual([d["city"] for d in built], ["Lima", "Cusco"])
+        self.assertEqual(built[0]["image_url"], "https://images.example.com/Lima.jpg")
+
+        transport = StubTransport(dataset_handler)
+        self.assertEqual(self.build(transport, resume=True), built)
+        self.assertEqual(transport.calls, [])
+
+        Path("done.jsonl").unlink()
+        self.assertEqual(self.build(cache_only=True), built)
+
+    def test_resume_finishes_a_partial_build(self):
+        """Test that --resume only pays for the cities missing from the checkpoint."""
+        Checkpoint("done.jsonl").append({"city": "Lima", "country": "Peru", "clues": ["Kept."]})
+        transport = StubTransport(dataset_handler)
+        built = self.build(transport, resume=True)
+        self.assertEqual([d["clues"] for d in built], [["Kept."], ["Cusco clue"]])
+        self.assertEqual({params["query"] for _m, url, _b, params in transport.calls if params}, {"Cusco"})
+
+class HttpxTransportTest(SimpleTestCase):
+    def transport(self, handler):
+        transport = HttpxTransport()
+        asyncio.run(transport.aclose())
+        transport._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return transport
+
+    def test_buffers_response_with_lower_case_headers(self):
+        """Test that the response body is buffered and header names are lower-cased."""
+        def handler(request):
+            self.assertEqual(request.url.params["query"], "Lima")
+            return httpx.Response(429, headers={"Retry-After": "3"}, content=b"slow down")
+
+        transport = self.transport(handler)
+        response = asyncio.run(transport.request("GET", "https://api.example.com", params={"query": "Lima"}))
+        self.assertEqual(response, Response(429, {"retry-after": "3", "content-length": "9"}, b"slow down"))
+
+    def test_network_error_becomes_transport_error(self):
+        """Test that an httpx error surfaces as TransportError."""
+        def handler(request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        transport = self.transport(handler)
+        with self.assertRaisesMessage(TransportError, "connection refused"):
+            asyncio.run(transport.request("GET", "https://api.example.com"))
+
+class RetryTest(SimpleTestCase):
+    def setUp(self):
+        self.backoff = RecordingBackoff()
+
+    def send(self, handler, limits=None, max_retries=3):
+        self.transport = StubTransport(handler)
+        self.client = UpstreamClient(self.transport, limits=limits or {}, max_retries=max_retries,
+                                     backoff=self.backoff)
+        return asyncio.run(self.client.request("openai", "GET", "https://api.example.com"))
+
+    def test_retry_after_is_honoured(self):
+        """Test that a 429 waits at least Retry-After and pauses the upstream's bucket before retrying."""
+        sent = []
+
+        def handler(*args):
+            sent.append(time.monotonic())
+            return Response(429, {"retry-after": "0.05"}, b"") if len(sent) == 1 else Response(200, {}, b"ok")
+
+        response = self.send(handler, limits={"openai": TokenBucket(rate=1000)})
+        self.assertEqual(response.status_code, 200)
+        [(attempt, retry_after, delay)] = self.backoff.delays
+        self.assertEqual((attempt, retry_after), (0, 0.05))
+        self.assertGreaterEqual(delay, 0.05)
+        self.assertGreaterEqual(sent[1] - sent[0], 0.05)
+        stats = self.client.stats.for_upstream("openai")
+        self.assertEqual((stats.requests, stats.throttled, stats.retries), (2, 1, 1))
+
+    def test_retry_after_formats(self):
+        """Test that Retry-After is read as delta-seconds or an HTTP date, and ignored when malformed."""
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertEqual(parse_retry_after("-1"), 0.0)
+        when = parse_retry_after(email_date(time.time() + 60))
+        self.assertTrue(55 < when <= 60)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_server_errors_are_retried_with_backoff(self):
+        """Test that 5xx responses are retried with a growing backoff until one succeeds."""
+        response = self.send(replies(Response(503, {}, b""), Response(500, {}, b""), Response(200, {}, b"ok")))
+        self.assertEqual(response.body, b"ok")
+        self.assertEqual([(attempt, retry_after) for attempt, retry_after, _ in self.backoff.delays],
+                         [(0, None), (1, None)])
+        stats = self.client.stats.for_upstream("openai")
+        self.assertEqual((stats.requests, stats.retries, stats.failures), (3, 2, 0))
+
+    def test_backoff_is_capped(self):
+        """Test that the full-jitter delay stays within base * 2**attempt and the maximum."""
+        backoff = Backoff(base=1.0, maximum=4.0)
+        for attempt in range(6):
+            self.assertLessEqual(backoff.delay(attempt), min(4.0, 2 ** attempt))
+        self.assertGreaterEqual(backoff.delay(0, retry_after=10), 10)
+
+    def test_last_error_response_is_returned(self):
+        """Test that a status still failing after the last retry is handed back and counted as a failure."""
+        response = self.send(replies(Response(502, {}, b"bad gateway")), max_retries=2)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(len(self.transport.calls), 3)
+        self.assertEqual(self.client.stats.for_upstream("openai").failures, 1)
+
+    def test_client_errors_are_not_retried(self):
+        """Test that a 4xx other than 408/425/429 is returned straight away."""
+        response = self.send(replies(Response(404, {}, b"")))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(self.transport.calls), 1)
+
+    def test_transport_errors_are_retried_then_raised(self):
+        """Test that a transport error is retried, and raised once the retries run out."""
+        response = self.send(replies(TransportError("reset"), Response(200, {}, b"ok")))
+        self.assertEqual(response.body, b"ok")
+        self.assertEqual(self.client.stats.for_upstream("openai").retries, 1)
+
+        with self.assertRaisesMessage(TransportError, "failed after 3 attempts"):
+            self.send(replies(TransportError("reset")), max_retries=2)
+        self.assertEqual(len(self.transport.calls), 3)
+        self.assertEqual(self.client.stats.for_upstream("openai").failures, 1)
+
+class LimitTest(SimpleTestCase):
+    def test_bucket_limits_its_own_upstream(self):
+        """Test that a token bucket spaces out its upstream's requests and leaves other upstreams alone."""
+        async def run():
+            client = UpstreamClient(StubTransport(replies(Response(200, {}, b""))),
+                                    limits={"unsplash": TokenBucket(rate=20, capacity=1)})
+            started = time.monotonic()
+            await asyncio.gather(*(client.request("openai", "GET", "https://a.example.com") for _ in range(5)))
+            unlimited = time.monotonic() - started
+            started = time.monotonic()
+            await asyncio.gather(*(client.request("unsplash", "GET", "https://b.example.com") for _ in range(5)))
+            return unlimited, time.monotonic() - started
+
+        unlimited, limited = asyncio.run(run())
+        # One token up front, then one every 50ms.
+        self.assertGreaterEqual(limited, 0.19)
+        self.assertLess(unlimited, 0.1)
+
+    def test_concurrency_cap(self):
+        """Test that no more than `concurrency` requests are in flight at once."""
+        transport = SlowTransport()
+        client = UpstreamClient(transport, limits={}, concurrency=3)
+
+        async def run():
+            await asyncio.gather(*(client.request("openai", "GET", "https://api.example.com") for _ in range(10)))
+
+        asyncio.run(run())
+        self.assertEqual(transport.peak, 3)
+        self.assertEqual(client.stats.for_upstream("openai").requests, 10)
+
+class StatsTest(SimpleTestCase):
+    def test_percentiles(self):
+        """Test that percentiles use the nearest rank and an empty upstream reports zero."""
+        stats = UpstreamStats(latencies=[0.4, 0.1, 0.3, 0.2])
+        self.assertEqual([stats.percentile(p) for p in (25, 50, 99)], [0.1, 0.2, 0.4])
+        self.assertEqual(UpstreamStats().percentile(50), 0.0)
+
+    def test_report_after_a_run(self):
+        """Test that the end-of-run report lists each upstream's requests, hits, retries, throttling and failures."""
+        stats = Stats()
+        client = UpstreamClient(
+            StubTransport(replies(Response(429, {}, b""), Response(200, {}, b""))),
+            limits={}, max_retries=1, backoff=RecordingBackoff(), stats=stats,
+        )
+        asyncio.run(client.request("openai", "GET", "https://api.example.com"))
+        client.transport = StubTransport(replies(Response(503, {}, b"")))
+        asyncio.run(client.request("unsplash", "GET", "https://api.example.com"))
+        report = stats.report().splitlines()
+        self.assertRegex(report[0], r"^Finished in \d+\.\ds$")
+        self.assertRegex(report[1], r"^  openai: 2 requests \([\d.]+/s\), 0 cache hits, 1 retries, 1 throttled, "
+                                    r"0 failed; latency p50=\d+ms p95=\d+ms p99=\d+ms$")
+        self.assertIn("unsplash: 2 requests", report[2])
+        self.assertIn("1 retries, 0 throttled, 1 failed", report[2])
@@ -0,0 +1,80 @@
+# game/tests/test_images.py
+import io
+import tempfile
+import unittest
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from game import images
+from game.models import Destination
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+@unittest.skipIf(Image is None, "Pillow is not installed")
+class CacheImagesTest(TestCase):
+    def setUp(self):
+        self.source_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.source_dir.cleanup)
+        self.addCleanup(self.cache_dir.cleanup)
+        override = override_settings(IMAGE_CACHE_ROOT=self.cache_dir.name, SNAPSHOT_ROOT=self.cache_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        Image.new("RGB", (2000, 1000), "blue").save(f"{self.source_dir.name}/paris.jpg")
+        self.destination = Destination.objects.create(
+            city="Paris", clues=["City of Lights"], image_url="https://images.example.com/photos/paris.jpg"
+        )
+
+    def cache_images(self, *args):
+        call_command("cache_images", "--source-dir", self.source_dir.name, *args, stdout=io.StringIO())
+        self.destination.refresh_from_db()
+
+    def test_variants_are_resized_and_recorded(self):
+        """Test that each variant is stored at its width and recorded on the model."""
+        self.cache_images()
+        variants = self.destination.image_variants
+        self.assertEqual(variants["source"], self.destination.image_url)
+        for name, width in images.VARIANTS.items():
+            with Image.open(f"{self.cache_dir.name}/{variants[name]}") as img:
+                self.assertEqual(img.width, width)
+            self.assertEqual(variants["widths"][name], width)
+
+    def test_round_uses_srcset(self):
+        """Test that rounds point at the cached variants instead of the original URL."""
+        self.cache_images("--format", "jpeg")
+        round_data = self.client.get(reverse("next_round")).json()
+        self.assertTrue(round_data["image_url"].startswith("/images/"))
+        self.assertIn("160w", round_data["image_srcset"])
+
+    def test_srcset_uses_real_widths(self):
+        """Test that a small source is advertised at its own width instead of the larger variants' widths."""
+        Image.new("RGB", (300, 200), "red").save(f"{self.source_dir.name}/paris.jpg")
+        self.cache_images()
+        variants = self.destination.image_variants
+        self.assertEqual(variants["widths"], {"thumb": 160, "card": 300, "full": 300})
+        payload = images.image_payload({"image_url": self.destination.image_url, "image_variants": variants})
+        self.assertEqual(
+            payload["image_srcset"], f"/images/{variants['thumb']} 160w, /images/{variants['card']} 300w"
+        )
+
+    def test_stale_variants_are_ignored(self):
+        """Test that changing image_url falls back to the new original URL."""
+        self.cache_images()
+        self.destination.image_url = "https://images.example.com/photos/other.jpg"
+        self.destination.save()
+        payload = images.image_payload({"image_url": self.destination.image_url,
+                                        "image_variants": self.destination.image_variants})
+        self.assertEqual(payload, {"image_url": self.destination.image_url})
+
+    def test_cached_image_headers(self):
+        """Test that cached images are served with immutable cache headers."""
+        self.cache_images()
+        response = self.client.get(reverse("cached_image", args=[self.destination.image_variants["thumb"]]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        response.close()
+        response = self.client.get(reverse("cached_image", args=["../../settings.py"]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,103 @@
+# game/tests/test_import_data.py
+import io
+import json
+import tempfile
+from pathlib import Path
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from game.importer import iter_records
+from game.models import Destination
+
+RECORDS = [
+    {"city": "Paris", "country": "France", "clues": ["City of Lights"], "trivia": [], "fun_fact": "Lutetia"},
+    {"city": "Tokyo", "country": "Japan", "clues": ["Shibuya"], "trivia": [], "fun_fact": "Edo"},
+    {"city": "Cairo", "country": "Egypt", "clues": ["Pyramids"], "trivia": [], "fun_fact": "Nile"},
+]
+
+class IterRecordsTest(TestCase):
+    def test_reads_json_array_in_small_chunks(self):
+        """Test that a JSON array is decoded incrementally across chunk boundaries."""
+        data = json.dumps(RECORDS, indent=2).encode()
+        self.assertEqual(list(iter_records(io.BytesIO(data), chunk_size=7)), RECORDS)
+
+    def test_reads_json_lines(self):
+        """Test that JSON Lines input yields one record per line."""
+        data = "\n".join(json.dumps(r) for r in RECORDS) + "\n"
+        self.assertEqual(list(iter_records(io.StringIO(data), chunk_size=5)), RECORDS)
+
+    def test_multibyte_character_split_across_chunks(self):
+        """Test that a UTF-8 character split between two chunks is decoded intact."""
+        data = json.dumps([{"city": "Kyōto"}], ensure_ascii=False).encode()
+        self.assertEqual(list(iter_records(io.BytesIO(data), chunk_size=1)), [{"city": "Kyōto"}])
+
+    def test_empty_array(self):
+        """Test that an empty array yields nothing."""
+        self.assertEqual(list(iter_records(io.StringIO(" [ ] "))), [])
+
+class ImportDataCommandTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "dataset.jsonl"
+        override = override_settings(SNAPSHOT_ROOT=Path(self.tmpdir.name) / "snapshots")
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write(self, records):
+        self.path.write_text("\n".join(json.dumps(r) for r in records))
+
+    def import_data(self, *args):
+        out = io.StringIO()
+        call_command("import_data", "--path", str(self.path), "--batch-size", "2", *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_is_idempotent(self):
+        """Test that importing the same file twice creates each city once."""
+        self.write(RECORDS)
+        self.assertIn("3 created", self.import_data())
+        self.assertIn("0 created", self.import_data())
+        self.assertEqual(Destination.objects.count(), 3)
+        self.assertTrue(Destination.objects.get(city="Paris").content_hash)
+
+    def test_update_only_rewrites_changed_rows(self):
+        """Test that --update upserts changed cities and leaves the rest alone."""
+        self.write(RECORDS)
+        self.import_data()
+        changed = [dict(RECORDS[0], fun_fact="Paris was once Lutetia."), *RECORDS[1:]]
+        self.write(changed)
+        self.assertIn("0 updated", self.import_data())
+        output = self.import_data("--update", "--atomic")
+        self.assertIn("1 updated, 2 unchanged", output)
+        self.assertEqual(Destination.objects.get(city="Paris").fun_fact, "Paris was once Lutetia.")
+
+    def test_import_writes_snapshot(self):
+        """Test that an import that changes rows publishes a new catalog snapshot."""
+        self.write(RECORDS)
+        self.import_data()
+        self.assertEqual(len(list((Path(self.tmpdir.name) / "snapshots").glob("catalog-*.json"))), 1)
+
+    def test_skips_entries_without_city(self):
+        """Test that entries without a city are counted as invalid."""
+        self.write([{"country": "Nowhere"}, RECORDS[0]])
+        self.assertIn("1 invalid", self.import_data())
+        self.assertEqual(Destination.objects.count(), 1)
+
+    def test_dedup_skips_other_spellings(self):
+        """Test that --dedup skips other spellings of known cities and of earlier rows."""
+        self.write(RECORDS)
+        self.import_data()
+        self.write([
+            {"city": "PARIS", "country": "France"},
+            {"city": "Kyōto", "country": "Japan", "clues": ["Temples"]},
+            {"city": "Kyoto", "country": "Japan", "clues": ["Temples"]},
+        ])
+        self.assertIn("1 created, 0 updated, 0 unchanged, 0 invalid, 2 duplicates", self.import_data("--dedup", "exact"))
+        self.assertEqual(Destination.objects.filter(city__in=["PARIS", "Kyoto"]).count(), 0)
+
+    def test_fuzzy_dedup_skips_typos(self):
+        """Test that --dedup fuzzy also skips a likely typo of a known city."""
+        self.write([{"city": "Rio de Janeiro", "country": "Brazil", "clues": ["Sugarloaf"]}])
+        self.import_data()
+        self.write([{"city": "Rio de Janero", "country": "Brazil", "clues": ["Sugarloaf"]}])
+        self.assertIn("0 created, 0 updated, 0 unchanged, 0 invalid, 1 duplicates", self.import_data("--dedup", "fuzzy"))
+        self.assertEqual(Destination.objects.count(), 1)
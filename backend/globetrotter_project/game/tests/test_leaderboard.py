@@ -0,0 +1,76 @@
+# game/tests/test_leaderboard.py
+import datetime
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from game.leaderboard import RankIndex, leaderboard
+from game.models import Answer, GameSession, LeaderboardEntry
+
+class RankIndexTest(TestCase):
+    def test_rank_and_top(self):
+        """Test that ties share a rank and top-N is ordered by score then time."""
+        now = timezone.now()
+        index = RankIndex()
+        index.update("ana", 5, now)
+        index.update("bo", 9, now)
+        index.update("cy", 5, now + datetime.timedelta(seconds=1))
+        index.update("di", 2, now)
+        self.assertEqual(index.rank("bo"), (1, 9))
+        self.assertEqual(index.rank("cy"), (2, 5))
+        self.assertEqual(index.rank("di"), (4, 2))
+        self.assertEqual(index.top(3), [(1, "bo", 9), (2, "ana", 5), (2, "cy", 5)])
+
+    def test_update_keeps_best_score(self):
+        """Test that lower scores never replace a player's best."""
+        index = RankIndex()
+        now = timezone.now()
+        index.update("ana", 5, now)
+        self.assertFalse(index.update("ana", 3, now))
+        self.assertTrue(index.update("ana", 5000, now))
+        self.assertEqual((len(index), index.rank("ana")), (1, (1, 5000)))
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        leaderboard._indexes.clear()
+
+    def test_record_writes_every_window(self):
+        """Test that flushed session scores reach all windows and the API."""
+        ana = GameSession.objects.create(username="ana", score=7)
+        for _ in range(2):
+            Answer.objects.create(session=ana, guess="Paris", correct=True, answered_at=timezone.now())
+        GameSession.objects.create(username="bo", score=3)
+        anonymous = GameSession.objects.create(score=99)
+        with self.captureOnCommitCallbacks(execute=True):
+            leaderboard.record([ana.pk, anonymous.pk])
+        self.assertEqual(LeaderboardEntry.objects.filter(player="ana").count(), 3)
+        response = self.client.get(reverse("leaderboard"), {"window": "week", "player": "ana"})
+        self.assertEqual(response.json()["me"], {"rank": 1, "player": "ana", "score": 2})
+        response = self.client.get(reverse("leaderboard"), {"window": "all", "player": "ana"})
+        self.assertEqual(response.json()["me"], {"rank": 1, "player": "ana", "score": 7})
+
+    def test_windows_count_only_their_period(self):
+        """Test that the daily board ranks today's points, not the session's lifetime score."""
+        now = timezone.now()
+        ana = GameSession.objects.create(username="ana", score=10)
+        bo = GameSession.objects.create(username="bo", score=3)
+        # Eight of ana's points are from last week.
+        for session, days_ago in [(ana, 0)] * 2 + [(ana, 8)] * 8 + [(bo, 0)] * 3:
+            answered_at = now - datetime.timedelta(days=days_ago)
+            Answer.objects.create(session=session, guess="x", correct=True, answered_at=answered_at)
+        with self.captureOnCommitCallbacks(execute=True):
+            leaderboard.record([ana.pk, bo.pk], now)
+        self.assertEqual(leaderboard.get("day").top(2), [(1, "bo", 3), (2, "ana", 2)])
+        self.assertEqual(leaderboard.get("all").top(2), [(1, "ana", 10), (2, "bo", 3)])
+
+    def test_index_syncs_rows_written_elsewhere(self):
+        """Test that rows written by another worker show up after a version bump."""
+        self.assertEqual(len(leaderboard.get("all")), 0)
+        LeaderboardEntry.objects.create(
+            window="all", period=datetime.date(1970, 1, 1), player="bo", best_score=4, achieved_at=timezone.now()
+        )
+        self.assertIsNone(leaderboard.get("all").rank("bo"))
+        cache.set("game:leaderboard:version", 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(leaderboard.get("all").rank("bo"), (1, 4))
@@ -0,0 +1,99 @@
+# game/tests/test_matcher.py
+import threading
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from game import catalog, matcher, rounds
+from game.matcher import CityMatcher, levenshtein, normalize
+from game.models import Destination
+from game.pool import round_pool
+from game.scoring import answer_buffer
+
+DESTINATIONS = [
+    {"id": 1, "city": "Rio de Janeiro", "country": "Brazil"},
+    {"id": 2, "city": "Kyoto", "country": "Japan"},
+    {"id": 3, "city": "São Paulo", "country": "Brazil"},
+    {"id": 4, "city": "St. Petersburg", "country": "Russia"},
+    {"id": 5, "city": "New York City", "country": "United States"},
+    {"id": 6, "city": "Hamburg", "country": "Germany"},
+    {"id": 7, "city": "Homburg", "country": "Germany"},
+]
+
+def join_matcher_builds():
+    for thread in threading.enumerate():
+        if thread.name == "matcher-build":
+            thread.join()
+
+class CityMatcherTest(TestCase):
+    def setUp(self):
+        self.matcher = CityMatcher(DESTINATIONS)
+        self.by_id = {d["id"]: d for d in DESTINATIONS}
+
+    def test_normalize_folds_accents_and_abbreviations(self):
+        """Test that accents, case, punctuation and "St." are normalized away."""
+        self.assertEqual(normalize("  São   Paulo "), "sao paulo")
+        self.assertEqual(normalize("St. Petersburg"), "saint petersburg")
+
+    def test_typos_aliases_and_countries_match(self):
+        """Test that misspellings, aliases and a trailing country still match the right city."""
+        for guess, pk in [("Rio de Janiero", 1), ("Kyoto, Japan", 2), ("kyoto japan", 2),
+                          ("Sao Paolo", 3), ("Saint Petersburg", 4), ("NYC", 5), ("new york", 5)]:
+            correct, confidence = self.matcher.check(guess, self.by_id[pk])
+            self.assertTrue(correct, guess)
+            self.assertGreaterEqual(confidence, matcher.CONFIDENCE_THRESHOLD)
+            self.assertEqual(self.matcher.match(guess)[0].destination_id, pk)
+
+    def test_wrong_guesses_do_not_match(self):
+        """Test that other cities, wrong countries and short-name typos are rejected."""
+        self.assertEqual(self.matcher.check("Lima", self.by_id[1]), (False, 0.0))
+        self.assertFalse(self.matcher.check("Kyoto, France", self.by_id[2])[0])
+        self.assertFalse(self.matcher.check("Kyto", self.by_id[2])[0])
+        # One edit from Hamburg, but also the exact name of another destination.
+        self.assertFalse(self.matcher.check("Homburg", self.by_id[6])[0])
+        self.assertTrue(self.matcher.check("Hamburk", self.by_id[6])[0])
+
+    def test_levenshtein_stops_at_limit(self):
+        """Test that the bounded edit distance is exact within the limit and capped beyond it."""
+        self.assertEqual(levenshtein("kitten", "sitting", 3), 3)
+        self.assertEqual(levenshtein("kitten", "sitting", 2), 3)
+        self.assertEqual(levenshtein("rio de janiero", "rio de janeiro", 3), 2)
+
+
+class TypedAnswerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        # Let builds started by earlier tests land, then start from no matcher, so the
+        # first one here is built in the foreground from this test's catalog.
+        join_matcher_builds()
+        matcher._matcher = None
+        self.addCleanup(answer_buffer.clear)
+        Destination.objects.create(city="Rio de Janeiro", country="Brazil", clues=["Carnival"], fun_fact="Samba.")
+
+    def test_typed_round_accepts_typos(self):
+        """Test that typed rounds carry no options and accept a misspelt city with its confidence."""
+        round_data = self.client.get(reverse("next_round"), {"mode": "type"}).json()
+        self.assertNotIn("options", round_data)
+        response = self.client.post(round_data["answer_url"], {"answer": "rio de janiero", "mode": "type"},
+                                    content_type="application/json")
+        self.assertTrue(response.json()["correct"])
+        self.assertEqual(response.json()["confidence"], 0.857)
+
+    def test_typed_mode_with_filters(self):
+        """Test that difficulty and region filters keep typed rounds free of options, pool or not."""
+        self.addCleanup(round_pool.clear)
+        round_pool.refill([(rounds.HARD, None), (rounds.NORMAL, "South America")])
+        for params in [{"difficulty": "hard"}, {"region": "South America"}, {"difficulty": "easy"}]:
+            response = self.client.get(reverse("next_round"), {"mode": "type", **params})
+            self.assertEqual(response.status_code, 200, params)
+            self.assertNotIn("options", response.json())
+        self.assertIn("options", self.client.get(reverse("next_round"), {"difficulty": "hard"}).json())
+
+    def test_catalog_change_rebuilds_matcher(self):
+        """Test that a catalog change is picked up by a background rebuild."""
+        first = matcher.get_matcher()
+        Destination.objects.create(city="Kyoto", country="Japan", clues=["Temples"])
+        catalog.bump_version()
+        self.assertIs(matcher.get_matcher(), first)
+        join_matcher_builds()
+        self.assertEqual(matcher.get_matcher().match("Kyoto")[0].name, "kyoto")
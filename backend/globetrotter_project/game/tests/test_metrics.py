@@ -0,0 +1,112 @@
+# game/tests/test_metrics.py
+import tempfile
+import threading
+from pathlib import Path
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from game import metrics
+from game.models import Destination
+
+class RegistryTest(TestCase):
+    def test_threads_are_summed(self):
+        """Test that counts recorded on separate threads are merged on collect."""
+        registry = metrics.Registry()
+        labels = (("view", "index"),)
+
+        def work():
+            for _ in range(100):
+                registry.observe("game_db_queries", labels, 2)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        values = registry.collect()[("game_db_queries", labels)]
+        self.assertEqual(sum(values[:-1]), 400)
+        self.assertEqual(values[-1], 800)
+
+    def test_file_store_merges_workers(self):
+        """Test that totals written by other worker processes are added to ours."""
+        with tempfile.TemporaryDirectory() as tmp:
+            key = ("game_http_requests_total", (("view", "index"), ("method", "GET"), ("status", "200")))
+            metrics.FileStore(tmp).write({key: 3})
+            merged = metrics.FileStore(tmp).read_all({key: 2})
+            self.assertEqual(merged[key], 5)
+
+    def test_exited_workers_are_folded_together(self):
+        """Test that an exited worker's file is merged into one file without losing its counts."""
+        with tempfile.TemporaryDirectory() as tmp, override_settings(GAME_METRICS_DIR=tmp):
+            key = ("game_http_requests_total", (("view", "index"), ("method", "GET"), ("status", "200")))
+            for pid, count in [(101, 3), (102, 4), (101, 1)]:
+                store = metrics.FileStore(tmp)
+                store.path = store.directory / f"{pid}-{count}.json"
+                store.write({key: count})
+                if pid == 101:
+                    metrics.retire_worker(pid)
+            self.assertEqual(sorted(path.name for path in Path(tmp).iterdir()), ["102-4.json", "exited.json"])
+            self.assertEqual(metrics.FileStore(tmp).read_all({key: 2})[key], 10)
+            metrics.reset_store()
+            self.assertEqual(list(Path(tmp).iterdir()), [])
+
+    def test_render_prometheus_histogram(self):
+        """Test that histogram buckets are rendered cumulatively with a +Inf bucket."""
+        registry = metrics.Registry()
+        labels = (("view", "index"),)
+        registry.observe("game_db_queries", labels, 0)
+        registry.observe("game_db_queries", labels, 4)
+        text = metrics.render(registry.collect())
+        self.assertIn('game_db_queries_bucket{view="index",le="0"} 1', text)
+        self.assertIn('game_db_queries_bucket{view="index",le="+Inf"} 2', text)
+        self.assertIn('game_db_queries_count{view="index"} 2', text)
+
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        override = override_settings(
+            GAME_METRICS_DIR=tmpdir.name, SNAPSHOT_ROOT=tmpdir.name, GAME_METRICS_TOKEN="secret"
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        Destination.objects.create(city="Paris", country="France", clues=["City of Lights"], fun_fact="Lutetia")
+
+    def test_metrics_endpoint_reports_views(self):
+        """Test that requests show up per view with DB and template timings."""
+        self.client.get(reverse("index"))
+        self.client.get(reverse("next_round"))
+        text = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret").content.decode()
+        self.assertIn('game_http_requests_total{view="index",method="GET",status="200"} 1', text)
+        self.assertIn('game_template_render_seconds_count{view="index"} 1', text)
+        self.assertIn('game_db_queries_count{view="next_round"} 1', text)
+
+    def test_metrics_endpoint_needs_the_token(self):
+        """Test that /metrics is refused without the token and hidden when none is configured."""
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        with override_settings(GAME_METRICS_TOKEN=""):
+            self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer ").status_code, 404)
+
+    @override_settings(GAME_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_only_counted(self):
+        """Test that with sampling off requests are counted but not timed."""
+        self.client.get(reverse("next_round"))
+        totals = metrics.registry.collect()
+        self.assertNotIn(("game_http_request_duration_seconds", (("view", "next_round"),)), totals)
+        self.assertIn(
+            ("game_http_requests_total", (("view", "next_round"), ("method", "GET"), ("status", "200"))), totals
+        )
+
+    def test_profile_header(self):
+        """Test that X-Profile returns a cProfile summary only when enabled."""
+        with override_settings(GAME_PROFILE_REQUESTS=True):
+            response = self.client.get(reverse("next_round"), HTTP_X_PROFILE="1")
+        self.assertEqual(response["X-Profile-Status"], "200")
+        self.assertIn(b"function calls", response.content)
+        with override_settings(GAME_PROFILE_REQUESTS=False):
+            response = self.client.get(reverse("next_round"), HTTP_X_PROFILE="1")
+        self.assertEqual(response["Content-Type"], "application/json")
@@ -1,9 +1,60 @@
 # game/tests/test_models.py
-from django.test import TestCase
-from game.models import Destination
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from game.models import Answer, Destination, GameSession
+from game.stats import refresh_destination_stats
 
 class DestinationModelTest(TestCase):
     def test_string_representation(self):
         """Test that the string representation of a Destination is its city name."""
         destination = Destination(city="Paris")
         self.assertEqual(str(destination), "Paris")
+
+    def test_region_follows_country(self):
+        """Test that region and continent are derived from the country on save."""
+        destination = Destination.objects.create(city="Lima", country="Peru")
+        self.assertEqual((destination.region, destination.continent), ("South America", "South America"))
+        destination.country = "Japan"
+        destination.save(update_fields=["country"])
+        destination.refresh_from_db()
+        self.assertEqual(destination.region, "East Asia")
+
+    def test_for_round_filters_playable_destinations(self):
+        """Test that round queries skip inactive rows and respect region and difficulty."""
+        Destination.objects.create(city="Paris", country="France", difficulty=20)
+        Destination.objects.create(city="Lyon", country="France", difficulty=80)
+        Destination.objects.create(city="Nice", country="France", difficulty=10, is_active=False)
+        Destination.objects.create(city="Tokyo", country="Japan", difficulty=10)
+        easy = Destination.objects.for_round("Western Europe", (0, 40))
+        self.assertEqual([Destination.objects.get(pk=pk).city for pk in easy], ["Paris"])
+        self.assertEqual(Destination.objects.for_round().count(), 3)
+
+
+class DestinationIndexTest(TransactionTestCase):
+    # The SQLite schema editor can't run inside TestCase's transaction.
+    def test_city_prefix_index(self):
+        """Test that the city prefix index uses text_pattern_ops on PostgreSQL and the bare expression elsewhere."""
+        [index] = [index for index in Destination._meta.indexes if index.name == "destination_city_prefix_idx"]
+        with connection.schema_editor(collect_sql=True) as editor:
+            self.assertTrue(str(index.create_sql(Destination, editor)).endswith('((UPPER("city")))'))
+            with mock.patch.object(connection, "vendor", "postgresql"):
+                self.assertTrue(str(index.create_sql(Destination, editor)).endswith(
+                    '((UPPER("city")) text_pattern_ops)'
+                ))
+
+
+class DestinationStatsTest(TestCase):
+    def test_refresh_from_answers(self):
+        """Test that popularity counts answers and difficulty tracks the wrong-answer rate."""
+        session = GameSession.objects.create()
+        hard = Destination.objects.create(city="Thimphu", country="Bhutan")
+        Destination.objects.create(city="Paris", country="France")
+        for correct in (False, False, False, True):
+            Answer.objects.create(session=session, destination=hard, guess="x", correct=correct,
+                                  answered_at=timezone.now())
+        self.assertEqual(refresh_destination_stats(), 1)
+        hard.refresh_from_db()
+        self.assertEqual((hard.popularity, hard.difficulty), (4, 67))
+        self.assertEqual(refresh_destination_stats(), 0)
@@ -0,0 +1,55 @@
+# game/tests/test_pool.py
+import json
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from game import catalog, metrics
+from game.models import Destination
+from game.pool import RoundPool, round_pool
+
+class RoundPoolTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+        self.addCleanup(round_pool.clear)
+        for i, country in enumerate(["France", "Japan", "Peru", "Kenya", "Spain"]):
+            Destination.objects.create(city=f"City {i}", country=country, clues=[f"Clue {i}"])
+        self.pool = RoundPool(capacity=8, low_watermark=2)
+
+    def test_pop_after_refill_hits(self):
+        """Test that a pool misses until refilled, then serves pre-built rounds."""
+        self.assertIsNone(self.pool.pop("hard", None))
+        self.assertEqual(self.pool.refill(), 8)
+        body = json.loads(self.pool.pop("hard", None))
+        self.assertEqual(len(body["options"]), 4)
+        totals = metrics.registry.collect()
+        self.assertEqual(totals[("game_round_pool_total", (("pool", "hard/all"), ("result", "hit")))], 1)
+        self.assertEqual(totals[("game_round_pool_total", (("pool", "hard/all"), ("result", "miss")))], 1)
+
+    def test_region_pool_only_has_that_region(self):
+        """Test that a region pool only asks about destinations in that region."""
+        self.pool.refill([("normal", "Southern Europe")])
+        clues = {json.loads(self.pool.pop("normal", "Southern Europe"))["clues"][0] for _ in range(4)}
+        self.assertEqual(clues, {"Clue 4"})
+
+    def test_catalog_change_empties_pool(self):
+        """Test that rounds built for an older catalog version are never served."""
+        self.pool.refill([("normal", None)])
+        catalog.bump_version()
+        self.assertIsNone(self.pool.pop("normal", None))
+
+    def test_next_round_uses_pool(self):
+        """Test that filtered rounds come from the pool and bad filters are rejected."""
+        round_pool.refill([("hard", None)])
+        response = self.client.get(reverse("next_round"), {"difficulty": "hard"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["options"]), 4)
+        self.assertEqual(self.client.get(reverse("next_round"), {"region": "Atlantis"}).status_code, 400)
+
+    def test_difficulty_pools_use_destination_difficulty(self):
+        """Test that easy rounds only ask about destinations with a low difficulty score."""
+        Destination.objects.filter(city="City 2").update(difficulty=10)
+        catalog.bump_version()
+        self.pool.refill([("easy", None)])
+        clues = {json.loads(self.pool.pop("easy", None))["clues"][0] for _ in range(3)}
+        self.assertEqual(clues, {"Clue 2"})
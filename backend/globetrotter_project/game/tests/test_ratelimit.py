@@ -0,0 +1,145 @@
+# game/tests/test_ratelimit.py
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from game import catalog, ratelimit
+from game.models import Destination
+from game.ratelimit import RateLimiter, rate_limiter
+
+class Clock:
+    def __init__(self, now=6000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class RateLimiterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = Clock()
+
+    def test_sliding_window(self):
+        """Test that the previous window keeps counting, fading out over the current one."""
+        limiter = RateLimiter(clock=self.clock)
+        self.assertEqual([limiter.check("r", "a", 3, 60) for _ in range(3)], [0, 0, 0])
+        wait = limiter.check("r", "a", 3, 60)
+        self.assertEqual(wait, 61)
+        self.assertEqual(limiter.check("r", "b", 3, 60), 0)
+        self.clock.now += 90
+        # Half of the previous window still counts: 1.5 of 3.
+        self.assertEqual([limiter.check("r", "a", 3, 60) for _ in range(2)], [0, 0])
+        self.assertGreater(limiter.check("r", "a", 3, 60), 0)
+        self.clock.now += 60
+        self.assertEqual(limiter.check("r", "a", 3, 60), 0)
+
+    def test_retry_after_is_enough(self):
+        """Test that a refused client is let through once Retry-After has passed, not before."""
+        limiter = RateLimiter(clock=self.clock)
+        self.clock.now += 45
+        for _ in range(5):
+            limiter.check("r", "a", 5, 60)
+        wait = limiter.check("r", "a", 5, 60)
+        self.clock.now += wait - 1
+        self.assertGreater(limiter.check("r", "a", 5, 60), 0)
+        self.clock.now += 1
+        self.assertEqual(limiter.check("r", "a", 5, 60), 0)
+
+    def test_workers_share_counts_through_the_cache(self):
+        """Test that a sync pushes local hits and pulls back what other workers counted."""
+        first, second = RateLimiter(clock=self.clock), RateLimiter(clock=self.clock)
+        for _ in range(3):
+            first.check("r", "a", 5, 60)
+        first.sync()
+        self.assertEqual(second.check("r", "a", 5, 60), 0)
+        second.sync()
+        self.assertEqual(second.check("r", "a", 5, 60), 0)
+        self.assertGreater(second.check("r", "a", 5, 60), 0)
+        self.assertEqual(first.check("r", "a", 5, 60), 0)
+        first.sync()
+        self.assertGreater(first.check("r", "a", 5, 60), 0)
+
+    def test_checks_do_not_touch_the_cache(self):
+        """Test that only the periodic sync talks to the cache, and a failing cache doesn't break checks."""
+        limiter = RateLimiter(clock=self.clock)
+        limiter.sync()
+        with mock.patch.object(ratelimit, "cache") as fake_cache:
+            for _ in range(100):
+                limiter.check("r", "a", 1000, 60)
+            self.assertFalse(limiter.sync_due())
+            self.assertEqual(fake_cache.mock_calls, [])
+            fake_cache.incr.side_effect = ConnectionError
+            self.clock.now += 1
+            with self.assertLogs("game.ratelimit", "ERROR"):
+                limiter.sync()
+        self.assertEqual(limiter.check("r", "a", 1000, 60), 0)
+
+    def test_invalid_rate(self):
+        """Test that a malformed rate is reported as a configuration error."""
+        self.assertEqual(ratelimit.parse_rate("120/m"), (120, 60))
+        for rate in ["120", "0/m", "ten/s", "5/d"]:
+            with self.assertRaises(ImproperlyConfigured):
+                ratelimit.parse_rate(rate)
+
+class RateLimitedViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        rate_limiter.clear()
+        self.addCleanup(rate_limiter.clear)
+        Destination.objects.create(city="Paris", country="France", clues=["City of Lights"])
+
+    @override_settings(GAME_RATE_LIMITS={"round": {"ip": "2/m"}})
+    def test_ip_limit(self):
+        """Test that a client over its limit gets a 429 with Retry-After while others carry on."""
+        for _ in range(2):
+            self.assertEqual(self.client.get(reverse("next_round")).status_code, 200)
+        response = self.client.get(reverse("next_round"))
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(self.client.get(reverse("next_round"), REMOTE_ADDR="10.0.0.2").status_code, 200)
+        self.assertEqual(self.client.get(reverse("index")).status_code, 200)
+
+    @override_settings(GAME_RATE_LIMITS={"round": {"session": "1/m"}}, GAME_TRUSTED_PROXIES=1)
+    def test_session_limit_and_forwarded_address(self):
+        """Test the per-session limit, and that the address behind a trusted proxy is used."""
+        first, second = self.client_class(), self.client_class()
+        first.session, second.session  # start a session for each
+        self.assertEqual(first.get(reverse("next_round")).status_code, 200)
+        self.assertEqual(first.get(reverse("next_round")).status_code, 429)
+        self.assertEqual(second.get(reverse("next_round")).status_code, 200)
+        request = mock.Mock(META={"REMOTE_ADDR": "10.0.0.1", "HTTP_X_FORWARDED_FOR": "1.2.3.4, 5.6.7.8"})
+        self.assertEqual(ratelimit.client_ip(request), "5.6.7.8")
+
+    @override_settings(GAME_RATE_LIMITS={"round": {"ip": "1/m"}}, GAME_TRUSTED_PROXIES=1)
+    def test_one_trusted_proxy(self):
+        """Test that behind one trusted proxy each player gets their own bucket and can't spoof another."""
+        url = reverse("next_round")
+        proxy = {"REMOTE_ADDR": "172.18.0.2"}
+        self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR="1.2.3.4", **proxy).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR="5.6.7.8", **proxy).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR="1.2.3.4", **proxy).status_code, 429)
+        # A client-supplied entry is kept in front of the one the proxy appends.
+        spoofed = self.client.get(url, HTTP_X_FORWARDED_FOR="9.9.9.9, 1.2.3.4", **proxy)
+        self.assertEqual(spoofed.status_code, 429)
+        # Without the header the proxy's own address is all there is.
+        self.assertEqual(self.client.get(url, **proxy).status_code, 200)
+
+    def test_session_cookie_is_hashed(self):
+        """Test that the session key is hashed before it goes into a cache key."""
+        request = mock.Mock(COOKIES={"sessionid": "secret-session-key"})
+        client = ratelimit.session_key(request)
+        self.assertEqual(len(client), 16)
+        self.assertNotIn("secret", client)
+        self.assertEqual(ratelimit.session_key(mock.Mock(COOKIES={})), "")
+
+    @override_settings(ROOT_URLCONF="globetrotter_project.asgi_urls", GAME_RATE_LIMITS={"answer": {"ip": "1/m"}})
+    async def test_async_views_are_limited(self):
+        """Test that the async views are held to the same limits."""
+        url = reverse("answer_round", args=["bad-round"])
+        first = await self.async_client.post(url, "{}", content_type="application/json")
+        self.assertEqual(first.status_code, 400)
+        second = await self.async_client.post(url, "{}", content_type="application/json")
+        self.assertEqual(second.status_code, 429)
+        self.assertIn("Retry-After", second)
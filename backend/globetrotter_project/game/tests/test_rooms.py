@@ -0,0 +1,132 @@
+# game/tests/test_rooms.py
+import asyncio
+import json
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from game import catalog, rooms
+from game.models import Destination
+
+class RoomsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        self.addCleanup(rooms.registry.rooms.clear)
+        Destination.objects.create(city="Paris", country="France", clues=["City of Lights"], fun_fact="Lutetia")
+        Destination.objects.create(city="Tokyo", country="Japan", clues=["Shibuya"])
+        catalog.get_catalog()  # so the sockets read the catalog from memory
+
+    async def connect(self, path="/ws/rooms/abcd", name="ana"):
+        socket = ApplicationCommunicator(rooms.serve, {
+            "type": "websocket", "path": path, "query_string": f"name={name}".encode(),
+        })
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.accept")
+        return socket
+
+    async def receive(self, socket, message_type):
+        """The next message of `message_type`, skipping others."""
+        while True:
+            event = await socket.receive_output(1)
+            self.assertEqual(event["type"], "websocket.send", event)
+            message = json.loads(event["text"])
+            if message["type"] == message_type:
+                return message
+
+    async def send(self, socket, **message):
+        await socket.send_input({"type": "websocket.receive", "text": json.dumps(message)})
+
+    async def disconnect(self, *sockets):
+        for socket in sockets:
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait(1)
+
+    async def test_round_is_shared_and_scored(self):
+        """Test that both players get the same round and see live scores and the result."""
+        ana = await self.connect(name="ana")
+        self.assertEqual((await self.receive(ana, "joined"))["player"], "ana")
+        bob = await self.connect(name="ana")
+        self.assertEqual((await self.receive(bob, "joined"))["player"], "ana 2")
+        self.assertEqual((await self.receive(ana, "players"))["scores"], {"ana": 0})
+        self.assertEqual((await self.receive(ana, "players"))["scores"], {"ana": 0, "ana 2": 0})
+
+        await self.send(ana, type="start")
+        first, second = await self.receive(ana, "round"), await self.receive(bob, "round")
+        self.assertEqual(first, second)
+        self.assertNotIn("id", first)
+        answer = "Paris" if first["clues"] == ["City of Lights"] else "Tokyo"
+
+        await self.send(ana, type="answer", guess=answer)
+        answered = await self.receive(bob, "answered")
+        self.assertEqual(answered["player"], "ana")
+        self.assertGreaterEqual(answered["scores"]["ana"], rooms.CORRECT_POINTS)
+        await self.send(ana, type="answer", guess="again")  # only the first answer counts
+        await self.send(bob, type="answer", guess="Atlantis")
+        result = await self.receive(ana, "result")
+        self.assertEqual(result["answer"], answer)
+        self.assertEqual(result["answers"]["ana 2"]["correct"], False)
+        self.assertEqual(result["scores"]["ana 2"], 0)
+        self.assertEqual(result["scores"]["ana"], answered["scores"]["ana"])
+        await self.disconnect(ana, bob)
+        self.assertEqual(len(rooms.registry), 0)
+
+    @override_settings(GAME_ROOM_ROUND_SECONDS=0.05)
+    async def test_round_times_out(self):
+        """Test that the result is sent when the round time runs out."""
+        ana = await self.connect()
+        await self.send(ana, type="start")
+        number = (await self.receive(ana, "round"))["number"]
+        result = await self.receive(ana, "result")
+        self.assertEqual((result["number"], result["answers"]), (number, {}))
+        await self.disconnect(ana)
+
+    @override_settings(GAME_ROOM_MAX_PLAYERS=1)
+    async def test_full_room_and_unknown_path(self):
+        """Test that sockets beyond the room size, or for no room, are closed."""
+        ana = await self.connect()
+        bob = await self.connect()
+        self.assertEqual((await bob.receive_output(1))["code"], rooms.CLOSE_ROOM_FULL)
+        nobody = ApplicationCommunicator(rooms.serve, {"type": "websocket", "path": "/ws/other"})
+        await nobody.send_input({"type": "websocket.connect"})
+        self.assertEqual((await nobody.receive_output(1))["code"], rooms.CLOSE_NOT_FOUND)
+        await self.disconnect(ana)
+
+    async def test_slow_socket_is_dropped(self):
+        """Test that a broadcast serializes once and disconnects a socket that can't keep up."""
+        sent = {"slow": [], "fast": []}
+        stuck = asyncio.Event()
+
+        async def slow_send(event):
+            sent["slow"].append(event)
+            await stuck.wait()
+
+        async def fast_send(event):
+            sent["fast"].append(event)
+
+        layer = rooms.InMemoryChannelLayer()
+        slow, fast = rooms.Connection(slow_send, 2), rooms.Connection(fast_send, 2)
+        await layer.group_add("room.x", "slow", slow)
+        await layer.group_add("room.x", "fast", fast)
+        for i in range(4):
+            await layer.group_send("room.x", {"n": i})
+            await asyncio.sleep(0)
+        self.assertEqual(list(layer.groups["room.x"]), ["fast"])
+        self.assertEqual(slow.queue.get_nowait(), {"type": "websocket.close", "code": rooms.CLOSE_TOO_SLOW})
+        self.assertEqual([event["text"] for event in sent["fast"]], ['{"n":0}', '{"n":1}', '{"n":2}', '{"n":3}'])
+        self.assertIs(sent["slow"][0], sent["fast"][0])  # one frame object for the whole room
+        slow.stop()
+        fast.stop()
+
+    async def test_router_sends_http_to_django(self):
+        """Test that the ASGI router only takes WebSocket connections."""
+        calls = []
+
+        async def http_app(scope, receive, send):
+            calls.append(scope["type"])
+
+        application = rooms.websocket_router(http_app)
+        await application({"type": "http", "path": "/"}, None, None)
+        socket = ApplicationCommunicator(application, {"type": "websocket", "path": "/ws/nowhere"})
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.close")
+        self.assertEqual(calls, ["http"])
@@ -0,0 +1,89 @@
+# game/tests/test_routers.py
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_started
+from django.db import connections
+from django.test import TestCase, override_settings
+from game import catalog, routers
+from game.models import CatalogChange, Destination, GameSession
+from game.routers import ReplicaHealth, ReplicaRouter
+
+REPLICA = "replica_test"
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTest(TestCase):
+    # Resolved in setUpClass, once the replica alias exists; the runner only sets up "default".
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        # A second SQLite database standing in for a replica, only for this class. It is
+        # not mirrored, so the tests can tell which database a read was served from.
+        connections.settings[REPLICA] = connections.configure_settings({
+            "default": connections.settings["default"],
+            REPLICA: {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+        })[REPLICA]
+        with connections[REPLICA].schema_editor() as editor:
+            editor.create_model(Destination)
+            editor.create_model(CatalogChange)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        routers.replica_health.clear()
+        self.addCleanup(routers.pinned.set, False)
+        Destination.objects.using("default").create(city="Paris", country="France")
+        Destination.objects.using(REPLICA).create(city="Lima", country="Peru")
+
+    def test_catalog_reads_use_replica(self):
+        """Test that destinations are read from the replica and other models from the primary."""
+        self.assertEqual(list(Destination.objects.values_list("city", flat=True)), ["Lima"])
+        self.assertEqual([d["city"] for d in catalog.get_catalog().destinations], ["Lima"])
+        GameSession.objects.create()
+        self.assertEqual(GameSession.objects.count(), 1)
+
+    def test_writes_pin_reads_to_primary(self):
+        """Test that a catalog write sends this request's and everyone's reads to the primary for a while."""
+        Destination.objects.create(city="Kyoto", country="Japan")
+        self.assertTrue(Destination.objects.filter(city="Kyoto").exists())
+        request_started.send(sender=None)
+        self.assertFalse(routers.pinned.get())
+        self.assertTrue(Destination.objects.filter(city="Kyoto").exists())
+        cache.delete(routers.CHANGED_KEY)
+        self.assertFalse(Destination.objects.filter(city="Kyoto").exists())
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        """Test that reads go to the primary while every replica fails its health check."""
+        checked = []
+        def down(alias):
+            checked.append(alias)
+            raise ConnectionError(alias)
+        router = ReplicaRouter(ReplicaHealth(interval=60, check=down))
+        with self.assertLogs("game.routers", "WARNING"):
+            self.assertEqual(router.db_for_read(Destination), "default")
+        self.assertEqual(router.db_for_read(Destination), "default")
+        self.assertEqual(checked, [REPLICA])
+        self.assertIsNone(router.db_for_read(GameSession))
+        self.assertTrue(routers.ping(REPLICA))
+
+    def test_replicas_are_not_migrated(self):
+        """Test that migrations only run against the primary."""
+        router = ReplicaRouter()
+        self.assertFalse(router.allow_migrate(REPLICA, "game"))
+        self.assertIsNone(router.allow_migrate("default", "game"))
+
+    def test_pin_must_cover_max_lag(self):
+        """Test that a pin window shorter than the tolerated replica lag is refused."""
+        with self.settings(DATABASE_REPLICA_PIN_SECONDS=10, DATABASE_REPLICA_MAX_LAG=30):
+            with self.assertRaisesMessage(ImproperlyConfigured, "must be at least DATABASE_REPLICA_MAX_LAG"):
+                ReplicaRouter()
+        with self.settings(DATABASE_REPLICA_PIN_SECONDS=30, DATABASE_REPLICA_MAX_LAG=30):
+            ReplicaRouter()
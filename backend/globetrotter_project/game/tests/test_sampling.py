@@ -0,0 +1,74 @@
+# game/tests/test_sampling.py
+import random
+from django.test import TestCase
+from django.urls import reverse
+from game import geo
+from game.catalog import Catalog
+from game.sampling import SamplingIndex
+from game.models import Destination
+
+def make_catalog(version, rows):
+    return Catalog(version, [
+        {"id": pk, "city": f"City {pk}", "country": country, "region": geo.region_for(country), "clues": ["a", "b", "c"]}
+        for pk, country in rows
+    ])
+
+class SamplingIndexTest(TestCase):
+    def setUp(self):
+        countries = ["France", "Germany", "Japan", "Peru", "Kenya"]
+        self.catalog = make_catalog(1, [(pk, countries[pk % 5]) for pk in range(1, 51)])
+        self.index = SamplingIndex.build(self.catalog)
+
+    def test_deal_has_no_repeats(self):
+        """Test that a deck deals every destination once before repeating."""
+        deck = []
+        rng = random.Random(3)
+        dealt = [self.index.deal(deck, rng) for _ in range(50)]
+        self.assertEqual(sorted(dealt), list(range(1, 51)))
+
+    def test_seeded_rounds_are_deterministic(self):
+        """Test that the same seed deals the same destinations and distractors."""
+        def play(seed):
+            rng = random.Random(seed)
+            deck = []
+            return [(pk, self.index.distractors(pk, 3, rng)) for pk in (self.index.deal(deck, rng) for _ in range(10))]
+        self.assertEqual(play(7), play(7))
+
+    def test_hard_distractors_share_country(self):
+        """Test that hard mode draws wrong options from the answer's country first."""
+        picked = self.index.distractors(1, 3, random.Random(0), hard=True)
+        self.assertEqual(len(set(picked)), 3)
+        self.assertNotIn(1, picked)
+        self.assertTrue(all(self.catalog.get(pk)["country"] == "Germany" for pk in picked))
+
+    def test_incremental_rebuild_matches_full_build(self):
+        """Test that a derived index holds the same ids and buckets as a fresh one."""
+        rows = [(pk, "Japan" if pk == 7 else ["France", "Germany", "Japan", "Peru", "Kenya"][pk % 5])
+                for pk in range(1, 53) if pk not in (3, 10)]
+        updated = make_catalog(2, rows)
+        derived = SamplingIndex.build(updated, previous=self.index)
+        fresh = SamplingIndex.build(updated)
+        self.assertEqual(sorted(derived.ids), sorted(fresh.ids))
+        self.assertEqual({k: set(v) for k, v in derived.by_country.items()},
+                         {k: set(v) for k, v in fresh.by_country.items()})
+        self.assertEqual({k: set(v) for k, v in derived.by_region.items()},
+                         {k: set(v) for k, v in fresh.by_region.items()})
+        self.assertEqual({pk: derived.ids[i] for pk, i in derived.position.items() if derived.ids[i] != pk}, {})
+
+    def test_region_lookup_folds_names(self):
+        """Test that aliases and accents resolve to the same region."""
+        self.assertEqual(geo.region_for("USA"), "North America")
+        self.assertEqual(geo.region_for("Türkiye"), "Middle East")
+        self.assertEqual(geo.region_for("Atlantis"), geo.UNKNOWN_REGION)
+
+
+class NextRoundDeckTest(TestCase):
+    def test_rounds_do_not_repeat_for_a_player(self):
+        """Test that next_round keeps each player's deal order in a signed cookie."""
+        for i in range(6):
+            Destination.objects.create(city=f"City {i}", country="France", clues=[f"Clue {i}"])
+        seen = set()
+        for _ in range(6):
+            response = self.client.get(reverse("next_round"))
+            seen.add(response.json()["clues"][0])
+        self.assertEqual(len(seen), 6)
@@ -0,0 +1,73 @@
+# game/tests/test_scoring.py
+import json
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from game import catalog, rounds, scoring
+from game.models import Answer, Destination, GameSession
+from game.scoring import AnswerBuffer, answer_buffer
+
+class ScoringTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        self.addCleanup(answer_buffer.clear)
+        self.paris = Destination.objects.create(city="Paris", clues=["City of Lights"])
+        self.tokyo = Destination.objects.create(city="Tokyo", clues=["Shibuya"])
+
+    def answer(self, destination, guess, **extra):
+        url = f"/api/rounds/{rounds.make_round_id(destination.pk)}/answer"
+        return self.client.post(url, json.dumps({"answer": guess, **extra}), content_type="application/json")
+
+    def test_answers_are_buffered(self):
+        """Test that answers are not inserted one by one but totals stay current."""
+        with CaptureQueriesContext(connection) as ctx:
+            self.answer(self.paris, "Paris", username="ana")
+            response = self.answer(self.tokyo, "Paris")
+        self.assertFalse([q for q in ctx.captured_queries if 'INSERT INTO "game_answer"' in q["sql"]])
+        self.assertEqual(response.json()["session"], {"score": 1, "correct": 1, "wrong": 1})
+        self.assertEqual(Answer.objects.count(), 0)
+        answer_buffer.flush()
+        session = GameSession.objects.get()
+        self.assertEqual((session.username, session.score, session.wrong_count), ("ana", 1, 1))
+        self.assertEqual(Answer.objects.filter(session=session).count(), 2)
+        # Totals read after the flush come from the row alone.
+        response = self.answer(self.paris, "Paris")
+        self.assertEqual(response.json()["session"]["score"], 2)
+
+    def test_replayed_round_is_rejected(self):
+        """Test that the same round cannot be scored twice."""
+        round_id = rounds.make_round_id(self.paris.pk)
+        url = f"/api/rounds/{round_id}/answer"
+        body = json.dumps({"answer": "Paris"})
+        self.assertEqual(self.client.post(url, body, content_type="application/json").status_code, 200)
+        self.assertEqual(self.client.post(url, body, content_type="application/json").status_code, 409)
+
+    def test_flush_during_session_read(self):
+        """Test that a flush landing while the session row is read doesn't count an answer twice."""
+        self.answer(self.paris, "Paris")
+        read = scoring.get_game_session
+
+        def read_then_flush(request, username=""):
+            game_session = read(request, username)
+            self.assertFalse(answer_buffer.flush_lock._is_owned())
+            if answer_buffer.pending_totals(game_session.pk) != (0, 0, 0):
+                answer_buffer.flush()
+            return game_session
+
+        with mock.patch.object(scoring, "get_game_session", read_then_flush):
+            response = self.answer(self.tokyo, "Tokyo")
+        self.assertEqual(response.json()["session"], {"score": 2, "correct": 2, "wrong": 0})
+
+    def test_buffer_flushes_when_full(self):
+        """Test that reaching max_size writes the batch with one bulk insert."""
+        buffer = AnswerBuffer(max_size=3, max_delay=60)
+        session = GameSession.objects.create()
+        for correct in (True, True, False):
+            buffer.add(Answer(session=session, destination=self.paris, guess="x", correct=correct,
+                              answered_at=session.created_at))
+        session.refresh_from_db()
+        self.assertEqual((session.score, session.correct_count, session.wrong_count), (2, 2, 1))
+        self.assertEqual(buffer.pending_totals(session.pk), (0, 0, 0))
@@ -0,0 +1,71 @@
+# game/tests/test_snapshots.py
+import gzip
+import json
+import tempfile
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from game import catalog, snapshots
+from game.models import CatalogChange, Destination
+
+class CatalogSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        override = override_settings(SNAPSHOT_ROOT=tmpdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        Destination.objects.create(city="Paris", country="France", clues=["City of Lights"], fun_fact="Lutetia")
+        self.version = snapshots.build_snapshot()
+
+    def get(self, version, encoding=""):
+        return self.client.get(reverse("catalog_snapshot", args=[version]), HTTP_ACCEPT_ENCODING=encoding)
+
+    def test_snapshot_is_public_catalog(self):
+        """Test that the snapshot lists cities without clues or fun facts."""
+        response = self.get(self.version)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["destinations"][0]["city"], "Paris")
+        self.assertNotIn("clues", data["destinations"][0])
+        self.assertEqual(data["changes_version"], CatalogChange.objects.latest("id").pk)
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_encoding_negotiation(self):
+        """Test that the pre-compressed file matching Accept-Encoding is served."""
+        response = self.get(self.version, "gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        data = json.loads(gzip.decompress(b"".join(response.streaming_content)))
+        self.assertEqual(data["version"], self.version)
+        if snapshots.brotli is not None:
+            self.assertEqual(self.get(self.version, "gzip, br")["Content-Encoding"], "br")
+        self.assertFalse(self.get(self.version, "gzip;q=0").has_header("Content-Encoding"))
+        for refused in ["gzip;q=0.0", "gzip; q=0.00", "br;q=0.000, gzip;Q=0", "gzip;q=nope"]:
+            self.assertFalse(self.get(self.version, refused).has_header("Content-Encoding"), refused)
+        self.assertEqual(self.get(self.version, "br;q=0, gzip;q=0.5")["Content-Encoding"], "gzip")
+
+    def test_snapshot_built_on_demand(self):
+        """Test that a missing snapshot for the current version is built on request."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Destination.objects.create(city="Tokyo")
+        # Saving only moves the version; the snapshot waits for its first request.
+        self.assertFalse(snapshots.snapshot_path(catalog.get_version()).exists())
+        response = self.get(catalog.get_version())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(self.version - 1).status_code, 404)
+
+    def test_index_references_snapshot(self):
+        """Test that the homepage points at the current snapshot instead of inlining it."""
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, reverse("catalog_snapshot", args=[catalog.get_version()]))
+        self.assertNotContains(response, "Paris")
+
+    def test_snapshot_then_changes(self):
+        """Test that a client starting from the snapshot catches up through the change log."""
+        data = json.loads(b"".join(self.get(self.version).streaming_content))
+        with self.captureOnCommitCallbacks(execute=True):
+            Destination.objects.create(city="Tokyo")
+        delta = self.client.get(reverse("catalog_changes"), {"since": data["changes_version"]}).json()
+        self.assertFalse(delta["reset"])
+        cities = {entry["id"]: entry["city"] for entry in data["destinations"] + delta["upserts"]}
+        self.assertEqual(sorted(cities.values()), ["Paris", "Tokyo"])
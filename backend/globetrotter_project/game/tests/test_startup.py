@@ -0,0 +1,51 @@
+# game/tests/test_startup.py
+import io
+import json
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from game import catalog, startup
+from game.management.commands.startup_profile import parse_importtime
+from game.models import Destination
+
+class WarmUpTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        Destination.objects.create(city="Paris", country="France", clues=["City of Lights"])
+
+    def test_warm_up_loads_catalog(self):
+        """Test that warm-up times every step and leaves the catalog in memory."""
+        self.assertEqual([name for name, _seconds in startup.warm_up()], [name for name, _step in startup.STEPS])
+        with self.assertNumQueries(0):
+            self.assertEqual(len(catalog.get_catalog()), 1)
+
+    def test_failing_step_is_skipped(self):
+        """Test that a failing step is logged and does not stop the others."""
+        def broken():
+            raise RuntimeError("database is down")
+        steps = startup.STEPS
+        startup.STEPS = [("broken", broken), *steps]
+        self.addCleanup(setattr, startup, "STEPS", steps)
+        with self.assertLogs("game.startup", "WARNING"):
+            timings = startup.warm_up()
+        self.assertEqual(len(timings), len(steps) + 1)
+
+    def test_parse_importtime(self):
+        """Test that only top-level imports are summed, per package."""
+        stderr = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |   django.utils",
+            "import time:       200 |       5000 | django",
+            "import time:        50 |       1000 | django.db",
+            "import time:        30 |        300 | game",
+        ])
+        self.assertEqual(parse_importtime(stderr), {"django": 0.006, "game": 0.0003})
+
+    def test_startup_profile_command(self):
+        """Test that the command reports phases, warm-up steps and imports from a fresh process."""
+        out = io.StringIO()
+        call_command("startup_profile", "--json", stdout=out)
+        timings = json.loads(out.getvalue())
+        self.assertEqual([name for name, _seconds in timings["steps"]], [name for name, _step in startup.STEPS])
+        self.assertIn("django", dict(timings["imports"]))
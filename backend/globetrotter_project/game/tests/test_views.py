@@ -1,10 +1,18 @@
 # game/tests/test_views.py
+import json
 from django.urls import reverse
+from django.core import signing
+from django.core.cache import cache
 from django.test import TestCase
+from game import catalog, rounds
 from game.models import Destination
+from game.scoring import answer_buffer
 
 class GlobetrotterViewsTest(TestCase):
     def setUp(self):
+        cache.clear()
+        catalog._local.clear()
+        self.addCleanup(answer_buffer.clear)
         # Create a sample Destination instance for testing views.
         self.destination = Destination.objects.create(
             city="Paris",
@@ -12,6 +20,8 @@ class GlobetrotterViewsTest(TestCase):
             fun_fact="Paris was once known as Lutetia.",
             trivia=["Home to the Louvre", "Known for fashion"]
         )
+        for city in ["Tokyo", "Cairo", "Lima"]:
+            Destination.objects.create(city=city, clues=[f"Clue about {city}"])
 
     def test_homepage_status_code(self):
         """Test that the homepage returns a 200 status code."""
@@ -19,4 +29,45 @@ class GlobetrotterViewsTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
-  
\ No newline at end of file
+    def test_homepage_does_not_embed_catalog(self):
+        """Test that the homepage does not query or ship the destinations."""
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'))
+        self.assertNotContains(response, "Lutetia")
+
+    def test_next_round_hides_answer(self):
+        """Test that a round offers four options but not the answer itself."""
+        response = self.client.get(reverse('next_round'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['options']), 4)
+        self.assertNotIn('city', data)
+        self.assertNotIn('fun_fact', data)
+
+    def test_answer_round(self):
+        """Test that answers are checked on the server."""
+        round_data = self.client.get(reverse('next_round')).json()
+        # Clues come back in a random order, so find the destination by its round id.
+        city = Destination.objects.get(pk=rounds.read_round_id(round_data['id'])).city
+        response = self.client.post(
+            round_data['answer_url'], json.dumps({'answer': city}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['correct'])
+        self.assertEqual(response.json()['answer'], city)
+
+    def test_answer_round_rejects_tampered_id(self):
+        """Test that a forged round id is rejected."""
+        url = reverse('answer_round', args=['forged:round'])
+        response = self.client.post(url, json.dumps({'answer': 'Paris'}), content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_round_id_is_opaque(self):
+        """Test that a round id doesn't reveal its destination, yet resolves on the server."""
+        pk = self.destination.pk
+        first, second = rounds.make_round_id(pk), rounds.make_round_id(pk)
+        payloads = [signing.b64_decode(round_id.split(':')[0].encode()) for round_id in (first, second)]
+        self.assertNotEqual(payloads[0][rounds.ROUND_NONCE_BYTES:], payloads[1][rounds.ROUND_NONCE_BYTES:])
+        for payload in payloads:
+            self.assertNotIn(pk.to_bytes(rounds.ROUND_ID_BYTES, 'big'), payload)
+        self.assertEqual([rounds.read_round_id(first), rounds.read_round_id(second)], [pk, pk])
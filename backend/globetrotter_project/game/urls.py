@@ -1,7 +1,25 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
-urlpatterns = [
-    path('', views.index, name='index'),
-    # Additional API endpoints can be added here.
-]
+
+def game_urlpatterns(game_views):
+    """The game's routes, with the index, round and answer views taken from `game_views`."""
+    return [
+        path('', game_views.index, name='index'),
+        path('api/rounds/next', game_views.next_round, name='next_round'),
+        path('api/rounds/<str:round_id>/answer', game_views.answer_round, name='answer_round'),
+        path('challenge/<str:token>', views.challenge, name='challenge'),
+        path('challenge/<str:token>/preview.png', views.challenge_preview, name='challenge_preview'),
+        path('api/challenges', views.create_challenge, name='create_challenge'),
+        path('api/challenges/<str:token>/rounds', views.challenge_rounds, name='challenge_rounds'),
+        path('api/catalog/<int:version>.json', views.catalog_snapshot, name='catalog_snapshot'),
+        path('api/catalog/changes', views.catalog_changes, name='catalog_changes'),
+        path('api/leaderboard', views.leaderboard_view, name='leaderboard'),
+        path('images/<path:path>', views.cached_image, name='cached_image'),
+        path('metrics', views.metrics_view, name='metrics'),
+    ]
+
+
+urlpatterns = game_urlpatterns(views)
+# Routed under ASGI, see globetrotter_project/asgi_urls.py.
+async_urlpatterns = game_urlpatterns(async_views)
@@ -1,13 +1,297 @@
+import functools
+import hashlib
 import json
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
-from .models import Destination
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition, require_GET, require_POST
+from . import catalog, challenges, changes, geo, images, metrics, pool, rounds, scoring, snapshots
+from .ratelimit import rate_limit
+from .leaderboard import WINDOWS, leaderboard
+from .pool import round_pool
 
+
+@functools.lru_cache(maxsize=None)
+def _build_id(explicit):
+    if explicit:
+        return explicit
+    with open(get_template('game/index.html').origin.name, 'rb') as template:
+        digest = hashlib.sha256(template.read())
+    # The manifest maps every static file to its hashed name, so it changes whenever
+    # an asset the page points at does (None before collectstatic has run).
+    digest.update((staticfiles_storage.read_manifest() or '').encode())
+    return digest.hexdigest()[:12]
+
+
+def build_id():
+    """
+    The deployed page's build: GAME_BUILD_ID when set, else a hash of the
+    index template and the static files manifest. Worked out once per process.
+    """
+    return _build_id(getattr(settings, 'GAME_BUILD_ID', ''))
+
+
+def index_etag(version):
+    # A deploy can change the page without touching the catalog; without the build
+    # in the ETag clients would revalidate to old HTML pointing at the old assets.
+    return f'catalog-{version}-{build_id()}'
+
+
+@rate_limit('page')
+@ensure_csrf_cookie
+@cache_control(no_cache=True)
+@condition(etag_func=lambda request: index_etag(catalog.get_version()))
 def index(request):
-    # Query the Destination model (fields: city, country, clues, fun_fact, trivia, image_url)
-    dests = list(Destination.objects.all().values(
-        'city', 'country', 'clues', 'fun_fact', 'trivia', 'image_url'
-    ))
+    # The page is only a shell: rounds are fetched one at a time from the API,
+    # so the payload stays the same size however big the catalog gets.
+    context = {'catalog_snapshot_version': catalog.get_version()}
+    return render(request, 'game/index.html', context)
+
+
+def round_params(request):
+    """
+    (difficulty, region, mode) asked for by a next-round request, or an error
+    response. difficulty is None unless a difficulty or region was given.
+    """
+    difficulty = request.GET.get('difficulty')
+    region = request.GET.get('region')
+    if difficulty or region:
+        difficulty = difficulty or rounds.NORMAL
+        if difficulty not in rounds.DIFFICULTIES or (region and region not in geo.REGIONS):
+            return JsonResponse({'error': 'Unknown difficulty or region.'}, status=400)
+    mode = request.GET.get('mode', rounds.CHOICE)
+    if mode not in rounds.MODES:
+        return JsonResponse({'error': 'Unknown mode.'}, status=400)
+    return difficulty, region, mode
+
+
+def answer_params(request):
+    """(answer, username, mode) posted to answer a round, or an error response."""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+    if not isinstance(payload, dict):
+        payload = {}
+    answer = payload.get('answer')
+    if not isinstance(answer, str) or not answer.strip():
+        return JsonResponse({'error': 'An answer is required.'}, status=400)
+    username = payload.get('username')
+    username = username.strip()[:50] if isinstance(username, str) else ''
+    mode = payload.get('mode', rounds.CHOICE)
+    if mode not in rounds.MODES:
+        return JsonResponse({'error': 'Unknown mode.'}, status=400)
+    return answer, username, mode
+
+
+@rate_limit('round')
+@require_GET
+def next_round(request):
+    params = round_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+    difficulty, region, mode = params
+    if difficulty:
+        # Filtered modes are served from pre-built rounds when the pool has one ready;
+        # pooled rounds are multiple choice, so typed rounds are always built here.
+        body = round_pool.pop(difficulty, region) if mode == rounds.CHOICE else None
+        if body is None:
+            round_data = rounds.build_round(difficulty=difficulty, region=region, mode=mode)
+            if round_data is None:
+                return JsonResponse({'error': 'No destinations available.'}, status=404)
+            body = pool.serialize(round_data)
+        return HttpResponse(body, content_type='application/json')
+
+    # The deal order lives in a signed cookie, so serving a round never writes the session.
+    deck = rounds.read_deck(request)
+    round_data = rounds.build_round(deck=deck, mode=mode)
+    if round_data is None:
+        return JsonResponse({'error': 'No destinations available.'}, status=404)
+    response = JsonResponse(round_data)
+    rounds.write_deck(response, deck)
+    return response
+
+
+@rate_limit('answer')
+@require_POST
+def answer_round(request, round_id):
+    params = answer_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+    answer, username, mode = params
+    try:
+        result = rounds.check_answer(round_id, answer, mode)
+    except rounds.RoundError as exc:
+        return JsonResponse({'error': str(exc)}, status=404)
+    # Each signed round can only be scored once, so replaying a correct answer gains nothing.
+    if not scoring.claim_round(round_id):
+        return JsonResponse({'error': 'This round has already been answered.'}, status=409)
+    result['session'] = scoring.record_answer(
+        request, rounds.read_round_id(round_id), answer, result['correct'], username
+    )
+    return JsonResponse(result)
+
+
+@require_POST
+def create_challenge(request):
+    # The score comes from the player's own session, not from the client.
+    try:
+        payload = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+    username = payload.get('username') if isinstance(payload, dict) else None
+    if not isinstance(username, str) or not username.strip():
+        return JsonResponse({'error': 'A username is required.'}, status=400)
+    score = scoring.session_totals(request)['score']
+    token = challenges.make_token(username, score)
+    return JsonResponse({
+        'url': request.build_absolute_uri(reverse('challenge', args=[token])),
+        'challenger': username.strip()[:challenges.MAX_CHALLENGER_LENGTH],
+        'score': score,
+    })
+
+
+def challenge_etag(request, token):
+    return f'challenge-{catalog.get_version()}-{hashlib.sha256(token.encode()).hexdigest()[:16]}'
+
+
+@require_GET
+@cache_control(public=True, max_age=300)
+@condition(etag_func=challenge_etag)
+def challenge(request, token):
+    # The same for everyone opening the link, so shared caches can answer unfurls; the
+    # per-visitor rounds (and the CSRF cookie) come from challenge_rounds.
+    try:
+        current = challenges.read_token(token)
+    except challenges.ChallengeError:
+        raise Http404('Invalid or expired challenge.')
     context = {
-        'destinations_json': json.dumps(dests)
+        'catalog_snapshot_version': catalog.get_version(),
+        'challenge': current,
+        'challenge_rounds': challenges.CHALLENGE_ROUNDS,
+        'challenge_url': request.build_absolute_uri(),
+        'challenge_preview_url': request.build_absolute_uri(reverse('challenge_preview', args=[token])),
+        'challenge_rounds_url': reverse('challenge_rounds', args=[token]),
     }
     return render(request, 'game/index.html', context)
+
+
+@rate_limit('round')
+@require_GET
+@never_cache
+@ensure_csrf_cookie
+def challenge_rounds(request, token):
+    try:
+        current = challenges.read_token(token)
+    except challenges.ChallengeError as exc:
+        return JsonResponse({'error': str(exc)}, status=404)
+    return JsonResponse({
+        'challenger': current.challenger,
+        'score': current.score,
+        'rounds': challenges.session_rounds(request.session, token, current),
+    })
+
+
+@require_GET
+def challenge_preview(request, token):
+    try:
+        current = challenges.read_token(token)
+    except challenges.ChallengeError:
+        raise Http404('Invalid or expired challenge.')
+    response = HttpResponse(challenges.preview_png(current), content_type='image/png')
+    # A token always shows the same card.
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@require_GET
+def catalog_snapshot(request, version):
+    # Snapshots are written once per catalog version; only encoding negotiation happens here.
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    path, encoding = snapshots.negotiate(version, accept_encoding)
+    if path is None and version == catalog.get_version():
+        snapshots.build_snapshot()
+        path, encoding = snapshots.negotiate(version, accept_encoding)
+    if path is None:
+        raise Http404('Unknown catalog version.')
+    response = FileResponse(open(path, 'rb'), content_type='application/json')
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    response['ETag'] = f'"catalog-{version}-{encoding}"'
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@require_GET
+@cache_control(no_cache=True)
+def catalog_changes(request):
+    # Returning players send the change version they hold and get only what changed since.
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return JsonResponse({'error': 'since must be an integer.'}, status=400)
+    if since < 0:
+        return JsonResponse({'error': 'since must not be negative.'}, status=400)
+    return JsonResponse(
+        changes.changes_since(since), json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False}
+    )
+
+
+@require_GET
+def leaderboard_view(request):
+    window = request.GET.get('window', WINDOWS[0])
+    if window not in WINDOWS:
+        return JsonResponse({'error': f"window must be one of {', '.join(WINDOWS)}."}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 0), 100)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer.'}, status=400)
+    index = leaderboard.get(window)
+    data = {
+        'window': window,
+        'players': len(index),
+        'top': [{'rank': rank, 'player': player, 'score': score} for rank, player, score in index.top(limit)],
+        'me': None,
+    }
+    player = request.GET.get('player', '').strip()
+    if player:
+        mine = index.rank(player)
+        if mine is not None:
+            data['me'] = {'rank': mine[0], 'player': player, 'score': mine[1]}
+    return JsonResponse(data)
+
+
+@require_GET
+def cached_image(request, path):
+    # File names contain a content hash, so a URL never changes meaning and can be cached forever.
+    try:
+        full_path = safe_join(images.image_root(), path)
+        response = FileResponse(open(full_path, 'rb'))
+    except (OSError, SuspiciousFileOperation):
+        raise Http404('Image not found.')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@require_GET
+def metrics_view(request):
+    """Request metrics of every worker, in the Prometheus text format, for holders of GAME_METRICS_TOKEN."""
+    token = getattr(settings, 'GAME_METRICS_TOKEN', '')
+    if not token:
+        raise Http404('Metrics are disabled.')
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        response = HttpResponse('Unauthorized.', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(
+        metrics.render(metrics.snapshot()), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
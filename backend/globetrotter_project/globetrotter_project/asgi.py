@@ -12,5 +12,17 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'globetrotter_project.settings')
+# Serve the game endpoints with the async views (see asgi_urls.py).
+os.environ.setdefault('GAME_ASYNC_VIEWS', 'True')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Warm the URLconf, templates, static manifest and catalog before the first request,
+# then flush buffered game answers in the background and keep the pools of pre-built
+# rounds topped up (in each worker, when gunicorn preloads the app; see gunicorn.conf.py).
+from game import rooms, startup  # noqa: E402
+
+startup.initialize()
+
+# WebSocket connections are multiplayer rooms (game/rooms.py); HTTP goes to Django.
+application = rooms.websocket_router(django_application)
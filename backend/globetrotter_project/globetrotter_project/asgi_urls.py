@@ -0,0 +1,19 @@
+"""
+URL configuration used when GAME_ASYNC_VIEWS is on (asgi.py turns it on): the
+same routes as urls.py, with the game endpoints served by game.async_views.
+"""
+from django.contrib import admin
+from django.urls import path, include
+from django.conf import settings
+from django.conf.urls.static import static
+
+from game.urls import async_urlpatterns
+
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include(async_urlpatterns)),
+]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -32,8 +32,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'game.middleware.MetricsMiddleware',  # First, so its timings cover the whole stack
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Must be directly after SecurityMiddleware
+    'game.middleware.StaticFilesMiddleware',  # WhiteNoise; must be directly after SecurityMiddleware
     'corsheaders.middleware.CorsMiddleware',  
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,12 +47,16 @@ MIDDLEWARE = [
 # Allow all origins during development (adjust for production)
 CORS_ALLOW_ALL_ORIGINS = True
 
-ROOT_URLCONF = 'globetrotter_project.urls'
+# asgi.py turns GAME_ASYNC_VIEWS on, routing the index, round and answer endpoints to
+# coroutines (game/async_views.py) that use the async ORM.
+GAME_ASYNC_VIEWS = os.getenv('GAME_ASYNC_VIEWS', 'False') == 'True'
+ROOT_URLCONF = 'globetrotter_project.asgi_urls' if GAME_ASYNC_VIEWS else 'globetrotter_project.urls'
 
 # Templates configuration
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timings for the metrics middleware
+        'BACKEND': 'game.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'game' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,6 +91,98 @@ else:
         }
     }
 
+# Read replicas, as comma-separated URLs in the DATABASE_URL format. Catalog reads go to
+# a healthy replica and fall back to the primary; see game/routers.py.
+DATABASE_REPLICAS = []
+for _i, _url in enumerate(filter(None, map(str.strip, os.getenv('DATABASE_REPLICA_URLS', '').split(',')))):
+    DATABASES[f'replica_{_i}'] = {**dj_database_url.parse(_url), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{_i}')
+DATABASE_ROUTERS = ['game.routers.ReplicaRouter']
+# Seconds catalog reads stay on the primary after a catalog write, to cover replica lag.
+# Must be at least DATABASE_REPLICA_MAX_LAG below, or the router refuses to start.
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DATABASE_REPLICA_PIN_SECONDS', '30'))
+# How often each process re-checks a replica, and the replay lag (seconds) it tolerates.
+DATABASE_REPLICA_HEALTH_INTERVAL = float(os.getenv('DATABASE_REPLICA_HEALTH_INTERVAL', '5'))
+DATABASE_REPLICA_MAX_LAG = float(os.getenv('DATABASE_REPLICA_MAX_LAG', '30'))
+
+# Keep connections open between requests (each worker opens one at start-up, see
+# game/startup.py) and check them before reuse. Off under ASGI, whose queries run on
+# threads that don't outlive the request, as Django recommends.
+for _database in DATABASES.values():
+    _database['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '0' if GAME_ASYNC_VIEWS else '600'))
+    _database['CONN_HEALTH_CHECKS'] = True
+
+# Cache Configuration
+# Local memory is enough for a single process. Catalog versions, answered-round claims
+# and rate limit counts must be shared by every worker with atomic add and incr, so
+# point CACHE_BACKEND and CACHE_LOCATION at Redis or Memcached when running several;
+# gunicorn.conf.py refuses any other backend with more than one worker.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'globetrotter'),
+    }
+}
+
+# Number of catalog versions each process keeps in its in-memory LRU.
+GAME_CATALOG_LRU_SIZE = int(os.getenv('GAME_CATALOG_LRU_SIZE', '2'))
+
+# Most changed destinations sent as a delta by /api/catalog/changes; clients further
+# behind get the whole catalog instead.
+GAME_CATALOG_DELTA_LIMIT = int(os.getenv('GAME_CATALOG_DELTA_LIMIT', '5000'))
+
+# Sessions are read from the cache and only written to the database when they change.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Answers are buffered per process and written with bulk_create once this many are
+# pending or the oldest has waited this many seconds.
+GAME_ANSWER_BUFFER_SIZE = int(os.getenv('GAME_ANSWER_BUFFER_SIZE', '200'))
+GAME_ANSWER_FLUSH_INTERVAL = float(os.getenv('GAME_ANSWER_FLUSH_INTERVAL', '2'))
+
+# Pre-built rounds kept per (difficulty, region) pool, refilled below the low watermark.
+GAME_ROUND_POOL_SIZE = int(os.getenv('GAME_ROUND_POOL_SIZE', '256'))
+GAME_ROUND_POOL_LOW_WATERMARK = int(os.getenv('GAME_ROUND_POOL_LOW_WATERMARK', '64'))
+
+# Request metrics (served at /metrics). A fraction GAME_METRICS_SAMPLE_RATE of requests get
+# full timings; every request is counted. Workers share totals through files in
+# GAME_METRICS_DIR (gunicorn.conf.py empties it at start-up; leave empty for per-process
+# metrics). /metrics is off unless GAME_METRICS_TOKEN is set, and then answers only
+# requests sending it as `Authorization: Bearer <token>`.
+GAME_METRICS_SAMPLE_RATE = float(os.getenv('GAME_METRICS_SAMPLE_RATE', '1'))
+GAME_METRICS_DIR = os.getenv('GAME_METRICS_DIR', str(BASE_DIR / 'media' / 'metrics'))
+GAME_METRICS_TOKEN = os.getenv('GAME_METRICS_TOKEN', '')
+# Identifies the deployed build in the index page's ETag (e.g. the git commit). When
+# unset, a hash of the index template and the static files manifest is used.
+GAME_BUILD_ID = os.getenv('GAME_BUILD_ID', '')
+
+# Let clients request a cProfile summary with an `X-Profile` header.
+GAME_PROFILE_REQUESTS = os.getenv('GAME_PROFILE_REQUESTS', str(DEBUG)) == 'True'
+
+# Multiplayer rooms: WebSockets at /ws/rooms/<code>, served by asgi.py (see game/rooms.py).
+# Rooms live in one process, so route each room code to one worker. The channel layer
+# fans room broadcasts out to sockets: a dotted path to the in-memory layer or a broker one.
+GAME_CHANNEL_LAYER = os.getenv('GAME_CHANNEL_LAYER', 'game.rooms.InMemoryChannelLayer')
+GAME_ROOM_MAX_PLAYERS = int(os.getenv('GAME_ROOM_MAX_PLAYERS', '8'))
+GAME_ROOM_ROUND_SECONDS = float(os.getenv('GAME_ROOM_ROUND_SECONDS', '20'))
+# Frames queued for one socket before it is disconnected as too slow.
+GAME_ROOM_SEND_QUEUE = int(os.getenv('GAME_ROOM_SEND_QUEUE', '64'))
+
+# Rate limits per view scope (see game/ratelimit.py): requests per s, m or h, counted per
+# client IP and per session cookie. Each worker counts in memory and syncs its counts
+# through the cache every GAME_RATE_LIMIT_SYNC_INTERVAL seconds.
+GAME_RATE_LIMITS = {
+    'page': {'ip': '120/m'},
+    'round': {'ip': '600/m', 'session': '120/m'},
+    'answer': {'ip': '600/m', 'session': '120/m'},
+}
+GAME_RATE_LIMIT_SYNC_INTERVAL = float(os.getenv('GAME_RATE_LIMIT_SYNC_INTERVAL', '1'))
+# Proxies in front of the app that append to X-Forwarded-For; 0 trusts REMOTE_ADDR alone.
+# Behind a load balancer or reverse proxy (nginx, Traefik, the host's router) set it to
+# the number of hops, usually 1: otherwise REMOTE_ADDR is the proxy's and every player
+# shares its per-IP rate limit. Never set it higher than the real hop count, or clients
+# can pick their own address through the header.
+GAME_TRUSTED_PROXIES = int(os.getenv('GAME_TRUSTED_PROXIES', '0'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -110,6 +207,13 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Resized destination images produced by `manage.py cache_images`
+IMAGE_CACHE_ROOT = Path(os.getenv('IMAGE_CACHE_ROOT', BASE_DIR / 'media' / 'images'))
+IMAGE_CACHE_URL = '/images/'
+
+# Pre-serialized (and pre-compressed) catalog snapshots, one set of files per catalog version
+SNAPSHOT_ROOT = Path(os.getenv('SNAPSHOT_ROOT', BASE_DIR / 'media' / 'snapshots'))
+
 # Enable Whitenoise to serve static files in production
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
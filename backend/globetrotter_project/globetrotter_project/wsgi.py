@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'globetrotter_project.settings')
 
 application = get_wsgi_application()
+
+# Warm the URLconf, templates, static manifest and catalog before the first request,
+# then flush buffered game answers in the background and keep the pools of pre-built
+# rounds topped up (in each worker, when gunicorn preloads the app; see gunicorn.conf.py).
+from game import startup  # noqa: E402
+
+startup.initialize()
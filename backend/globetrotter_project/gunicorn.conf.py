@@ -0,0 +1,75 @@
+"""
+Gunicorn settings (the Dockerfile passes this file with -c).
+
+GAME_SERVER=asgi runs uvicorn workers on asgi.py, which serves the game
+endpoints with the async views and the multiplayer room WebSockets; the
+default runs sync workers on wsgi.py. A room is held by the worker its
+sockets land on, so serve rooms from one worker or route by room code.
+
+The app is loaded and warmed once in the master and forked into the workers
+(preload_app); set GAME_PRELOAD=False to load it in each worker instead.
+
+Workers share the catalog version, answered-round claims and rate limit
+counts through the default cache, using add() and incr() as atomic
+operations. With more than one worker, set CACHE_BACKEND and CACHE_LOCATION
+to Redis or Memcached (e.g. django.core.cache.backends.redis.RedisCache and
+redis://redis:6379/0); any other backend is refused at start-up, since
+LocMemCache is per process and FileBasedCache or DatabaseCache would let two
+workers claim the same round.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+if os.getenv('GAME_SERVER', 'wsgi') == 'asgi':
+    wsgi_app = 'globetrotter_project.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'globetrotter_project.wsgi:application'
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+# Backends whose add() and incr() are atomic across processes.
+ATOMIC_CACHES = {
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+}
+
+preload_app = os.getenv('GAME_PRELOAD', 'True') == 'True'
+# Read by game.startup when the app loads, to leave connections and threads to the workers.
+os.environ['GAME_PRELOAD'] = str(preload_app)
+
+
+def on_starting(server):
+    # Under preload_app the app is loaded already; otherwise settings are read here first.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'globetrotter_project.settings')
+    from game import metrics
+    metrics.reset_store()
+    # Read as settings.CACHES will: the app may not be loaded yet, and -w can override workers.
+    backend = os.getenv('CACHE_BACKEND', LOCMEM_CACHE)
+    if server.cfg.workers > 1 and backend not in ATOMIC_CACHES:
+        raise RuntimeError(
+            f'{server.cfg.workers} workers cannot share {backend.rpartition(".")[2]}: catalog versions, round '
+            'claims and rate limits need a cache with atomic add and incr. Set CACHE_BACKEND to '
+            'django.core.cache.backends.redis.RedisCache (or a Memcached backend) and CACHE_LOCATION '
+            'to its URL, or WEB_CONCURRENCY=1.'
+        )
+
+
+def when_ready(server):
+    if preload_app:
+        from game import startup
+        startup.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from game import startup
+        startup.post_fork()
+
+
+def child_exit(server, worker):
+    from game import metrics
+    metrics.retire_worker(worker.pid)
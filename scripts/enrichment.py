@@ -0,0 +1,330 @@
+"""
+Asyncio HTTP engine used by final_code.py to call OpenAI and Unsplash.
+
+It provides a pooled client behind a pluggable transport, a token bucket per
+upstream, jittered exponential backoff that honours Retry-After, a global
+concurrency limit and latency/throughput statistics. Responses can be kept in
+a content-addressed on-disk cache and results appended to a JSONL checkpoint
+so an interrupted build can resume without paying for the same calls twice.
+"""
+import asyncio
+import email.utils
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Status codes worth retrying: rate limited or a transient upstream failure.
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class Response:
+    """A buffered HTTP response. Transports must lower-case header names."""
+    status_code: int
+    headers: dict
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body)
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+
+class TransportError(Exception):
+    """Raised by a transport when the request never produced an HTTP response."""
+
+
+class HttpxTransport:
+    """
+    Pooled transport backed by httpx.AsyncClient. Connections are kept alive and
+    reused across requests to the same upstream.
+    """
+
+    def __init__(self, max_connections=20, timeout=30.0):
+        try:
+            import httpx
+        except ImportError as exc:
+            raise RuntimeError("httpx is required for HttpxTransport: pip install httpx") from exc
+        self._httpx = httpx
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def request(self, method, url, headers=None, json=None, params=None):
+        try:
+            response = await self._client.request(method, url, headers=headers, json=json, params=params)
+        except self._httpx.HTTPError as exc:
+            raise TransportError(str(exc)) from exc
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        return Response(response.status_code, headers, response.content)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class CacheMiss(Exception):
+    """Raised in cache-only mode when a request has no cached response."""
+
+
+class ResponseCache:
+    """
+    On-disk cache of successful upstream responses, addressed by a hash of the
+    request (endpoint, method, query params and JSON body, which carries the
+    prompt, model and sampling params). Credentials in headers are not part of
+    the key, so rotating an API key keeps the cache valid.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def key(method, url, body=None, params=None):
+        payload = {"method": method, "url": url, "json": body, "params": params}
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return Response(data['status_code'], data['headers'], data['body'].encode('utf-8'))
+
+    def delete(self, key):
+        self._path(key).unlink(missing_ok=True)
+
+    def set(self, key, response):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"status_code": response.status_code, "headers": response.headers, "body": response.text}, f)
+        # Atomic rename so a crash never leaves a half-written entry behind.
+        os.replace(tmp, path)
+
+
+class Checkpoint:
+    """Append-only JSONL file holding one finished record per line."""
+
+    def __init__(self, path, key='city'):
+        self.path = Path(path)
+        self.key = key
+
+    def load(self):
+        """Return finished records keyed by `key`, ignoring a torn last line."""
+        records = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    records[record[self.key]] = record
+        except FileNotFoundError:
+            pass
+        return records
+
+    def reset(self):
+        self.path.unlink(missing_ok=True)
+
+    def append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class TokenBucket:
+    """Allow `rate` requests per second on average with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Drain the bucket so nothing else is sent for `seconds` (used on 429)."""
+        self._tokens = min(self._tokens, -seconds * self.rate)
+        self._updated = time.monotonic()
+
+
+def parse_retry_after(value):
+    """Return the Retry-After header as seconds, accepting delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+@dataclass
+class Backoff:
+    """Full-jitter exponential backoff: sleep a random amount up to base * 2**attempt."""
+    base: float = 0.5
+    maximum: float = 30.0
+    rng: random.Random = field(default_factory=random.Random)
+
+    def delay(self, attempt, retry_after=None):
+        delay = self.rng.uniform(0, min(self.maximum, self.base * 2 ** attempt))
+        if retry_after is not None:
+            # Never retry before the server asked us to, but keep some jitter on top.
+            delay = max(delay, retry_after + self.rng.uniform(0, self.base))
+        return delay
+
+
+@dataclass
+class UpstreamStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    throttled: int = 0
+    cache_hits: int = 0
+    latencies: list = field(default_factory=list)
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.upstreams = {}
+
+    def for_upstream(self, name):
+        return self.upstreams.setdefault(name, UpstreamStats())
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        lines = [f"Finished in {elapsed:.1f}s"]
+        for name, s in sorted(self.upstreams.items()):
+            lines.append(
+                f"  {name}: {s.requests} requests ({s.requests / elapsed if elapsed else 0:.2f}/s), "
+                f"{s.cache_hits} cache hits, {s.retries} retries, {s.throttled} throttled, {s.failures} failed; "
+                f"latency p50={s.percentile(50) * 1000:.0f}ms p95={s.percentile(95) * 1000:.0f}ms "
+                f"p99={s.percentile(99) * 1000:.0f}ms"
+            )
+        return "\n".join(lines)
+
+
+def usable(response, validate):
+    if validate is None:
+        return True
+    try:
+        validate(response)
+    except ValueError:
+        return False
+    return True
+
+
+class UpstreamClient:
+    """
+    Send requests through `transport`, rate limited per upstream name and
+    retried with backoff on throttling, 5xx responses and transport errors.
+
+    With a `cache`, hits are returned before any rate limiting and 200
+    responses are stored. Pass `validate` (called with the response, raising
+    ValueError if the body is unusable) to keep unusable bodies out of the
+    cache: a cached one is evicted and fetched again, a fresh one is returned
+    uncached, so the caller's next attempt reaches the network. With
+    `transport=None` the client is offline and raises CacheMiss for anything
+    not in the cache.
+    """
+
+    def __init__(self, transport, limits, concurrency=10, max_retries=5, backoff=None, stats=None, cache=None):
+        self.transport = transport
+        self.limits = limits
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff = backoff or Backoff()
+        self.stats = stats or Stats()
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(self, upstream, method, url, validate=None, **kwargs):
+        stats = self.stats.for_upstream(upstream)
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(method, url, body=kwargs.get('json'), params=kwargs.get('params'))
+            cached = self.cache.get(key)
+            if cached is not None and usable(cached, validate):
+                stats.cache_hits += 1
+                return cached
+            if cached is not None:
+                self.cache.delete(key)
+        if self.transport is None:
+            raise CacheMiss(f"No cached response for {method} {url}")
+        response = await self._send(upstream, stats, method, url, **kwargs)
+        if key is not None and response.status_code == 200 and usable(response, validate):
+            self.cache.set(key, response)
+        return response
+
+    async def _send(self, upstream, stats, method, url, **kwargs):
+        bucket = self.limits.get(upstream)
+        attempt = 0
+        while True:
+            if bucket is not None:
+                await bucket.acquire()
+            retry_after = None
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await self.transport.request(method, url, **kwargs)
+                except TransportError:
+                    response = None
+                stats.requests += 1
+                stats.latencies.append(time.perf_counter() - started)
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+            if response is not None:
+                retry_after = parse_retry_after(response.headers.get('retry-after'))
+                if response.status_code == 429:
+                    stats.throttled += 1
+                    if bucket is not None and retry_after:
+                        bucket.pause(retry_after)
+            if attempt >= self.max_retries:
+                stats.failures += 1
+                if response is None:
+                    raise TransportError(f"{method} {url} failed after {attempt + 1} attempts")
+                return response
+            stats.retries += 1
+            await asyncio.sleep(self.backoff.delay(attempt, retry_after))
+            attempt += 1
+
+    async def aclose(self):
+        if self.transport is not None:
+            await self.transport.aclose()
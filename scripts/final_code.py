@@ -1,10 +1,20 @@
+import argparse
+import asyncio
 import json
-import requests
-import time
 import os
 import re
+import sys
+from collections import deque
+from pathlib import Path
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from enrichment import (
+    CacheMiss, Checkpoint, HttpxTransport, ResponseCache, TokenBucket, UpstreamClient,
+)
+
+# The name dedup and the region list are shared with the Django app (plain Python, no Django needed).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend' / 'globetrotter_project'))
+from game.dedup import Deduplicator, dedup_key  # noqa: E402
+from game.geo import CONTINENTS, region_for  # noqa: E402
 
 # Load environment variables from .env
 load_dotenv()
@@ -13,11 +23,19 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 openai_headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
 
+# Upstream endpoints (overridable so the builder can run against a local stub server)
+OPENAI_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1') + '/chat/completions'
+UNSPLASH_URL = os.getenv('UNSPLASH_BASE_URL', 'https://api.unsplash.com') + '/search/photos'
+
 # Configurable parameters
 target_total = 120      # final total unique destinations required (including originals)
-generation_delay = 5    # delay after each generation call (in seconds)
-processing_delay = 5    # delay after processing (in seconds)
 max_generation_attempts = 50 # maximum overall attempts for generating unique cities
+names_per_call = 25     # city names requested per generation call
+concurrency = 10        # maximum requests in flight across both upstreams
+openai_rate = 3.0       # OpenAI requests per second (token bucket refill rate)
+unsplash_rate = 1.0     # Unsplash requests per second (token bucket refill rate)
+cache_dir = '.cache/responses'                          # raw upstream responses, keyed by request hash
+checkpoint_path = 'expanded_dataset.checkpoint.jsonl'   # one processed destination per line
 
 def sanitize_json_string(s):
     """
@@ -31,16 +49,61 @@ def fallback_extract_strings(s):
     """Fallback method: extract all double-quoted strings from s."""
     return re.findall(r'"([^"]+)"', s)
 
-def generate_destination_names(count, exclude_list, retries=3):
+# Names are requested per (region, initial letters) partition. Partitions don't overlap,
+# so a prompt only has to exclude the names already found in its own partition instead
+# of every name collected so far.
+LETTER_GROUPS = ["ABC", "DEF", "GHI", "JKL", "MNO", "PQR", "ST", "UVWXYZ"]
+
+def letter_group(name):
+    """The letter group a city name belongs to (by its accent-folded first letter), or None."""
+    initial = dedup_key(name)[:1].upper()
+    return next((group for group in LETTER_GROUPS if initial in group), None)
+
+def name_partitions():
+    """Every (region, letter group) partition, interleaved so consecutive calls cover different regions."""
+    return [(region, group) for group in LETTER_GROUPS for region in CONTINENTS]
+
+def completion_text(response):
+    """The message content of a chat completion response; ValueError if there is none."""
+    try:
+        return response.json()['choices'][0]['message']['content'].strip()
+    except (KeyError, IndexError, TypeError, AttributeError) as exc:
+        raise ValueError(f"Unexpected completion body: {exc!r}") from exc
+
+def parse_names(response):
+    """
+    City names from a generation response. The text is sanitized into a JSON array first,
+    falling back to every quoted string; ValueError if neither yields any names.
+    """
+    sanitized_text = sanitize_json_string(completion_text(response))
+    try:
+        names = json.loads(sanitized_text)
+    except json.JSONDecodeError:
+        print("Error: Unable to decode JSON after sanitization.")
+        print("Sanitized text:", sanitized_text)
+        names = fallback_extract_strings(sanitized_text)
+    if not (isinstance(names, list) and names and all(isinstance(n, str) for n in names)):
+        raise ValueError("Generated output is not a non-empty list of strings.")
+    return names
+
+async def generate_destination_names(client, count, exclude_list, partition=None, retries=3):
     """
     Generate a JSON array containing 'count' famous international destination city names
-    using GPT-3.5-turbo. The exclude_list is used to guide the model.
+    using GPT-3.5-turbo. With a (region, letter group) partition, only cities in that region
+    starting with one of those letters are asked for. The exclude_list is used to guide the model.
     """
+    scope = "famous international destination city names that are well-known around the globe"
+    if partition:
+        region, letters = partition
+        scope = (
+            f"well-known destination city names in {region} whose names start with "
+            f"one of the letters {', '.join(letters)}"
+        )
     exclude_str = ", ".join(exclude_list)
     prompt = (
-        f"Provide a JSON array containing {count} famous international destination city names "
-        f"that are well-known around the globe. Exclude these if possible: [{exclude_str}]. "
-        'Return only the city names as strings. For example: '
+        f"Provide a JSON array containing {count} {scope}. "
+        + (f"Exclude these if possible: [{exclude_str}]. " if exclude_list else "")
+        + 'Return only the city names as strings. For example: '
         '["Sydney", "Rio de Janeiro", "Cape Town", "New York City", "London", "Dubai", "Tokyo"]'
     )
     data = {
@@ -49,28 +112,20 @@ def generate_destination_names(count, exclude_list, retries=3):
         "max_tokens": 300,
         "temperature": 0.7,
     }
+    # Only parseable completions are cached, so a retry asks the API again instead of
+    # replaying the same bad answer.
     for attempt in range(retries):
-        response = requests.post("https://api.openai.com/v1/chat/completions", headers=openai_headers, json=data)
+        response = await client.request(
+            "openai", "POST", OPENAI_URL, validate=parse_names, headers=openai_headers, json=data,
+        )
         if response.status_code == 200:
-            raw_text = response.json()['choices'][0]['message']['content'].strip()
-            sanitized_text = sanitize_json_string(raw_text)
             try:
-                destination_names = json.loads(sanitized_text)
-                if isinstance(destination_names, list) and all(isinstance(n, str) for n in destination_names):
-                    return destination_names
-                else:
-                    print("Error: Generated output is not a valid list of strings.")
-            except json.JSONDecodeError:
-                print("Error: Unable to decode JSON after sanitization.")
-                print("Sanitized text:", sanitized_text)
-                fallback = fallback_extract_strings(sanitized_text)
-                if fallback:
-                    print("Using fallback extraction method.")
-                    return fallback
+                return parse_names(response)
+            except ValueError as exc:
+                print(f"Error: {exc}")
         else:
             print(f"Error: API returned status code {response.status_code}")
             print("Response:", response.text)
-        time.sleep(2)
     return []
 
 def fix_inner_quotes(text):
@@ -93,10 +148,22 @@ def fix_inner_quotes(text):
     fixed_text = re.sub(r'("trivia":\s*\[).*?(\])', r'\1' + fixed_array + r'\2', text, flags=re.DOTALL)
     return fixed_text
 
-def generate_details(destination_name, retries=3):
+def parse_details(response):
+    """The details object from a details response, repairing unescaped quotes in trivia if needed."""
+    result_text = completion_text(response)
+    try:
+        details = json.loads(result_text)
+    except json.JSONDecodeError:
+        # Attempt to fix inner quotes in the trivia array and try again.
+        details = json.loads(fix_inner_quotes(result_text))
+    if not isinstance(details, dict):
+        raise ValueError("Details are not a JSON object.")
+    return details
+
+async def generate_details(client, destination_name, retries=3):
     """
     Generate creative clues, fun fact, trivia, and country info for a destination using GPT-3.5-turbo.
-    Retries up to 'retries' times if JSON decoding fails.
+    Retries up to 'retries' times if JSON decoding fails (HTTP errors are retried by the client).
     """
     prompt = (
         f"Provide details for the destination {destination_name} in the following JSON format:\n"
@@ -111,25 +178,17 @@ def generate_details(destination_name, retries=3):
         "temperature": 0.7,
     }
     for attempt in range(retries):
-        response = requests.post("https://api.openai.com/v1/chat/completions", headers=openai_headers, json=data)
+        response = await client.request(
+            "openai", "POST", OPENAI_URL, validate=parse_details, headers=openai_headers, json=data,
+        )
         if response.status_code == 200:
-            result_text = response.json()['choices'][0]['message']['content'].strip()
             try:
-                details = json.loads(result_text)
-                return details
-            except json.JSONDecodeError:
-                print(f"Error decoding JSON for {destination_name} (attempt {attempt+1}).")
-                print("Raw response:", result_text)
-                # Attempt to fix inner quotes in the trivia array and try again.
-                fixed_text = fix_inner_quotes(result_text)
-                try:
-                    details = json.loads(fixed_text)
-                    return details
-                except json.JSONDecodeError:
-                    print(f"Failed to fix JSON for {destination_name} on attempt {attempt+1}.")
+                return parse_details(response)
+            except ValueError:
+                print(f"Failed to decode JSON for {destination_name} on attempt {attempt+1}.")
+                print("Raw response:", response.text)
         else:
             print(f"Error: API returned status code {response.status_code} for {destination_name}.")
-        time.sleep(2)
     return {
         "city": destination_name,
         "country": "",
@@ -138,107 +197,159 @@ def generate_details(destination_name, retries=3):
         "trivia": ["No trivia available."]
     }
 
-def fetch_image_url(destination_name):
+async def fetch_image_url(client, destination_name):
     """
     Fetch an image URL for the destination using the Unsplash API.
     """
     UNSPLASH_ACCESS_KEY = os.getenv('UNSPLASH_ACCESS_KEY')
-    url = f"https://api.unsplash.com/search/photos?query={destination_name}&per_page=1"
     unsplash_headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"}
-    response = requests.get(url, headers=unsplash_headers)
+    params = {"query": destination_name, "per_page": 1}
+    response = await client.request("unsplash", "GET", UNSPLASH_URL, headers=unsplash_headers, params=params)
     if response.status_code == 200:
         results = response.json().get('results')
         if results:
             return results[0]['urls']['regular']
     return ""
 
-def process_destination(name):
+async def process_destination(client, name):
     """
-    Process a single destination: generate details and fetch its image URL.
+    Process a single destination: generate details and fetch its image URL concurrently.
     """
-    details = generate_details(name)
+    details, image_url = await asyncio.gather(generate_details(client, name), fetch_image_url(client, name))
     details['city'] = name
     details.setdefault('country', "")
-    details['image_url'] = fetch_image_url(name)
+    details['image_url'] = image_url
     return details
 
-if __name__ == '__main__':
+async def try_process_destination(client, name):
+    """Run process_destination, returning (name, result, error) instead of raising."""
+    try:
+        return name, await process_destination(client, name), None
+    except Exception as e:
+        return name, None, e
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Expand data.json into expanded_dataset.json.")
+    parser.add_argument('--target', type=int, default=target_total, help="Number of unique destinations.")
+    parser.add_argument(
+        '--max-attempts', type=int, default=max_generation_attempts, help="Most name generation calls.",
+    )
+    parser.add_argument('--concurrency', type=int, default=concurrency, help="Maximum requests in flight.")
+    parser.add_argument('--openai-rate', type=float, default=openai_rate, help="OpenAI requests per second.")
+    parser.add_argument('--unsplash-rate', type=float, default=unsplash_rate, help="Unsplash requests per second.")
+    parser.add_argument('--cache-dir', default=cache_dir, help="Directory for cached upstream responses.")
+    parser.add_argument('--checkpoint', default=checkpoint_path, help="JSONL file that records finished cities.")
+    parser.add_argument('--resume', action='store_true', help="Skip cities already in the checkpoint.")
+    parser.add_argument(
+        '--cache-only', action='store_true',
+        help="Rebuild expanded_dataset.json from cached responses without touching the network.",
+    )
+    return parser.parse_args()
+
+async def main(args):
     # Step 1: Load the original dataset (with 3 destinations)
     with open('data.json', 'r') as f:
         original_data = json.load(f)
     
-    # Build a dictionary of unique cities (lowercase -> proper case) from the original data.
-    unique_cities = {}
-    expanded = []
-    for entry in original_data:
-        name = (entry.get('city') or entry.get('name') or "").strip()
-        if name:
-            unique_cities[name.lower()] = name
-        # Enrich original entry if needed.
-        if not (entry.get('clues') and entry.get('fun_fact') and entry.get('trivia') and entry.get('country')):
-            details = generate_details(name)
-            entry.update(details)
-        if not entry.get('image_url'):
-            entry['image_url'] = fetch_image_url(name)
-        expanded.append(entry)
-    
-    print(f"Original dataset provides {len(unique_cities)} unique cities.")
-    
-    # Step 2: Generate additional unique city names until we have at least target_total unique names
-    # or until we've made max_generation_attempts overall.
-    attempts = 0
-    while len(unique_cities) < target_total and attempts < max_generation_attempts:
-        attempts += 1
-        needed = target_total - len(unique_cities)
-        print(f"\nAttempt {attempts}: Generating {needed} additional unique city names...")
-        new_names = generate_destination_names(needed, list(unique_cities.keys()))
-        if new_names:
-            for name in new_names:
-                cleaned = name.strip()
-                lc = cleaned.lower()
-                if cleaned and lc not in unique_cities:
-                    unique_cities[lc] = cleaned
-                    print(f"Accepted new city: {cleaned}")
-        else:
-            print("No names returned in this generation call.")
-        print(f"Waiting {generation_delay} seconds after generation attempt {attempts}...")
-        time.sleep(generation_delay)
-    
-    # If still below target_total, use fallback cities to fill in the gap.
-    if len(unique_cities) < target_total:
-        fallback_cities = [
-            "New York", "Los Angeles", "Chicago", "Houston", "Phoenix",
-            "Philadelphia", "San Antonio", "San Diego", "Dallas", "San Jose",
-            "Austin", "Jacksonville", "Fort Worth", "Columbus", "Charlotte",
-            "San Francisco", "Indianapolis", "Seattle", "Denver", "Washington"
-        ]
-        for city in fallback_cities:
-            if len(unique_cities) >= target_total:
-                break
-            if city.lower() not in unique_cities:
-                unique_cities[city.lower()] = city
-                print(f"Added fallback city: {city}")
-    
-    final_city_list = list(unique_cities.values())[:target_total]
-    print(f"\nFinal list of unique city names collected ({len(final_city_list)}):")
-    print(final_city_list)
-    
-    # Step 3: Process details for all unique cities concurrently.
-    processed_destinations = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(process_destination, name): name for name in final_city_list}
-        for future in as_completed(futures):
+    # Every response goes through the on-disk cache; in cache-only mode there is no network transport at all.
+    client = UpstreamClient(
+        None if args.cache_only else HttpxTransport(max_connections=args.concurrency),
+        limits={"openai": TokenBucket(args.openai_rate), "unsplash": TokenBucket(args.unsplash_rate)},
+        concurrency=args.concurrency,
+        cache=ResponseCache(args.cache_dir),
+    )
+    checkpoint = Checkpoint(args.checkpoint)
+    if not (args.resume or args.cache_only):
+        checkpoint.reset()
+    done = checkpoint.load()
+    if done:
+        print(f"Resuming: {len(done)} destinations already in {args.checkpoint}.")
+    try:
+        # Collect unique city names, starting with the original data (enriched along with the
+        # generated ones in Step 3). Other spellings of a known city ("Kyōto", "NYC") and
+        # likely typos are rejected, so the same city is never paid for twice.
+        unique_cities = Deduplicator(fuzzy=True)
+        city_list = []
+        # Names already found per partition: the exclusion list for that partition's prompts.
+        partition_names = {partition: [] for partition in name_partitions()}
+
+        def accept(name, country="", partition=None):
+            cleaned = name.strip()
+            if not cleaned or unique_cities.add(cleaned, country) is not None:
+                return False
+            city_list.append(cleaned)
+            region = partition[0] if partition else region_for(country)
+            key = (region, letter_group(cleaned))
+            if key in partition_names:
+                partition_names[key].append(cleaned)
+            return True
+
+        for entry in original_data:
+            accept(entry.get('city') or entry.get('name') or "", entry.get('country') or "")
+        
+        print(f"Original dataset provides {len(city_list)} unique cities.")
+        
+        # Step 2: Generate additional unique city names, one partition per call, until we have
+        # at least args.target unique names or we've made args.max_attempts calls overall.
+        # A partition that yields nothing new is exhausted and not asked again.
+        partitions = deque(partition_names)
+        attempts = 0
+        while len(city_list) < args.target and attempts < args.max_attempts and partitions:
+            attempts += 1
+            partition = partitions.popleft()
+            needed = min(args.target - len(city_list), names_per_call)
+            print(f"\nAttempt {attempts}: Generating {needed} city names in {partition[0]} ({partition[1]})...")
             try:
-                result = future.result()
-                processed_destinations.append(result)
-                print(f"Processed: {result['city']}")
-            except Exception as e:
-                print(f"Error processing {futures[future]}: {e}")
-    print(f"Waiting {processing_delay} seconds after processing...")
-    time.sleep(processing_delay)
+                new_names = await generate_destination_names(
+                    client, needed, partition_names[partition], partition=partition,
+                )
+            except CacheMiss:
+                print("No cached response for this generation call; stopping generation.")
+                break
+            accepted = [name for name in new_names if accept(name, partition=partition)]
+            for name in accepted:
+                print(f"Accepted new city: {name.strip()}")
+            if accepted:
+                partitions.append(partition)
+            else:
+                print(f"No new names from {partition[0]} ({partition[1]}); dropping that partition.")
+        
+        # If still below the target, use fallback cities to fill in the gap.
+        if len(city_list) < args.target:
+            fallback_cities = [
+                "New York", "Los Angeles", "Chicago", "Houston", "Phoenix",
+                "Philadelphia", "San Antonio", "San Diego", "Dallas", "San Jose",
+                "Austin", "Jacksonville", "Fort Worth", "Columbus", "Charlotte",
+                "San Francisco", "Indianapolis", "Seattle", "Denver", "Washington"
+            ]
+            for city in fallback_cities:
+                if len(city_list) >= args.target:
+                    break
+                if accept(city, "United States"):
+                    print(f"Added fallback city: {city}")
+        
+        final_city_list = city_list[:args.target]
+        print(f"\nFinal list of unique city names collected ({len(final_city_list)}):")
+        print(final_city_list)
+        
+        # Step 3: Process details for all unique cities concurrently (bounded by the client),
+        # appending each result to the checkpoint as soon as it is finished.
+        tasks = [try_process_destination(client, name) for name in final_city_list if name not in done]
+        for task in asyncio.as_completed(tasks):
+            name, result, error = await task
+            if error is not None:
+                print(f"Error processing {name}: {error}")
+                continue
+            checkpoint.append(result)
+            done[name] = result
+            print(f"Processed: {result['city']}")
+    finally:
+        await client.aclose()
     
+    processed_destinations = [done[name] for name in final_city_list if name in done]
     final_count = len(processed_destinations)
-    print(f"\nFinal dataset has {final_count} destinations (expected: {target_total}).")
+    print(f"\nFinal dataset has {final_count} destinations (expected: {args.target}).")
+    print(client.stats.report())
     
     # Step 4: Save the final dataset to a JSON file.
     with open('expanded_dataset.json', 'w') as f:
@@ -246,3 +357,5 @@ if __name__ == '__main__':
     
     print("Dataset expansion complete. Check 'expanded_dataset.json' for the unique destinations.")
 
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))